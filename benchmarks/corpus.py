@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2009 Google Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#    * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#    * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Generates synthetic C++ sources for benchmarking cpplint.
+
+Each kind of source stresses a different part of cpplint: deeply nested
+namespaces, many preprocessor branches, long classes, template-heavy
+headers, tables of string literals and long lines.  The mixed kind
+interleaves all of them.  The sources are made of blocks of a few dozen
+lines drawn from a random generator seeded by the caller, so that the same
+kind, size and seed always give the same source.
+
+Usage:
+  python benchmarks/corpus.py [--kind=mixed] [--lines=#] [--seed=#]
+                              [--output=directory]
+
+Without --output, the source is written to the standard output.  With it,
+one file of each kind is written to the directory instead.
+"""
+
+import getopt
+import os
+import random
+import sys
+
+
+_COPYRIGHT = '// Copyright 2014 Your Company.  All rights reserved.'
+
+_TYPES = ('int', 'int64', 'double', 'bool', 'string', 'size_t',
+          'std::vector<int>', 'std::map<string, int>',
+          'std::unique_ptr<Node>', 'const char*')
+
+_WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf',
+          'hotel', 'india', 'juliet', 'kilo', 'lima', 'mike', 'november',
+          'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango')
+
+
+def _Name(rng, capitalized=False):
+  words = rng.sample(_WORDS, rng.randint(1, 3))
+  if capitalized:
+    return ''.join(word.capitalize() for word in words)
+  return '_'.join(words)
+
+
+def _Statement(rng):
+  """Returns a statement of a function body, without indentation."""
+  name = _Name(rng)
+  choice = rng.randint(0, 5)
+  if choice == 0:
+    return '%s %s = %s(%d);' % (rng.choice(_TYPES), name, _Name(rng),
+                                rng.randint(0, 99))
+  if choice == 1:
+    return 'if (%s > %d) return %s;' % (name, rng.randint(0, 9), _Name(rng))
+  if choice == 2:
+    return '%s_.push_back(std::make_pair(%s, "%s"));' % (
+        name, _Name(rng), _Name(rng))
+  if choice == 3:
+    return 'LOG(INFO) << "%s: " << %s;' % (_Name(rng), name)
+  if choice == 4:
+    return 'CHECK_EQ(%s, %s.size());' % (name, _Name(rng))
+  return '%s += static_cast<int>(%s * %d);' % (name, _Name(rng),
+                                                rng.randint(2, 9))
+
+
+def _Function(rng, indent, statements):
+  lines = ['%sint %s(const %s& %s, int %s) {' %
+           (indent, _Name(rng, True), _Name(rng, True), _Name(rng),
+            _Name(rng))]
+  lines.extend(indent + '  ' + _Statement(rng) for _ in range(statements))
+  lines.append('%s  return 0;' % indent)
+  lines.append('%s}' % indent)
+  return lines
+
+
+def Namespaces(rng):
+  """Returns functions in namespaces nested up to 16 deep."""
+  names = [_Name(rng) for _ in range(rng.randint(4, 16))]
+  lines = ['namespace %s {' % name for name in names]
+  lines.append('')
+  lines.extend(_Function(rng, '', rng.randint(2, 8)))
+  lines.append('')
+  lines.extend('}  // namespace %s' % name for name in reversed(names))
+  lines.append('')
+  return lines
+
+
+def Preprocessor(rng):
+  """Returns declarations under many #if, #elif and #else branches."""
+  lines = []
+  for _ in range(rng.randint(2, 6)):
+    macro = _Name(rng).upper()
+    lines.append('#if defined(%s) && %s > %d' % (macro, macro,
+                                                 rng.randint(0, 9)))
+    lines.append('const %s k%s = %d;' % ('int', _Name(rng, True),
+                                         rng.randint(0, 99)))
+    for _ in range(rng.randint(0, 3)):
+      lines.append('#elif defined(%s)' % _Name(rng).upper())
+      lines.append('#ifdef %s' % _Name(rng).upper())
+      lines.append('struct %s { int %s; };' % (_Name(rng, True), _Name(rng)))
+      lines.append('#endif  // %s' % macro)
+    lines.append('#else')
+    lines.extend(_Function(rng, '', rng.randint(1, 3)))
+    lines.append('#endif  // defined(%s)' % macro)
+  lines.append('')
+  return lines
+
+
+def Classes(rng):
+  """Returns a class with many members, methods and access sections."""
+  name = _Name(rng, True)
+  lines = ['class %s : public %s {' % (name, _Name(rng, True)),
+           ' public:',
+           '  explicit %s(int %s);' % (name, _Name(rng)),
+           '  virtual ~%s();' % name,
+           '']
+  for _ in range(rng.randint(20, 60)):
+    choice = rng.randint(0, 3)
+    if choice == 0:
+      lines.append('  %s %s() const { return %s_; }' %
+                   (rng.choice(_TYPES), _Name(rng, True), _Name(rng)))
+    elif choice == 1:
+      lines.append('  void Set%s(%s value);' % (_Name(rng, True),
+                                                rng.choice(_TYPES)))
+    elif choice == 2:
+      lines.extend(_Function(rng, '  ', rng.randint(1, 4)))
+    else:
+      lines.append('  // %s the %s of the %s.' % (
+          _Name(rng).capitalize(), _Name(rng), _Name(rng)))
+  lines.append('')
+  lines.append(' private:')
+  for _ in range(rng.randint(5, 20)):
+    lines.append('  %s %s_;' % (rng.choice(_TYPES), _Name(rng)))
+  lines.append('')
+  lines.append('  DISALLOW_COPY_AND_ASSIGN(%s);' % name)
+  lines.append('};')
+  lines.append('')
+  return lines
+
+
+def Templates(rng):
+  """Returns template classes and functions with nested template types."""
+  name = _Name(rng, True)
+  nested = 'std::map<string, std::vector<std::pair<int, %s<T> > > >' % name
+  lines = ['template <typename T, typename Allocator = std::allocator<T> >',
+           'class %s {' % name,
+           ' public:',
+           '  typedef %s Index;' % nested,
+           '  template <typename U>',
+           '  std::set<U> %s(const std::vector<U>& %s) const {' %
+           (_Name(rng, True), _Name(rng)),
+           '    return std::set<U>(%s.begin(), %s.end());' % (_Name(rng),
+                                                              _Name(rng)),
+           '  }',
+           '']
+  for _ in range(rng.randint(3, 10)):
+    lines.append('  std::unordered_map<T, std::function<bool(const T&)> > '
+                 '%s_;' % _Name(rng))
+    lines.append('  std::shared_ptr<%s<std::tuple<T, int, string> > > %s_;' %
+                 (name, _Name(rng)))
+  lines.append('};')
+  lines.append('')
+  lines.append('template <typename T>')
+  lines.append('inline bool operator<(const %s<T>& a, const %s<T>& b) {' %
+               (name, name))
+  lines.append('  return std::less<T>()(a.%s(), b.%s());' %
+               (_Name(rng), _Name(rng)))
+  lines.append('}')
+  lines.append('')
+  return lines
+
+
+def Strings(rng):
+  """Returns a table of string literals with escapes and comments."""
+  lines = ['const char* const k%sTable[] = {' % _Name(rng, True)]
+  for _ in range(rng.randint(20, 80)):
+    words = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(1, 6)))
+    lines.append('    "%s\\t%s \\"%s\\" // not a comment",  // %s' %
+                 (words, rng.randint(0, 999), rng.choice(_WORDS),
+                  rng.choice(_WORDS)))
+  lines.append('};')
+  lines.append('')
+  return lines
+
+
+def LongLines(rng):
+  """Returns statements spanning hundreds and sometimes thousands of columns.
+  """
+  lines = []
+  for _ in range(rng.randint(5, 20)):
+    terms = ' + '.join('%s(%d)' % (_Name(rng), rng.randint(0, 9))
+                       for _ in range(rng.randint(5, 40)))
+    lines.append('int %s = %s;' % (_Name(rng), terms))
+  if rng.random() < 0.2:
+    data = ', '.join('0x%02x' % rng.randint(0, 255) for _ in range(2000))
+    lines.append('const unsigned char k%s[] = {%s};' % (_Name(rng, True),
+                                                        data))
+  lines.append('')
+  return lines
+
+
+# The kinds of sources, by name, as functions returning a block of lines.
+KINDS = {
+    'namespaces': Namespaces,
+    'preprocessor': Preprocessor,
+    'classes': Classes,
+    'templates': Templates,
+    'strings': Strings,
+    'long_lines': LongLines,
+    }
+
+
+def Extension(kind):
+  """Returns the file extension of a source of the given kind."""
+  return 'h' if kind == 'templates' else 'cc'
+
+
+def Generate(kind, num_lines, seed=0):
+  """Generates a C++ source.
+
+  Args:
+    kind: The name of the kind of source, one of KINDS or 'mixed'.
+    num_lines: The number of lines to generate, at least.  Blocks are not
+               cut, so the source can be a few dozen lines longer.
+    seed: The seed of the random generator.
+
+  Returns:
+    The list of the lines of the source, without their newlines.
+  """
+  rng = random.Random('%s/%d' % (kind, seed))
+  lines = [_COPYRIGHT, '']
+  if Extension(kind) == 'h':
+    lines.extend(['#ifndef BENCHMARK_H_', '#define BENCHMARK_H_', ''])
+  lines.extend(['#include <map>', '#include <string>', '#include <vector>',
+                ''])
+  blocks = [KINDS[name] for name in sorted(KINDS)]
+  while len(lines) < num_lines:
+    if kind == 'mixed':
+      lines.extend(rng.choice(blocks)(rng))
+    else:
+      lines.extend(KINDS[kind](rng))
+  if Extension(kind) == 'h':
+    lines.append('#endif  // BENCHMARK_H_')
+  return lines
+
+
+def main():
+  kind = 'mixed'
+  num_lines = 10000
+  seed = 0
+  output = None
+  try:
+    (opts, args) = getopt.getopt(sys.argv[1:], '',
+                                 ['kind=', 'lines=', 'seed=', 'output=',
+                                  'help'])
+  except getopt.GetoptError:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  if args:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  for (opt, val) in opts:
+    if opt == '--kind':
+      if val != 'mixed' and val not in KINDS:
+        sys.stderr.write('Unknown kind %s, use one of mixed, %s.\n' %
+                         (val, ', '.join(sorted(KINDS))))
+        sys.exit(2)
+      kind = val
+    elif opt == '--lines':
+      num_lines = int(val)
+    elif opt == '--seed':
+      seed = int(val)
+    elif opt == '--output':
+      output = val
+    elif opt == '--help':
+      sys.stdout.write(__doc__)
+      sys.exit(0)
+
+  if output is None:
+    sys.stdout.write('\n'.join(Generate(kind, num_lines, seed)) + '\n')
+    return
+  if not os.path.isdir(output):
+    os.makedirs(output)
+  for name in sorted(KINDS) + ['mixed']:
+    path = os.path.join(output, '%s.%s' % (name, Extension(name)))
+    with open(path, 'w') as source:
+      source.write('\n'.join(Generate(name, num_lines, seed)) + '\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2009 Google Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#    * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#    * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Audits the regular expressions of cpplint for superlinear matching.
+
+The patterns are those Match, Search, ReplaceAll and FindAll compile while
+running cpplint_unittest.py, plus the compiled patterns at module level of
+cpplint.  Each one is run on adversarial strings, long runs of quotes, stars,
+slashes, angle brackets, scope operators and whitespace, of growing length.
+A pattern is flagged when its matching time grows faster than the length of
+the string, or a single match takes longer than the timeout.
+
+Usage:
+  python benchmarks/regex_audit.py [--timeout=seconds] [--max-exponent=#]
+                                   [--json] [--update-baseline]
+
+The exit status is 1 when a pattern that is not listed in
+regex_audit_baseline.json is flagged, so that new checks do not introduce
+exponential regexps unnoticed.  --update-baseline rewrites that file with
+the patterns flagged now; remove patterns from it as they are fixed.
+"""
+
+import getopt
+import json
+import math
+import os
+import re
+import sys
+import timeit
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import cpplint  # pylint: disable=g-import-not-at-top
+import cpplint_unittest  # pylint: disable=g-import-not-at-top
+
+
+# Lengths of the adversarial strings.
+_SIZES = (16, 64, 256, 1024, 4096)
+
+# Cost below which timings are too noisy to fit an exponent to.
+_MIN_SECONDS = 1e-4
+
+# Adversarial strings by name, as functions of their approximate length.
+_INPUTS = [
+    ('double quotes', lambda n: '"' * n),
+    ('single quotes', lambda n: "'" * n),
+    ('stars', lambda n: '*' * n),
+    ('slashes', lambda n: '/' * n),
+    ('backslashes', lambda n: '\\' * n),
+    ('angle brackets', lambda n: '<' * n),
+    ('closing angle brackets', lambda n: '>' * n),
+    ('scope operators', lambda n: '::' * (n // 2)),
+    ('qualified names', lambda n: 'a::' * (n // 3)),
+    ('spaces', lambda n: ' ' * n),
+    ('spaces between words', lambda n: 'a ' * (n // 2)),
+    ('parentheses', lambda n: '(' * n),
+    ('unterminated string', lambda n: '"' + 'a' * n),
+    ('unterminated character', lambda n: "'" + '.' * n),
+    ('unterminated comment', lambda n: '/*' + ' ' * n),
+    ('template arguments', lambda n: 'a<' + 'b, ' * (n // 3)),
+    ('identifier', lambda n: 'a' * n),
+    ('identifier and spaces', lambda n: 'a' * (n // 2) + ' ' * (n // 2)),
+    ]
+
+# Patterns already known to be superlinear on some adversarial input, which
+# do not fail the audit.
+_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'regex_audit_baseline.json')
+
+
+def CollectPatterns():
+  """Runs the unit tests, recording the regexps compiled by cpplint.
+
+  Returns:
+    A dictionary from each pattern to a sorted list of the names of the
+    methods of the compiled regexp it was run through.
+  """
+  used = {}
+
+  def Recording(method, helper):
+    def Helper(pattern, *args):
+      used.setdefault(pattern, set()).add(method)
+      return helper(pattern, *args)
+    return Helper
+
+  helpers = (cpplint.Match, cpplint.Search, cpplint.ReplaceAll,
+             cpplint.FindAll)
+  cpplint.Match = Recording('match', helpers[0])
+  cpplint.Search = Recording('search', helpers[1])
+  cpplint.ReplaceAll = Recording('sub', helpers[2])
+  cpplint.FindAll = Recording('findall', helpers[3])
+  try:
+    cpplint_unittest.setUp()
+    suite = unittest.defaultTestLoader.loadTestsFromModule(cpplint_unittest)
+    unittest.TextTestRunner(stream=open(os.devnull, 'w')).run(suite)
+    cpplint_unittest.tearDown()
+  finally:
+    (cpplint.Match, cpplint.Search, cpplint.ReplaceAll,
+     cpplint.FindAll) = helpers
+
+  # Patterns compiled outside of the helpers are audited with search, the
+  # most expensive way to run them.
+  for cache in (cpplint._regexp_compile_cache, cpplint._regexp_previous_cache):
+    for pattern in cache:
+      used.setdefault(pattern, set(['search']))
+
+  compiled = {}
+  for name, value in sorted(vars(cpplint).items()):
+    for item in _Flatten(value):
+      if isinstance(item, type(re.compile(''))):
+        compiled.setdefault(item.pattern, name)
+  for pattern in compiled:
+    used.setdefault(pattern, set(['search']))
+  return dict((pattern, sorted(methods))
+              for pattern, methods in used.items())
+
+
+def _Flatten(value, depth=2):
+  """Yields value and, for lists and tuples, the values nested in it."""
+  yield value
+  if depth and isinstance(value, (list, tuple)):
+    for item in value:
+      for nested in _Flatten(item, depth - 1):
+        yield nested
+
+
+def TimeMatching(regexp, method, text):
+  """Returns the best time of a few runs of a regexp method on text.
+
+  Raises:
+    cpplint._RegexTimeout: A run took longer than the --timeout.
+  """
+  args = ('', text) if method == 'sub' else (text,)
+  best = None
+  for _ in range(3):
+    start = timeit.default_timer()
+    cpplint._TimedRegex(getattr(regexp, method), regexp.pattern, *args)
+    elapsed = timeit.default_timer() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def AuditPattern(pattern, methods, max_exponent):
+  """Measures how the cost of a pattern grows with adversarial input.
+
+  Args:
+    pattern: The regexp.
+    methods: The names of the methods of the compiled regexp to audit.
+    max_exponent: The largest acceptable growth exponent.
+
+  Returns:
+    A list of dictionaries describing each method and input on which the
+    pattern is superlinear or timed out.
+  """
+  regexp = re.compile(pattern)
+  findings = []
+  for method in methods:
+    for input_name, generate in _INPUTS:
+      timings = []
+      timed_out = None
+      for size in _SIZES:
+        try:
+          timings.append((size, TimeMatching(regexp, method, generate(size))))
+        except cpplint._RegexTimeout:
+          timed_out = size
+          break
+      exponent = None
+      if len(timings) >= 2 and timings[-1][1] >= _MIN_SECONDS:
+        ((small, small_time), (large, large_time)) = timings[-2:]
+        exponent = (math.log(large_time / max(small_time, 1e-9)) /
+                    math.log(float(large) / small))
+      if timed_out or (exponent is not None and exponent > max_exponent):
+        findings.append({'pattern': pattern,
+                         'method': method,
+                         'input': input_name,
+                         'exponent': exponent,
+                         'timed_out_at': timed_out,
+                         'timings': timings})
+  return findings
+
+
+def ReadBaseline():
+  """Returns the set of patterns known to be superlinear."""
+  if not os.path.exists(_BASELINE):
+    return set()
+  with open(_BASELINE) as baseline:
+    return set(json.load(baseline))
+
+
+def WriteBaseline(findings):
+  with open(_BASELINE, 'w') as baseline:
+    json.dump(sorted(set(finding['pattern'] for finding in findings)),
+              baseline, indent=0)
+    baseline.write('\n')
+
+
+def PrintFindings(findings, known, stream):
+  """Writes the findings of each pattern under it, marking known patterns."""
+  pattern = None
+  for finding in findings:
+    if finding['pattern'] != pattern:
+      pattern = finding['pattern']
+      stream.write('%s%s\n' % (pattern,
+                               ' (known)' if pattern in known else ''))
+    if finding['timed_out_at']:
+      cost = 'timed out at length %d' % finding['timed_out_at']
+    else:
+      cost = 'grows as n^%.2f, %.4fs at length %d' % (
+          finding['exponent'], finding['timings'][-1][1],
+          finding['timings'][-1][0])
+    stream.write('  %s on %s: %s\n' % (finding['method'], finding['input'],
+                                        cost))
+
+
+def main():
+  timeout = 1.0
+  max_exponent = 1.5
+  output_json = False
+  update_baseline = False
+  try:
+    (opts, args) = getopt.getopt(sys.argv[1:], '',
+                                 ['timeout=', 'max-exponent=', 'json',
+                                  'update-baseline', 'help'])
+  except getopt.GetoptError:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  if args:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  for (opt, val) in opts:
+    if opt == '--timeout':
+      timeout = float(val)
+    elif opt == '--max-exponent':
+      max_exponent = float(val)
+    elif opt == '--json':
+      output_json = True
+    elif opt == '--update-baseline':
+      update_baseline = True
+    elif opt == '--help':
+      sys.stdout.write(__doc__)
+      sys.exit(0)
+
+  known = ReadBaseline()
+  patterns = CollectPatterns()
+  findings = []
+  cpplint._SetRegexTimeout(timeout)
+  try:
+    for pattern in sorted(patterns):
+      findings.extend(AuditPattern(pattern, patterns[pattern], max_exponent))
+  finally:
+    cpplint._SetRegexTimeout(0)
+
+  if output_json:
+    json.dump({'patterns': len(patterns), 'findings': findings},
+              sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+  else:
+    sys.stdout.write('Audited %d patterns on %d adversarial inputs.\n' %
+                     (len(patterns), len(_INPUTS)))
+    PrintFindings(findings, known, sys.stdout)
+  if update_baseline:
+    WriteBaseline(findings)
+    sys.exit(0)
+  new = set(finding['pattern'] for finding in findings
+            if finding['pattern'] not in known)
+  sys.exit(bool(new))
+
+
+if __name__ == '__main__':
+  main()
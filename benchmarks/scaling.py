@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2009 Google Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#    * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#    * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Tests that the cost of cpplint grows linearly on pathological sources.
+
+Each test generates a family of sources at doubling sizes, such as n nested
+classes, n #ifdef branches, an n-line initializer list or an n-character
+line, and times a stage of cpplint on them: the whole of ProcessFileData,
+building the CleansedLines or updating the NestingState.  The growth
+exponent of the best time of a few runs is fitted on a log-log scale, and
+the test fails when it exceeds --max-exponent.  A linear stage gives about
+1, a quadratic one about 2.  Lines are checked in full whatever their
+length, so that long lines are not spared by --long-line-threshold, except
+by the test of the lines over it.
+
+Usage:
+  python benchmarks/scaling.py [--max-exponent=#] [unittest arguments]
+
+When a test fails, cpplint.py --profile on a source of its family shows
+the check behind it.
+"""
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import cpplint  # pylint: disable=g-import-not-at-top
+import throughput  # pylint: disable=g-import-not-at-top
+
+
+# The largest growth exponent a stage may have.  This is set by the
+# --max-exponent flag.
+_max_exponent = 1.4
+
+# How many runs each time is the best of.
+_REPEAT = 3
+
+
+def FitExponent(timings):
+  """Fits t = c * n^k to (n, t) pairs by least squares on logarithms.
+
+  Returns:
+    The exponent k.
+  """
+  points = [(math.log(n), math.log(max(seconds, 1e-9)))
+            for n, seconds in timings]
+  mean_x = sum(x for x, _ in points) / len(points)
+  mean_y = sum(y for _, y in points) / len(points)
+  return (sum((x - mean_x) * (y - mean_y) for x, y in points) /
+          sum((x - mean_x) ** 2 for x, _ in points))
+
+
+def Pipeline(lines):
+  return lambda: cpplint.ProcessFileData('scaling.cc', 'cc', list(lines),
+                                         throughput._IgnoreError)
+
+
+def _Marked(lines):
+  """Returns the lines as ProcessFileData prepares them."""
+  lines = (['// marker so line numbers and indices both start at 1'] + lines +
+           ['// marker so line numbers end in a known way'])
+  cpplint.RemoveMultiLineComments('scaling.cc', lines, throughput._IgnoreError)
+  return lines
+
+
+def CleansedLines(lines):
+  lines = _Marked(lines)
+  return lambda: cpplint.CleansedLines(lines)
+
+
+def NestingState(lines):
+  clean_lines = cpplint.CleansedLines(_Marked(lines))
+
+  def Update():
+    nesting_state = cpplint.NestingState()
+    for linenum in range(clean_lines.NumLines()):
+      nesting_state.Update('scaling.cc', clean_lines, linenum,
+                           throughput._IgnoreError)
+  return Update
+
+
+def NestedClasses(n):
+  return (['// Copyright 2014 Your Company.'] +
+          ['class C%d {' % i for i in range(n)] + [' public:', '  int x;'] +
+          ['};'] * n)
+
+
+def NestedNamespaces(n):
+  return (['// Copyright 2014 Your Company.'] +
+          ['namespace n%d {' % i for i in range(n)] + ['int x;'] +
+          ['}  // namespace n%d' % i for i in range(n - 1, -1, -1)])
+
+
+def Ifdefs(n):
+  lines = ['// Copyright 2014 Your Company.']
+  for i in range(n):
+    lines.extend(['#ifdef A%d' % i, 'class C%d {' % i, '#else',
+                  'class D%d : public C {' % i, '#endif', ' public:'])
+  return lines + ['};'] * n
+
+
+def InitializerList(n):
+  return (['// Copyright 2014 Your Company.', 'Foo::Foo(int& x)',
+           '    : a_(0),'] +
+          ['      b%d_(&x),' % i for i in range(n)] +
+          ['      c_(1) {', '}'])
+
+
+def _Line(n, pattern):
+  """Returns a source with a statement of about n characters."""
+  return ['// Copyright 2014 Your Company.',
+          'int x = f(%s);' % ', '.join([pattern] * (n // (len(pattern) + 2)))]
+
+
+def QuotedLine(n):
+  return _Line(n, '\'a\', "b\\"c"')
+
+
+def TemplateLine(n):
+  return _Line(n, 'a < b, c > d, std::map<int, e<f> >()')
+
+
+def ParenthesizedLine(n):
+  return _Line(n, '((a) + b(c, (d)))')
+
+
+def NestedExpressionLine(n):
+  return ['// Copyright 2014 Your Company.',
+          'int x = ' + 'f(' * (n // 4) + 'a' + ')' * (n // 4) + ';']
+
+
+def ScopedLine(n):
+  return _Line(n, '::a::b<c::d>(e::f)')
+
+
+def CommentedLine(n):
+  return _Line(n, '/* a */ "b/*" \'/\'')
+
+
+class ScalingTest(unittest.TestCase):
+
+  def setUp(self):
+    self.long_line_threshold = cpplint._long_line_threshold
+    cpplint._long_line_threshold = 0
+
+  def tearDown(self):
+    cpplint._long_line_threshold = self.long_line_threshold
+
+  def assertLinear(self, generate, sizes, stage=Pipeline):
+    """Checks that the time of a stage grows at most as fast as allowed.
+
+    Args:
+      generate: A function returning the lines of a source of a size.
+      sizes: The sizes to generate, doubling.
+      stage: A function returning the function timing the stage on lines.
+    """
+    timings = [(n, throughput.TimeBest(stage(generate(n)), _REPEAT))
+               for n in sizes]
+    exponent = FitExponent(timings)
+    self.assertTrue(
+        exponent <= _max_exponent,
+        '%s of %s grows as n^%.2f, more than n^%.2f: %s' %
+        (stage.__name__, generate.__name__, exponent, _max_exponent,
+         ', '.join('%.4fs at %d' % (seconds, n) for n, seconds in timings)))
+
+  def testNestedClasses(self):
+    self.assertLinear(NestedClasses, [250, 500, 1000, 2000])
+    self.assertLinear(NestedClasses, [1000, 2000, 4000, 8000], NestingState)
+
+  def testNestedNamespaces(self):
+    self.assertLinear(NestedNamespaces, [250, 500, 1000, 2000])
+
+  def testIfdefs(self):
+    self.assertLinear(Ifdefs, [125, 250, 500, 1000])
+    self.assertLinear(Ifdefs, [500, 1000, 2000, 4000], NestingState)
+
+  def testInitializerList(self):
+    self.assertLinear(InitializerList, [500, 1000, 2000, 4000])
+
+  def testQuotedLine(self):
+    self.assertLinear(QuotedLine, [4000, 8000, 16000, 32000])
+    self.assertLinear(QuotedLine, [16000, 32000, 64000, 128000],
+                      CleansedLines)
+
+  def testTemplateLine(self):
+    self.assertLinear(TemplateLine, [2000, 4000, 8000, 16000])
+
+  def testParenthesizedLine(self):
+    self.assertLinear(ParenthesizedLine, [2000, 4000, 8000, 16000])
+
+  def testNestedExpressionLine(self):
+    self.assertLinear(NestedExpressionLine, [4000, 8000, 16000, 32000])
+
+  def testScopedLine(self):
+    self.assertLinear(ScopedLine, [2000, 4000, 8000, 16000])
+
+  def testLinesOverThreshold(self):
+    # Lines over --long-line-threshold are only reduced to their structure.
+    cpplint._long_line_threshold = 1000
+    for generate in (QuotedLine, CommentedLine):
+      self.assertLinear(generate, [32000, 64000, 128000, 256000],
+                        CleansedLines)
+
+
+def main():
+  global _max_exponent
+  argv = [sys.argv[0]]
+  for arg in sys.argv[1:]:
+    if arg.startswith('--max-exponent='):
+      _max_exponent = float(arg.split('=', 1)[1])
+    elif arg == '--help':
+      sys.stdout.write(__doc__)
+      sys.exit(0)
+    else:
+      argv.append(arg)
+  unittest.main(argv=argv)
+
+
+if __name__ == '__main__':
+  main()
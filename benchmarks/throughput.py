@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2009 Google Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#    * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#    * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Measures the throughput of cpplint on the synthetic sources of corpus.py.
+
+For each kind and size of source, the full pipeline, that is ProcessFile on
+a file, is timed along with stages run on their own: building the
+CleansedLines, updating a NestingState on every line, and the
+include-what-you-use check.  Each is reported with its lines per second and
+its peak memory, and the pipeline with the time of each of its phases, as
+recorded by --trace.  Times are the best of a few runs.
+
+Usage:
+  python benchmarks/throughput.py [--kinds=kind,...] [--lines=#,...]
+                                  [--seed=#] [--repeat=#] [--json]
+
+The default is every kind of source at 1000 and 10000 lines.  --json writes
+the results as JSON, to be kept and compared over time.  Peak memory is
+measured with tracemalloc, in a run of its own, and is missing where
+tracemalloc is not available.
+"""
+
+import getopt
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import corpus  # pylint: disable=g-import-not-at-top
+import cpplint  # pylint: disable=g-import-not-at-top
+
+try:
+  import tracemalloc  # pylint: disable=g-import-not-at-top
+except ImportError:
+  tracemalloc = None
+
+
+def _IgnoreError(*unused_args):
+  pass
+
+
+_IgnoreError.message_args = True
+
+
+def TimeBest(function, repeat):
+  """Returns the best time of repeat calls of function, in seconds."""
+  best = None
+  for _ in range(repeat):
+    start = timeit.default_timer()
+    function()
+    elapsed = timeit.default_timer() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def PeakMemory(function):
+  """Returns the most bytes allocated at once while function ran, or None."""
+  if tracemalloc is None:
+    return None
+  tracemalloc.start()
+  try:
+    function()
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+
+def Stages(path, lines):
+  """Returns the stages to measure on a source, as (name, function) pairs.
+
+  Args:
+    path: The file the source was written to.
+    lines: The lines of the source.
+  """
+  def Pipeline():
+    cpplint._cpplint_state.ResetErrorCounts()
+    cpplint.ProcessFile(path, 0)
+
+  # The stages are run on the lines as ProcessFileData prepares them.
+  lines = (['// marker so line numbers and indices both start at 1'] + lines +
+           ['// marker so line numbers end in a known way'])
+  cpplint.RemoveMultiLineComments(path, lines, _IgnoreError)
+  clean_lines = cpplint.CleansedLines(lines)
+
+  def NestingState():
+    nesting_state = cpplint.NestingState()
+    for linenum in range(clean_lines.NumLines()):
+      nesting_state.Update(path, clean_lines, linenum, _IgnoreError)
+
+  def IncludeWhatYouUse():
+    cpplint.CheckForIncludeWhatYouUse(path, clean_lines,
+                                      cpplint._IncludeState(), _IgnoreError)
+
+  return [('pipeline', Pipeline),
+          ('CleansedLines', lambda: cpplint.CleansedLines(lines)),
+          ('NestingState', NestingState),
+          ('IWYU', IncludeWhatYouUse)]
+
+
+def Phases(path):
+  """Returns the seconds spent in each phase of linting path, by name."""
+  cpplint._SetTrace(True)
+  try:
+    cpplint._cpplint_state.ResetErrorCounts()
+    cpplint.ProcessFile(path, 0)
+    phases = {}
+    for event in cpplint._trace.events:
+      phases[event['name']] = (phases.get(event['name'], 0) +
+                               event['dur'] / 1e6)
+    return phases
+  finally:
+    cpplint._SetTrace(False)
+
+
+def Measure(directory, kind, num_lines, seed, repeat):
+  """Measures the stages on a source of the given kind and size.
+
+  Returns:
+    A dictionary describing the source and the cost of each stage.
+  """
+  lines = corpus.Generate(kind, num_lines, seed)
+  path = os.path.join(directory, '%s.%s' % (kind, corpus.Extension(kind)))
+  with open(path, 'w') as source:
+    source.write('\n'.join(lines) + '\n')
+  result = {'kind': kind, 'lines': len(lines),
+            'bytes': os.path.getsize(path), 'stages': []}
+  for name, function in Stages(path, lines):
+    seconds = TimeBest(function, repeat)
+    result['stages'].append({
+        'stage': name, 'seconds': seconds,
+        'lines_per_second': int(len(lines) / seconds) if seconds else 0,
+        'peak_bytes': PeakMemory(function)})
+  result['phases'] = Phases(path)
+  return result
+
+
+def PrintResults(results, stream):
+  """Writes the results as tables to stream."""
+  stream.write('%-13s %8s %-14s %10s %10s %10s\n' %
+               ('kind', 'lines', 'stage', 'seconds', 'lines/sec', 'peak KiB'))
+  for result in results:
+    for stage in result['stages']:
+      peak = stage['peak_bytes']
+      stream.write('%-13s %8d %-14s %10.4f %10d %10s\n' %
+                   (result['kind'], result['lines'], stage['stage'],
+                    stage['seconds'], stage['lines_per_second'],
+                    '-' if peak is None else peak // 1024))
+  stream.write('\nPhases of the pipeline, in seconds:\n')
+  names = sorted(set(name for result in results
+                     for name in result['phases']))
+  stream.write('%-13s %8s' % ('kind', 'lines') +
+               ''.join(' %s' % name for name in names) + '\n')
+  for result in results:
+    stream.write('%-13s %8d' % (result['kind'], result['lines']) +
+                 ''.join(' %*.4f' % (len(name), result['phases'].get(name, 0))
+                         for name in names) + '\n')
+
+
+def main():
+  kinds = sorted(corpus.KINDS) + ['mixed']
+  sizes = [1000, 10000]
+  seed = 0
+  repeat = 3
+  output_json = False
+  try:
+    (opts, args) = getopt.getopt(sys.argv[1:], '',
+                                 ['kinds=', 'lines=', 'seed=', 'repeat=',
+                                  'json', 'help'])
+  except getopt.GetoptError:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  if args:
+    sys.stderr.write(__doc__)
+    sys.exit(2)
+  for (opt, val) in opts:
+    if opt == '--kinds':
+      kinds = val.split(',')
+      unknown = [kind for kind in kinds
+                 if kind != 'mixed' and kind not in corpus.KINDS]
+      if unknown:
+        sys.stderr.write('Unknown kinds %s, use mixed, %s.\n' %
+                         (', '.join(unknown), ', '.join(sorted(corpus.KINDS))))
+        sys.exit(2)
+    elif opt == '--lines':
+      sizes = [int(size) for size in val.split(',')]
+    elif opt == '--seed':
+      seed = int(val)
+    elif opt == '--repeat':
+      repeat = int(val)
+    elif opt == '--json':
+      output_json = True
+    elif opt == '--help':
+      sys.stdout.write(__doc__)
+      sys.exit(0)
+
+  directory = tempfile.mkdtemp()
+  devnull = open(os.devnull, 'w')
+  backup_err = sys.stderr
+  # The errors found are written, as they would be, but thrown away.
+  sys.stderr = devnull
+  cpplint._cpplint_state.SetReporter(cpplint._TextReporter(devnull))
+  try:
+    results = [Measure(directory, kind, num_lines, seed, repeat)
+               for kind in kinds for num_lines in sizes]
+  finally:
+    sys.stderr = backup_err
+    devnull.close()
+    shutil.rmtree(directory)
+
+  if output_json:
+    json.dump({'python': platform.python_version(), 'seed': seed,
+               'repeat': repeat, 'results': results},
+              sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+  else:
+    PrintResults(results, sys.stdout)
+
+
+if __name__ == '__main__':
+  main()
@@ -41,16 +41,21 @@ We do a small hack, which is to ignore //'s with "'s after them on the
 same line, but it is far from perfect (in either direction).
 """
 
+import bisect
 import codecs
 import copy
 import getopt
+import json
 import math  # for log
 import os
 import re
+import signal
 import sre_compile
 import string
 import sys
+import time
 import unicodedata
+import xml.sax.saxutils
 
 # The allowed extensions for file names
 # This is set by --extensions flag.
@@ -58,9 +63,16 @@ _valid_extensions = set(['c', 'cc', 'cpp', 'cxx', 'c++', 'h', 'hpp', 'hxx',
     'h++'])
 
 _USAGE = """
-Syntax: cpplint.py [--verbose=#] [--output=vs7] [--filter=-x,+y,...]
-                   [--counting=total|toplevel|detailed] [--root=subdir]
-                   [--linelength=digits]
+Syntax: cpplint.py [--verbose=#] [--output=vs7] [--output-file=path]
+                   [--filter=-x,+y,...]
+                   [--counting=total|toplevel|detailed] [--count-only]
+                   [--max-errors-per-category-per-file=#] [--max-errors=#]
+                   [--fail-fast[=category,...]] [--file-time-budget=seconds]
+                   [--regex-timeout=seconds] [--regex-stats=#]
+                   [--profile[=text|json]] [--trace=file]
+                   [--metrics-file=file]
+                   [--long-line-threshold=digits]
+                   [--root=subdir] [--linelength=digits]
         <file> [file] ...
 
   The style guidelines this tries to follow are those in
@@ -72,7 +84,10 @@ Syntax: cpplint.py [--verbose=#] [--output=vs7] [--filter=-x,+y,...]
 
   To suppress false-positive errors of a certain category, add a
   'NOLINT(category)' comment to the line.  NOLINT or NOLINT(*)
-  suppresses errors of all categories on that line.
+  suppresses errors of all categories on that line.  'NOLINTNEXTLINE'
+  does the same for the following line, and a 'NOLINTBEGIN(category)'
+  comment suppresses errors on all lines up to and including the next
+  'NOLINTEND(category)' comment.
 
   The files passed in will be linted; at least one file must be provided.
   Default linted extensions are %s.
@@ -83,7 +98,14 @@ Syntax: cpplint.py [--verbose=#] [--output=vs7] [--filter=-x,+y,...]
 
     output=vs7
       By default, the output is formatted to ease emacs parsing.  Visual Studio
-      compatible output (vs7) may also be used.  Other formats are unsupported.
+      compatible output (vs7) and eclipse output may also be used.
+      For CI systems the structured formats jsonl (one JSON object per
+      error and line), sarif (SARIF 2.1.0) and junit (JUnit XML, one test
+      case per file) are available.  They are written to stdout.
+
+    output-file=path
+      Write the errors to the given file instead of stderr (or stdout for
+      the structured formats).  Output is buffered and written file by file.
 
     verbose=#
       Specify a number 0-5 to restrict errors to certain verbosity levels.
@@ -110,6 +132,98 @@ Syntax: cpplint.py [--verbose=#] [--output=vs7] [--filter=-x,+y,...]
       also be printed. If 'detailed' is provided, then a count
       is provided for each category like 'build/class'.
 
+    count-only
+      Do not print individual errors, only count them.  The counts are
+      reported as with --counting and the exit status is unchanged, which
+      is all a CI gate needs.
+
+    max-errors-per-category-per-file=#
+      Write at most # errors of each category for each file, and print a
+      single summary line with the number of errors dropped instead of the
+      rest.  Once every category that passes the filters has reached the
+      limit, the remaining checks for the file are skipped.
+
+    max-errors=#
+      Write at most # errors in total.  Later errors are dropped and
+      counted in a summary line.  Linting goes on, so that the error counts
+      and the exit status are those of a run without the limit.
+
+    fail-fast=category,...
+      Stop linting at the first error, reported at the current verbosity
+      and passing the filters, whose category starts with one of the given
+      prefixes.  The remaining checks of that file and the remaining files
+      are skipped.  Without a list, any such error stops linting.  Meant for
+      gating, where only whether there is an error matters.
+
+      Examples: --fail-fast
+                --fail-fast=build,runtime/int
+
+    file-time-budget=seconds
+      Once linting a file takes longer than this, skip the checks that scan
+      past the current line, such as those of whitespace/semicolon and
+      runtime/references, for the rest of that file and report it in a
+      lint/budget_exceeded note.  Line-local checks keep running.  The note
+      is not an error and does not change the exit status.
+
+      Examples: --file-time-budget=5
+                --file-time-budget=0.5
+
+    regex-timeout=seconds
+      Abandon a regular expression that runs longer than this, which some
+      patterns may do by backtracking on adversarial lines.  The check that
+      used it and the remaining checks of that line are skipped, and the
+      line and pattern are reported as lint/regex_timeout.  Needs an
+      interval timer (SIGALRM), so it is not available on Windows.
+
+      Examples: --regex-timeout=0.5
+
+    regex-stats=#
+      Count the calls and matches of each regular expression and time them,
+      then write the given number of patterns that took the most time to
+      stderr at exit, to find the ones that dominate the run.  Slows down
+      linting a little.
+
+      Examples: --regex-stats=20
+
+    profile=text|json
+      Time each check, and count its calls and the errors it reported, then
+      write the checks by time and the slowest files with their lines per
+      second to stderr at exit, as a table or as JSON.  The time and errors
+      of a check include those of the checks it calls.  A bare --profile
+      writes a table.
+
+      Examples: --profile
+                --profile=json
+
+    trace=file
+      Write a timeline of the run to the given file as Chrome trace events,
+      which chrome://tracing, Perfetto and other trace viewers open.  Each
+      file gets spans for reading, decoding, building its cleansed lines,
+      the checks of its lines, the include-what-you-use check with the
+      headers it reads, and writing the output.  The spans are tagged with
+      the file, its size in bytes and the id of the process linting it.
+
+      Examples: --trace=cpplint-trace.json
+
+    metrics-file=file
+      Write metrics of the run to the given file in the Prometheus text
+      format, for the textfile collector of the node exporter: the files,
+      bytes and lines linted, the wall and CPU seconds of the run, a
+      histogram of the seconds spent on each file, the compilations and
+      evictions of the regular expression cache, and the errors found by
+      category, whatever the --counting.  The hits of the cache are only
+      counted with --regex-stats.
+
+      Examples: --metrics-file=/var/lib/node_exporter/cpplint.prom
+
+    long-line-threshold=digits
+      Lines longer than this, such as embedded blobs or minified tables,
+      are only checked for tabs, trailing whitespace and their length, which
+      is reported once.  Their contents are otherwise ignored, as if the
+      line were blank.  0 checks all lines in full.  The default is 10000.
+
+      Examples: --long-line-threshold=50000
+
     root=subdir
       The root directory used for deriving header guard CPP variable.
       By default, the header guard CPP variable is calculated as the relative
@@ -195,6 +309,7 @@ _ERROR_CATEGORIES = [
     'build/printf_format',
     'build/storage_class',
     'legal/copyright',
+    'lint/regex_timeout',
     'readability/alt_tokens',
     'readability/braces',
     'readability/casting',
@@ -419,6 +534,10 @@ _CHECK_MACROS = [
     'ASSERT_FALSE_M', 'ASSERT_FALSE',
     ]
 
+# _CHECK_MACROS fused into one regexp.  The alternation tries the _M
+# versions first too.
+_RE_PATTERN_CHECK_MACRO = r'\b(%s)\s*\(' % '|'.join(_CHECK_MACROS)
+
 # Replacement macros for CHECK/DCHECK/EXPECT_TRUE/EXPECT_FALSE
 _CHECK_REPLACEMENT = dict([(m, {}) for m in _CHECK_MACROS])
 
@@ -488,11 +607,113 @@ _MATCH_ASM = re.compile(r'^\s*(?:asm|_asm|__asm|__asm__)'
                         r'\s*[{(]')
 
 
+# Compiled regexps by pattern, see _CacheRegexp.  The cache is bounded, so
+# that a long-running process does not grow with each new pattern.
 _regexp_compile_cache = {}
+_regexp_previous_cache = {}
+
+# How many patterns each of the two generations of the cache holds at most.
+_REGEXP_CACHE_GENERATION = 512
+
+# Compilations and patterns dropped by the cache, for --regex-stats.
+_regexp_cache_misses = 0
+_regexp_cache_evictions = 0
+
+
+class _ErrorSuppressions(object):
+  """Holds the NOLINT suppressions of the file being processed.
+
+  Single-line suppressions (NOLINT, NOLINTNEXTLINE) are kept as a set of line
+  numbers per category.  NOLINTBEGIN/NOLINTEND regions are kept per category
+  as sorted, disjoint intervals, so a region costs the same to look up no
+  matter how many lines it spans.  The category None stands for "all
+  categories".
+  """
+
+  def __init__(self):
+    self.Clear()
+
+  def Clear(self):
+    """Forgets all suppressions."""
+    self._lines = {}
+    # category -> ([begin, ...], [end, ...]), both sorted, intervals disjoint
+    self._ranges = {}
+    # category -> line number of a NOLINTBEGIN still waiting for its NOLINTEND
+    self._open_ranges = {}
+    self._empty = True
+    # Lines whose NOLINT comments have already been parsed.
+    self.parsed_lines = set()
+    # line number -> [(category, confidence, message, ...)] of the errors
+    # found in its NOLINT comments, held back until the line is processed.
+    self.pending_errors = {}
+
+  def AddLine(self, category, linenum):
+    """Suppresses category (or everything, if None) on a single line."""
+    self._lines.setdefault(category, set()).add(linenum)
+    self._empty = False
+
+  def AddRange(self, category, begin, end):
+    """Suppresses category (or everything, if None) on lines begin..end."""
+    begins, ends = self._ranges.setdefault(category, ([], []))
+    # Merge with every interval overlapping or touching [begin, end].
+    first = bisect.bisect_left(ends, begin - 1)
+    last = bisect.bisect_right(begins, end + 1)
+    if first < last:
+      begin = min(begin, begins[first])
+      end = max(end, ends[last - 1])
+    begins[first:last] = [begin]
+    ends[first:last] = [end]
+    self._empty = False
+
+  def BeginRange(self, category, linenum):
+    """Opens a region for category.  Returns False if one is already open."""
+    if category in self._open_ranges:
+      return False
+    self._open_ranges[category] = linenum
+    self._empty = False
+    return True
+
+  def EndRange(self, category, linenum):
+    """Closes the open region for category.  Returns False if none is open."""
+    begin = self._open_ranges.pop(category, None)
+    if begin is None:
+      return False
+    self.AddRange(category, begin, linenum)
+    return True
+
+  def DropOpenRanges(self):
+    """Discards all regions that were opened but never closed.
+
+    Returns:
+      A sorted list of the line numbers on which the regions were opened.
+    """
+    begins = sorted(itervalues(self._open_ranges))
+    self._open_ranges = {}
+    return begins
+
+  def _IsSuppressedIn(self, category, linenum):
+    if linenum in self._lines.get(category, ()):
+      return True
+    begin = self._open_ranges.get(category)
+    if begin is not None and begin <= linenum:
+      return True
+    ranges = self._ranges.get(category)
+    if ranges:
+      begins, ends = ranges
+      i = bisect.bisect_right(begins, linenum) - 1
+      return i >= 0 and ends[i] >= linenum
+    return False
 
-# {str, set(int)}: a map from error categories to sets of linenumbers
-# on which those errors are expected and should be suppressed.
-_error_suppressions = {}
+  def IsSuppressed(self, category, linenum):
+    """Returns True if category is suppressed on linenum."""
+    if self._empty:
+      return False
+    return (self._IsSuppressedIn(category, linenum) or
+            self._IsSuppressedIn(None, linenum))
+
+
+# The NOLINT suppressions of the file currently being processed.
+_error_suppressions = _ErrorSuppressions()
 
 # The root directory used for deriving header guard CPP variable.
 # This is set by --root flag.
@@ -502,6 +723,33 @@ _root = None
 # This is set by --linelength flag.
 _line_length = 80
 
+# Lines longer than this are only given the cheap line-local checks, see
+# CheckLongLine.  0 checks every line in full.
+# This is set by --long-line-threshold flag.
+_long_line_threshold = 10000
+
+# How many seconds a single regular expression may run, 0 for no limit.
+# This is set by --regex-timeout flag, see _SetRegexTimeout.
+_regex_timeout = 0
+
+# The calls, matches and seconds of each regular expression by pattern, or
+# None when they are not recorded, and how many patterns to print at exit.
+# These are set by --regex-stats flag, see _SetRegexStats.
+_regex_stats = None
+_regex_stats_top = 0
+
+# The _CheckProfile timing the checks, or None.
+# This is set by --profile flag, see _SetCheckProfile.
+_check_profile = None
+
+# The _Trace recording the spans of the work on each file, or None.
+# This is set by --trace flag, see _SetTrace.
+_trace = None
+
+# The _RunMetrics counting the work of the run, or None.
+# This is set by --metrics-file flag, see _SetRunMetrics.
+_run_metrics = None
+
 try:
     xrange
 except NameError:
@@ -525,12 +773,27 @@ else:
     itervalues = dict.values
     iteritems = dict.items
 
+if hasattr(unicode, 'isascii'):
+  def IsAscii(text):
+    """Returns true if the string has no characters beyond ASCII."""
+    return text.isascii()
+else:
+  def IsAscii(text):
+    """Returns true if the string has no characters beyond ASCII."""
+    try:
+      text.encode('ascii')
+    except UnicodeError:
+      return False
+    return True
+
 def ParseNolintSuppressions(filename, raw_line, linenum, error):
   """Updates the global list of error-suppressions.
 
   Parses any NOLINT comments on the current line, updating the global
   error_suppressions store.  Reports an error if the NOLINT comment
-  was malformed.
+  was malformed.  Each line is only parsed once per file; the errors found
+  when ParseAllNolintSuppressions parsed it are reported on the next call
+  for the line, so that they come in line order.
 
   Args:
     filename: str, the name of the input file.
@@ -538,34 +801,79 @@ def ParseNolintSuppressions(filename, raw_line, linenum, error):
     linenum: int, the number of the current line.
     error: function, an error handler.
   """
-  matched = Search(r'\bNOLINT(NEXTLINE)?\b(\([^)]+\))?', raw_line)
+  if 'NOLINT' not in raw_line:
+    return
+  if linenum in _error_suppressions.parsed_lines:
+    for args in _error_suppressions.pending_errors.pop(linenum, ()):
+      error(filename, linenum, *args)
+    return
+  _error_suppressions.parsed_lines.add(linenum)
+  matched = Search(r'\bNOLINT(NEXTLINE|BEGIN|END)?\b(\([^)]+\))?', raw_line)
   if matched:
-    if matched.group(1):
-      suppressed_line = linenum + 1
-    else:
-      suppressed_line = linenum
+    kind = matched.group(1)
     category = matched.group(2)
     if category in (None, '(*)'):  # => "suppress all"
-      _error_suppressions.setdefault(None, set()).add(suppressed_line)
-    else:
-      if category.startswith('(') and category.endswith(')'):
-        category = category[1:-1]
-        if category in _ERROR_CATEGORIES:
-          _error_suppressions.setdefault(category, set()).add(suppressed_line)
-        elif category not in _LEGACY_ERROR_CATEGORIES:
+      category = None
+    elif category.startswith('(') and category.endswith(')'):
+      category = category[1:-1]
+      if category not in _ERROR_CATEGORIES:
+        if category not in _LEGACY_ERROR_CATEGORIES:
           error(filename, linenum, 'readability/nolint', 5,
-                'Unknown NOLINT error category: %s' % category)
+                'Unknown NOLINT error category: %s', category)
+        return
+
+    if kind == 'BEGIN':
+      if not _error_suppressions.BeginRange(category, linenum):
+        error(filename, linenum, 'readability/nolint', 5,
+              'NOLINTBEGIN inside a region already opened by NOLINTBEGIN')
+    elif kind == 'END':
+      if not _error_suppressions.EndRange(category, linenum):
+        error(filename, linenum, 'readability/nolint', 5,
+              'NOLINTEND without a matching NOLINTBEGIN')
+    elif kind == 'NEXTLINE':
+      _error_suppressions.AddLine(category, linenum + 1)
+    else:
+      _error_suppressions.AddLine(category, linenum)
+
+
+def ParseAllNolintSuppressions(filename, raw_lines, error):
+  """Parses the NOLINT comments of a whole file up front.
+
+  Files without any NOLINT comment are detected with a single substring
+  search, and no per-line work is done for them.  Scanning the whole file
+  before any check runs lets NOLINTBEGIN/NOLINTEND regions apply to errors
+  reported on any of their lines.  A region that is never closed is reported
+  and suppresses nothing.  The errors found are held back and reported by
+  ParseNolintSuppressions when their line is processed.
+
+  Args:
+    filename: str, the name of the input file.
+    raw_lines: list of str, the lines of the file, with comments.
+    error: function, an error handler.
+  """
+  if 'NOLINT' not in '\n'.join(raw_lines):
+    return
+
+  def Defer(unused_filename, linenum, *args):
+    _error_suppressions.pending_errors.setdefault(linenum, []).append(args)
+
+  for linenum, raw_line in enumerate(raw_lines):
+    if 'NOLINT' in raw_line:
+      ParseNolintSuppressions(filename, raw_line, linenum, Defer)
+  for linenum in _error_suppressions.DropOpenRanges():
+    Defer(filename, linenum, 'readability/nolint', 5,
+          'NOLINTBEGIN without a matching NOLINTEND')
 
 
 def ResetNolintSuppressions():
   """Resets the set of NOLINT suppressions to empty."""
-  _error_suppressions.clear()
+  _error_suppressions.Clear()
 
 
 def IsErrorSuppressedByNolint(category, linenum):
   """Returns true if the specified error category is suppressed on this line.
 
-  Consults the global error_suppressions map populated by
+  Consults the global error_suppressions store populated by
   ParseNolintSuppressions/ResetNolintSuppressions.
 
   Args:
@@ -574,8 +882,129 @@ def IsErrorSuppressedByNolint(category, linenum):
   Returns:
     bool, True iff the error should be suppressed due to a NOLINT comment.
   """
-  return (linenum in _error_suppressions.get(category, set()) or
-          linenum in _error_suppressions.get(None, set()))
+  return _error_suppressions.IsSuppressed(category, linenum)
+
+
+class _RegexTimeout(Exception):
+  """Raised when a regular expression runs longer than --regex-timeout."""
+
+  def __init__(self, pattern=None, subject=None):
+    Exception.__init__(self, pattern)
+    self.pattern = pattern
+    self.subject = subject
+
+
+def _RaiseRegexTimeout(signum, frame):
+  """SIGALRM handler interrupting the regular expression being run."""
+  raise _RegexTimeout()
+
+
+def _SetRegexTimeout(seconds):
+  """Sets the --regex-timeout watchdog, 0 to turn it off.
+
+  The watchdog is an interval timer delivering SIGALRM, which the re module
+  checks for while matching, so it needs signal.setitimer and has to run in
+  the main thread.
+  """
+  global _regex_timeout
+  _regex_timeout = seconds
+  if seconds:
+    signal.signal(signal.SIGALRM, _RaiseRegexTimeout)
+  elif hasattr(signal, 'SIGALRM'):
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+
+
+def _SetRegexStats(top):
+  """Starts recording --regex-stats to print the top patterns, 0 to stop."""
+  global _regex_stats, _regex_stats_top
+  global _regexp_cache_misses, _regexp_cache_evictions
+  _regex_stats = {} if top else None
+  _regex_stats_top = top
+  _regexp_cache_misses = 0
+  _regexp_cache_evictions = 0
+
+
+def _PrintRegexStats():
+  """Writes the patterns that took the most time to stderr."""
+  if _regex_stats is None:
+    return
+  ranked = sorted(_regex_stats.items(), key=lambda item: -item[1][2])
+  sys.stderr.write('Regular expressions taking the most time, %d of %d:\n' %
+                   (min(_regex_stats_top, len(ranked)), len(ranked)))
+  sys.stderr.write('%10s %10s %10s  %s\n' %
+                   ('calls', 'matches', 'seconds', 'pattern'))
+  for pattern, (calls, matches, seconds) in ranked[:_regex_stats_top]:
+    sys.stderr.write('%10d %10d %10.4f  %s\n' %
+                     (calls, matches, seconds, pattern))
+  calls = sum(stats[0] for stats in _regex_stats.values())
+  sys.stderr.write('Regular expression cache: %d hits, %d misses, %d '
+                   'evictions, %d patterns cached\n' %
+                   (calls - _regexp_cache_misses, _regexp_cache_misses,
+                    _regexp_cache_evictions,
+                    len(_regexp_compile_cache) + len(_regexp_previous_cache)))
+
+
+def _TimedRegex(method, pattern, *args):
+  """Calls a method of a compiled regexp under the --regex-timeout watchdog.
+
+  The call is recorded in the --regex-stats as well, when they are on.
+
+  Args:
+    method: The bound method of the compiled regexp, such as its match.
+    pattern: The regexp, for reporting.
+    *args: The arguments of method, the last one being the searched string.
+
+  Returns:
+    The result of method.
+
+  Raises:
+    _RegexTimeout: The call took longer than _regex_timeout seconds.
+  """
+  if _regex_timeout:
+    signal.setitimer(signal.ITIMER_REAL, _regex_timeout)
+  start = time.time()
+  result = None
+  try:
+    result = method(*args)
+    return result
+  except _RegexTimeout:
+    raise _RegexTimeout(pattern, args[-1])
+  finally:
+    if _regex_timeout:
+      signal.setitimer(signal.ITIMER_REAL, 0)
+    if _regex_stats is not None:
+      stats = _regex_stats.setdefault(pattern, [0, 0, 0.0])
+      stats[0] += 1
+      # A substitution matched if it changed the string.
+      if result and (method.__name__ != 'sub' or result != args[-1]):
+        stats[1] += 1
+      stats[2] += time.time() - start
+
+
+def _CacheRegexp(pattern):
+  """Adds a pattern missing from _regexp_compile_cache to it.
+
+  The cache keeps two generations of patterns and looks a pattern up in the
+  current one only, so a lookup stays a single dict probe.  Patterns missing
+  from it are taken over from the previous generation, or else compiled.
+  When the current generation is full it becomes the previous one, and the
+  patterns that were not used since the last time this happened are
+  dropped: a least recently used eviction, by generation.
+
+  Args:
+    pattern: The regexp.
+  """
+  global _regexp_compile_cache, _regexp_previous_cache
+  global _regexp_cache_misses, _regexp_cache_evictions
+  regexp = _regexp_previous_cache.pop(pattern, None)
+  if regexp is None:
+    regexp = sre_compile.compile(pattern)
+    _regexp_cache_misses += 1
+  if len(_regexp_compile_cache) >= _REGEXP_CACHE_GENERATION:
+    _regexp_cache_evictions += len(_regexp_previous_cache)
+    _regexp_previous_cache = _regexp_compile_cache
+    _regexp_compile_cache = {}
+  _regexp_compile_cache[pattern] = regexp
 
 
 def Match(pattern, s):
@@ -584,7 +1013,9 @@ def Match(pattern, s):
   # performance reasons; factoring it out into a separate function turns out
   # to be noticeably expensive.
   if pattern not in _regexp_compile_cache:
-    _regexp_compile_cache[pattern] = sre_compile.compile(pattern)
+    _CacheRegexp(pattern)
+  if _regex_timeout or _regex_stats is not None:
+    return _TimedRegex(_regexp_compile_cache[pattern].match, pattern, s)
   return _regexp_compile_cache[pattern].match(s)
 
 
@@ -602,17 +1033,43 @@ def ReplaceAll(pattern, rep, s):
     string with replacements made (or original string if no replacements)
   """
   if pattern not in _regexp_compile_cache:
-    _regexp_compile_cache[pattern] = sre_compile.compile(pattern)
+    _CacheRegexp(pattern)
+  if _regex_timeout or _regex_stats is not None:
+    return _TimedRegex(_regexp_compile_cache[pattern].sub, pattern, rep, s)
   return _regexp_compile_cache[pattern].sub(rep, s)
 
 
 def Search(pattern, s):
   """Searches the string for the pattern, caching the compiled regexp."""
   if pattern not in _regexp_compile_cache:
-    _regexp_compile_cache[pattern] = sre_compile.compile(pattern)
+    _CacheRegexp(pattern)
+  if _regex_timeout or _regex_stats is not None:
+    return _TimedRegex(_regexp_compile_cache[pattern].search, pattern, s)
   return _regexp_compile_cache[pattern].search(s)
 
 
+def FindAll(pattern, s):
+  """Finds all the matches of the pattern, caching the compiled regexp.
+
+  This is meant for patterns fusing the alternatives of a table into one
+  regexp, with a group for each entry, so that a line is scanned once for
+  the whole table.
+
+  Args:
+    pattern: regex pattern
+    s: search string
+
+  Returns:
+    A list of the match objects of the non-overlapping matches, in order.
+  """
+  if pattern not in _regexp_compile_cache:
+    _CacheRegexp(pattern)
+  regexp = _regexp_compile_cache[pattern]
+  if _regex_timeout or _regex_stats is not None:
+    return _TimedRegex(lambda text: list(regexp.finditer(text)), pattern, s)
+  return list(regexp.finditer(s))
+
+
 class _IncludeState(object):
   """Tracks line numbers for includes, and the order in which includes appear.
 
@@ -778,28 +1235,455 @@ class _IncludeState(object):
     return ''
 
 
+class _Reporter(object):
+  """Writes out the errors found during a lint run.
+
+  Error() hands every error that passes the filters to the reporter of the
+  module state.  ProcessFile brackets the errors of each file with BeginFile
+  and EndFile, and main() brackets the whole run with BeginRun and EndRun.
+  Structured reporters keep only the errors of the current file in memory and
+  write them in one batch when the file is done.  Notes, such as the
+  summaries of the error limits, are written after the errors of their file
+  or, for the run, at its end.
+  """
+
+  def __init__(self, stream=None):
+    """Constructs the reporter.
+
+    Args:
+      stream: The file-like object to write to.  If None, output goes to
+        whatever sys.stderr is when something is written.
+    """
+    self._stream = stream
+    self._pending = []
+    self._notes = []
+
+  def _Write(self, text):
+    if self._stream is None:
+      sys.stderr.write(text)
+    else:
+      self._stream.write(text)
+
+  def BeginRun(self):
+    """Called once before any file is processed."""
+    pass
+
+  def BeginFile(self, filename):
+    """Called before the errors of filename are reported."""
+    pass
+
+  def ReportError(self, filename, linenum, category, confidence, message):
+    """Called for every error that should be printed."""
+    self._pending.append((filename, linenum, category, confidence, message))
+
+  def ReportNote(self, filename, message):
+    """Called for a summary about filename, or about the run if None."""
+    self._notes.append((filename, message))
+
+  def EndFile(self, filename):
+    """Called after the last error of filename has been reported."""
+    self._Flush()
+
+  def EndRun(self):
+    """Called once after all files have been processed."""
+    self._Flush()
+
+  def _Flush(self):
+    if self._pending:
+      self._Write(''.join(self._FormatErrors(self._pending)))
+      self._pending = []
+    if self._notes:
+      self._Write(''.join(self._FormatNotes(self._notes)))
+      self._notes = []
+
+  def _FormatErrors(self, errors):
+    """Yields the text for a batch of (filename, linenum, ...) tuples.
+
+    The default is a line per error in the "emacs" output format.
+    """
+    for filename, linenum, category, confidence, message in errors:
+      yield '%s:%s:  %s  [%s] [%d]\n' % (filename, linenum, message, category,
+                                         confidence)
+
+  def _FormatNotes(self, notes):
+    """Yields the text for a batch of (filename, message) tuples."""
+    for filename, message in notes:
+      if filename is None:
+        yield message + '\n'
+      else:
+        yield '%s: %s\n' % (filename, message)
+
+
+class _TextReporter(_Reporter):
+  """Writes one line per error as soon as it is reported.
+
+  The line format follows the module's output format: "emacs" (the default),
+  "vs7" or "eclipse".
+  """
+
+  def ReportError(self, filename, linenum, category, confidence, message):
+    if _cpplint_state.output_format == 'vs7':
+      self._Write('%s(%s): warning: %s  [%s] [%d]\n' % (
+          filename, linenum, message, category, confidence))
+    elif _cpplint_state.output_format == 'eclipse':
+      self._Write('%s:%s: warning: %s  [%s] [%d]\n' % (
+          filename, linenum, message, category, confidence))
+    else:
+      self._Write('%s:%s:  %s  [%s] [%d]\n' % (
+          filename, linenum, message, category, confidence))
+
+
+class _JsonLinesReporter(_Reporter):
+  """Writes one JSON object per error, one per line."""
+
+  def _FormatErrors(self, errors):
+    for filename, linenum, category, confidence, message in errors:
+      yield json.dumps({'file': filename, 'line': linenum,
+                        'category': category, 'confidence': confidence,
+                        'message': message}) + '\n'
+
+  def _FormatNotes(self, notes):
+    for filename, message in notes:
+      note = {'note': message}
+      if filename is not None:
+        note['file'] = filename
+      yield json.dumps(note) + '\n'
+
+
+class _SarifReporter(_Reporter):
+  """Writes a SARIF 2.1.0 log with a single run.
+
+  The document header is written when the run begins and the results of each
+  file are appended to the open results array when the file is done.
+  """
+
+  def __init__(self, stream=None):
+    super(_SarifReporter, self).__init__(stream)
+    self._first_result = True
+
+  def BeginRun(self):
+    tool = {'driver': {
+        'name': 'cpplint',
+        'informationUri': 'https://github.com/google/styleguide',
+        'rules': [{'id': category} for category in _ERROR_CATEGORIES]}}
+    # Leave the results array open; results are streamed into it.
+    self._Write('{"version": "2.1.0", "$schema": %s, "runs": [{"tool": %s, '
+                '"results": [\n' % (
+                    json.dumps('https://json.schemastore.org/sarif-2.1.0.json'),
+                    json.dumps(tool)))
+
+  def ReportNote(self, filename, message):
+    # Notes are tool execution notifications, written after all results.
+    notification = {'level': 'note', 'message': {'text': message}}
+    if filename is not None:
+      notification['locations'] = [
+          {'physicalLocation': {'artifactLocation': {'uri': filename}}}]
+    self._notes.append(notification)
+
+  def EndFile(self, filename):
+    self._Write(''.join(self._FormatErrors(self._pending)))
+    self._pending = []
+
+  def EndRun(self):
+    self.EndFile(None)
+    if self._notes:
+      self._Write('\n], "invocations": %s}]}\n' % json.dumps(
+          [{'executionSuccessful': True,
+            'toolExecutionNotifications': self._notes}]))
+    else:
+      self._Write('\n]}]}\n')
+
+  def _FormatErrors(self, errors):
+    for filename, linenum, category, confidence, message in errors:
+      location = {'artifactLocation': {'uri': filename}}
+      if linenum > 0:
+        location['region'] = {'startLine': linenum}
+      result = json.dumps({'ruleId': category,
+                           'level': 'warning',
+                           'message': {'text': message},
+                           'locations': [{'physicalLocation': location}],
+                           'properties': {'confidence': confidence}})
+      if self._first_result:
+        self._first_result = False
+        yield result
+      else:
+        yield ',\n' + result
+
+
+class _JUnitReporter(_Reporter):
+  """Writes a JUnit XML test suite with one test case per linted file.
+
+  A file with errors is a failed test case that lists all of its errors.
+  Notes go to the system-err of their test case, or of the suite.
+  """
+
+  def BeginRun(self):
+    self._Write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<testsuite name="cpplint">\n')
+
+  def BeginFile(self, filename):
+    if self._pending:
+      self.EndFile(self._pending[0][0])
+
+  def EndFile(self, filename):
+    failures = ''
+    if self._pending:
+      failures = ('<failure message="%d errors">%s</failure>' % (
+          len(self._pending),
+          xml.sax.saxutils.escape(''.join(self._FormatErrors(self._pending)))))
+      self._pending = []
+    self._Write('<testcase classname="cpplint" name=%s>%s%s</testcase>\n' % (
+        xml.sax.saxutils.quoteattr(filename), failures, self._SystemErr()))
+
+  def EndRun(self):
+    if self._pending:
+      self.EndFile(self._pending[0][0])
+    self._Write('%s</testsuite>\n' % self._SystemErr())
+
+  def _SystemErr(self):
+    """Returns the notes reported so far as a system-err element."""
+    if not self._notes:
+      return ''
+    text = ''.join(self._FormatNotes(self._notes))
+    self._notes = []
+    return '<system-err>%s</system-err>' % xml.sax.saxutils.escape(text)
+
+
+# The reporter classes for the values of --output.
+_REPORTERS = {
+    'emacs': _TextReporter,
+    'vs7': _TextReporter,
+    'eclipse': _TextReporter,
+    'jsonl': _JsonLinesReporter,
+    'sarif': _SarifReporter,
+    'junit': _JUnitReporter,
+    }
+
+
 class _CppLintState(object):
   """Maintains module-wide state.."""
 
   def __init__(self):
     self.verbose_level = 1  # global setting.
     self.error_count = 0    # global count of reported errors
+    # filter decisions per category, valid for the current filter list
+    self._filter_decisions = {}
     # filters to apply when emitting error messages
     self.filters = _DEFAULT_FILTERS[:]
     # backup of filter list. Used to restore the state after each file.
     self._filters_backup = self.filters[:]
     self.counting = 'total'  # In what way are we counting errors?
     self.errors_by_category = {}  # string to int dict storing error counts
+    # error counts by full category, whatever the counting style
+    self.errors_by_full_category = {}
 
     # output format:
     # "emacs" - format that emacs can parse (default)
     # "vs7" - format that Microsoft Visual Studio 7 can parse
     self.output_format = 'emacs'
+    # file to write the output to instead of stderr (stdout for structured
+    # output formats), or None
+    self.output_file = None
+    # file to write the --trace timeline to, or None
+    self.trace_file = None
+    # file to write the --metrics-file metrics to, or None
+    self.metrics_file = None
+    # size in bytes of the file being linted, once it was read
+    self.file_bytes = 0
+    # the _Reporter that writes out errors
+    self.reporter = _TextReporter()
+    # only count errors, without formatting or printing them
+    self.count_only = False
+
+    # --max-errors-per-category-per-file and --max-errors, 0 means no limit
+    self.max_errors_per_category = 0
+    self.max_errors = 0
+    self.errors_written = 0     # errors written during the whole run
+    self.errors_dropped = 0     # errors dropped because of max_errors
+    self.file_error_counts = {}     # category to errors written for the file
+    self.file_errors_dropped = {}   # category to errors dropped for the file
+    self.file_checks_skipped = False  # whether all categories were capped
+    self._file_enabled_categories = None
+
+    # --fail-fast category prefixes, None when linting everything
+    self.fail_fast = None
+    self.failed_fast = False    # whether a --fail-fast error was found
+
+    # --file-time-budget in seconds, 0 means no limit
+    self.file_time_budget = 0
+    self._file_deadline = None
+    # set once the current file ran out of its time budget
+    self.skip_expensive_checks = False
+
+  @property
+  def filters(self):
+    """The list of error-message filters, in the order they are applied."""
+    return self._filters
+
+  @filters.setter
+  def filters(self, filters):
+    self._filters = filters
+    self._filter_decisions = {}
+
+  def IsFiltered(self, category):
+    """Returns True if the filters reject errors of the given category.
+
+    Filters are evaluated left to right, so the last filter whose prefix
+    matches the category decides.  Decisions are memoized per category and
+    the memo is dropped whenever the filter list is replaced or extended.
+
+    Args:
+      category: str, the category of an error, e.g. "whitespace/indent".
+    """
+    decision = self._filter_decisions.get(category)
+    if decision is None:
+      decision = False
+      for one_filter in reversed(self._filters):
+        if category.startswith(one_filter[1:]):
+          if one_filter.startswith('-'):
+            decision = True
+          else:
+            assert one_filter.startswith('+')  # checked for in AddFilters.
+          break
+      self._filter_decisions[category] = decision
+    return decision
 
   def SetOutputFormat(self, output_format):
     """Sets the output format for errors."""
     self.output_format = output_format
 
+  def SetReporter(self, reporter):
+    """Sets the _Reporter that writes out errors."""
+    self.reporter = reporter
+
+  def SetErrorCaps(self, max_errors_per_category, max_errors):
+    """Sets the per-category per-file and the global error limits."""
+    self.max_errors_per_category = max_errors_per_category
+    self.max_errors = max_errors
+
+  def ResetFileErrorCaps(self):
+    """Starts counting errors against the per-file limits afresh."""
+    self.file_error_counts = {}
+    self.file_errors_dropped = {}
+    self.file_checks_skipped = False
+    self._file_enabled_categories = None
+
+  def _AllCategoriesCapped(self):
+    """Returns True if every category passing the filters is capped."""
+    if self._file_enabled_categories is None:
+      self._file_enabled_categories = [
+          category for category in _ERROR_CATEGORIES
+          if not self.IsFiltered(category)]
+    for category in self._file_enabled_categories:
+      if (self.file_error_counts.get(category, 0) <
+          self.max_errors_per_category):
+        return False
+    return True
+
+  def ShouldWriteError(self, category):
+    """Applies the error limits to an error that passed the filters.
+
+    Errors over a limit are only tallied, so that a summary can be reported
+    instead.
+
+    Args:
+      category: str, the category of the error.
+
+    Returns:
+      True if the error should be written.
+
+    Raises:
+      _SkipRemainingChecks: Every category that passes the filters has
+        reached its limit for the current file.
+    """
+    if self.max_errors and self.errors_written >= self.max_errors:
+      self.errors_dropped += 1
+      return False
+    if self.max_errors_per_category:
+      count = self.file_error_counts.get(category, 0)
+      if count >= self.max_errors_per_category:
+        self.file_errors_dropped[category] = (
+            self.file_errors_dropped.get(category, 0) + 1)
+        if self._AllCategoriesCapped():
+          self.file_checks_skipped = True
+          raise _SkipRemainingChecks()
+        return False
+      self.file_error_counts[category] = count + 1
+    self.errors_written += 1
+    return True
+
+  def ReportFileErrorCapSummary(self, filename):
+    """Reports how many errors of each category the file limit dropped."""
+    for category, count in sorted(iteritems(self.file_errors_dropped)):
+      self.reporter.ReportNote(
+          filename, '%d more errors of category %s were dropped (limit is %d '
+          'per category per file)' % (count, category,
+                                      self.max_errors_per_category))
+    if self.file_checks_skipped:
+      self.reporter.ReportNote(
+          filename, 'remaining checks were skipped, every category reached '
+          'its limit')
+
+  def ReportErrorCapSummary(self):
+    """Reports how many errors the --max-errors limit dropped."""
+    if self.errors_dropped:
+      self.reporter.ReportNote(
+          None, '%d more errors were dropped (limit is %d errors)' %
+          (self.errors_dropped, self.max_errors))
+
+  def SetFailFast(self, categories):
+    """Sets the category prefixes that stop the run at their first error.
+
+    Args:
+      categories: A string of comma-separated category prefixes, where an
+        empty string matches every category, or None to disable fail-fast.
+        Empty items of a list are ignored.
+    """
+    if categories is None:
+      self.fail_fast = None
+    elif not categories.strip():
+      self.fail_fast = ['']
+    else:
+      self.fail_fast = [category.strip() for category in categories.split(',')
+                        if category.strip()]
+
+  def FailsFast(self, category):
+    """Returns True, and remembers it, if the error should stop the run."""
+    if self.fail_fast is None:
+      return False
+    for prefix in self.fail_fast:
+      if category.startswith(prefix):
+        self.failed_fast = True
+        return True
+    return False
+
+  def SetFileTimeBudget(self, seconds):
+    """Sets how long the full set of checks may run on a single file."""
+    self.file_time_budget = seconds
+
+  def StartFileTimeBudget(self):
+    """Starts the time budget of a file, enabling all of its checks."""
+    self.skip_expensive_checks = False
+    if self.file_time_budget:
+      self._file_deadline = time.time() + self.file_time_budget
+    else:
+      self._file_deadline = None
+
+  def FileTimeBudgetRanOut(self):
+    """Returns True once, when the current file exceeds its time budget.
+
+    From then on skip_expensive_checks is set for the rest of the file.
+    """
+    if (self._file_deadline is None or self.skip_expensive_checks or
+        time.time() < self._file_deadline):
+      return False
+    self.skip_expensive_checks = True
+    return True
+
+  def SetCountOnly(self, count_only):
+    """Sets whether errors are only counted instead of printed."""
+    self.count_only = count_only
+
   def SetVerboseLevel(self, level):
     """Sets the module's verbosity, and returns the previous setting."""
     last_verbose_level = self.verbose_level
@@ -830,6 +1714,7 @@ class _CppLintState(object):
 
   def AddFilters(self, filters):
     """ Adds more filters to the existing list of error-message filters. """
+    self._filter_decisions = {}
     for filt in filters.split(','):
       clean_filt = filt.strip()
       if clean_filt:
@@ -851,10 +1736,16 @@ class _CppLintState(object):
     """Sets the module's error statistic back to zero."""
     self.error_count = 0
     self.errors_by_category = {}
+    self.errors_by_full_category = {}
+    self.errors_written = 0
+    self.errors_dropped = 0
+    self.failed_fast = False
 
   def IncrementErrorCount(self, category):
     """Bumps the module's error statistic."""
     self.error_count += 1
+    self.errors_by_full_category[category] = (
+        self.errors_by_full_category.get(category, 0) + 1)
     if self.counting in ('toplevel', 'detailed'):
       if self.counting != 'detailed':
         category = category.split('/')[0]
@@ -983,8 +1874,8 @@ class _FunctionState(object):
       error(filename, linenum, 'readability/fn_size', error_level,
             'Small and focused functions are preferred:'
             ' %s has %d non-comment lines'
-            ' (error triggered by exceeding %d lines).'  % (
-                self.current_function, self.lines_in_function, trigger))
+            ' (error triggered by exceeding %d lines).',
+            self.current_function, self.lines_in_function, trigger)
 
   def End(self):
     """Stop analyzing function body."""
@@ -996,6 +1887,11 @@ class _IncludeError(Exception):
   pass
 
 
+class _SkipRemainingChecks(Exception):
+  """Raised by Error() to abandon the remaining checks of the current file."""
+  pass
+
+
 class FileInfo(object):
   """Provides utility functions for filenames.
 
@@ -1098,23 +1994,57 @@ def _ShouldPrintError(category, confidence, linenum):
   if confidence < _cpplint_state.verbose_level:
     return False
 
-  is_filtered = False
-  for one_filter in _Filters():
-    if one_filter.startswith('-'):
-      if category.startswith(one_filter[1:]):
-        is_filtered = True
-    elif one_filter.startswith('+'):
-      if category.startswith(one_filter[1:]):
-        is_filtered = False
-    else:
-      assert False  # should have been checked for in SetFilter.
-  if is_filtered:
+  if _cpplint_state.IsFiltered(category):
     return False
 
   return True
 
 
-def Error(filename, linenum, category, confidence, message):
+def FormatErrorMessage(message, args):
+  """Builds the text of an error message passed to an error callable.
+
+  Args:
+    message: The message, a format string if args is non-empty, or a callable
+      returning the message.
+    args: A tuple of arguments to format into message with the % operator.
+
+  Returns:
+    The formatted message.
+  """
+  if callable(message):
+    message = message()
+  if args:
+    message = message % args
+  return message
+
+
+def _ErrorWithMessageArgs(error):
+  """Adapts an error callable to the calls the checks make.
+
+  The checks pass the message followed by the arguments to format into it
+  (see Error).  Callables with a true message_args attribute, like Error,
+  accept that as is.  Any other callable takes the 5 arguments filename,
+  line number, category, confidence and message, and is wrapped so that it
+  is passed the formatted message.
+
+  Args:
+    error: A callable to which errors are reported.
+
+  Returns:
+    A callable accepting a message followed by its arguments.
+  """
+  if getattr(error, 'message_args', False):
+    return error
+
+  def FormattingError(filename, linenum, category, confidence, message,
+                      *args):
+    error(filename, linenum, category, confidence,
+          FormatErrorMessage(message, args))
+  FormattingError.message_args = True
+  return FormattingError
+
+
+def Error(filename, linenum, category, confidence, message, *args):
   """Logs the fact we've found a lint error.
 
   We log where the error was found, and also our confidence in the error,
@@ -1134,24 +2064,34 @@ def Error(filename, linenum, category, confidence, message):
     confidence: A number from 1-5 representing a confidence score for
       the error, with 5 meaning that we are certain of the problem,
       and 1 meaning that it could be a legitimate construct.
-    message: The error message.
+    message: The error message.  Checks may pass a format string together
+      with args, or a callable returning the message; either way the message
+      is only built once we know the error will be printed.
+    args: Arguments to format into message.
   """
   if _ShouldPrintError(category, confidence, linenum):
     _cpplint_state.IncrementErrorCount(category)
-    if _cpplint_state.output_format == 'vs7':
-      sys.stderr.write('%s(%s): warning: %s  [%s] [%d]\n' % (
-          filename, linenum, message, category, confidence))
-    elif _cpplint_state.output_format == 'eclipse':
-      sys.stderr.write('%s:%s: warning: %s  [%s] [%d]\n' % (
-          filename, linenum, message, category, confidence))
-    else:
-      m = '%s:%s:  %s  [%s] [%d]\n' % (
-          filename, linenum, message, category, confidence)
-      sys.stderr.write(m)
+    fail_fast = _cpplint_state.FailsFast(category)
+    if (_cpplint_state.ShouldWriteError(category) and
+        not _cpplint_state.count_only):
+      _cpplint_state.reporter.ReportError(filename, linenum, category,
+                                          confidence,
+                                          FormatErrorMessage(message, args))
+    if fail_fast:
+      raise _SkipRemainingChecks()
+
+
+# Error formats the messages it writes itself.
+Error.message_args = True
+
 
 # Matches standard C++ escape sequences per 2.13.2.3 of the C++ standard.
 _RE_PATTERN_CLEANSE_LINE_ESCAPES = re.compile(
     r'\\([abfnrtv?"\\\']|\d+|x[0-9a-fA-F]+)')
+# Matches a quote, which starts a string or character literal.
+_RE_PATTERN_QUOTE = re.compile(r'[\'"]')
+# Matches a number literal with digit separators, from its first separator.
+_RE_PATTERN_SEPARATED_DIGITS = re.compile(r'(?:\'?[0-9a-zA-Z_])*')
 # Match a single C style comment on the same line.
 _RE_PATTERN_C_COMMENTS = r'/\*(?:[^*]|\*(?!/))*\*/'
 # Matches multi-line C style comments.
@@ -1312,6 +2252,67 @@ def CleanseComments(line):
   return _RE_PATTERN_CLEANSE_LINE_C_COMMENTS.sub('', line)
 
 
+# Patterns for CleansedLines.WhitespaceCandidates, matching once per line.
+_RE_PATTERN_TAB_LINE = re.compile(r'^[^\n\t]*\t', re.M)
+_RE_PATTERN_TRAILING_SPACE = re.compile(r'[^\S\n]$', re.M | re.U)
+_RE_PATTERN_ODD_INDENT = re.compile(r'^(?: |   )(?! )', re.M)
+
+
+def _LinesMatching(pattern, text):
+  """Returns the set of the numbers of the lines of text matching pattern."""
+  linenums = set()
+  linenum = 0
+  pos = 0
+  for match in pattern.finditer(text):
+    linenum += text.count('\n', pos, match.start())
+    pos = match.start()
+    linenums.add(linenum)
+  return linenums
+
+
+def IsLongLine(line):
+  """Returns true if the line is too long to be checked in full.
+
+  Args:
+    line: The text of the line.
+
+  Returns:
+    True if the line is longer than --long-line-threshold.
+  """
+  return 0 < _long_line_threshold < len(line)
+
+
+# Matches, on a long line, what StructuralCharacters keeps or skips: a
+# string, a character literal not following a digit separator, a comment,
+# or one of the characters that shape blocks and statements.  Every
+# alternative consumes what it starts, so that a single pass is linear.
+_RE_PATTERN_LONG_LINE_TOKEN = re.compile(
+    r'"(?:[^"\\]|\\.)*"?|(?<![0-9A-Fa-f])\'(?:[^\'\\]|\\.)*\'?|'
+    r'//.*|/\*(?:.*?\*/|.*)|[{}();=,]')
+
+
+def StructuralCharacters(line):
+  """Reduces a long line to the characters that shape blocks and statements.
+
+  Long lines are not checked beyond their length, but their braces and
+  semicolons must still be seen by NestingState and by the checks of the
+  lines around them.  Strings, character literals and comments are dropped,
+  along with everything but {}();=, which is done in linear time.  A
+  preprocessor directive is reduced to its name.
+
+  Args:
+    line: The text of the line.
+
+  Returns:
+    The reduced line.
+  """
+  directive = Match(r'\s*#\s*\w*', line)
+  if directive:
+    return directive.group(0)
+  return ''.join(token for token in _RE_PATTERN_LONG_LINE_TOKEN.findall(line)
+                 if len(token) == 1)
+
+
 class CleansedLines(object):
   """Holds 4 copies of all lines with different preprocessing applied to them.
 
@@ -1328,17 +2329,239 @@ class CleansedLines(object):
     self.lines = []
     self.raw_lines = lines
     self.num_lines = len(lines)
+    # Detected for the whole file at once, since nearly every file is ASCII
+    # and its line widths are then just lengths.
+    self.is_ascii = IsAscii(''.join(lines))
     self.lines_without_raw_strings = CleanseRawStrings(lines)
     for linenum in range(len(self.lines_without_raw_strings)):
-      self.lines.append(CleanseComments(
-          self.lines_without_raw_strings[linenum]))
-      elided = self._CollapseStrings(self.lines_without_raw_strings[linenum])
+      line = self.lines_without_raw_strings[linenum]
+      if IsLongLine(line):
+        # Long lines are not analysed beyond CheckLongLine, so spare them
+        # the string and comment cleansing, which is superlinear, but keep
+        # their braces and semicolons for the lines around them.
+        structure = StructuralCharacters(line)
+        self.lines.append(structure)
+        self.elided.append(structure)
+        continue
+      self.lines.append(CleanseComments(line))
+      elided = self._CollapseStrings(line)
       self.elided.append(CleanseComments(elided))
+    # Built lazily by NextStatementBoundary.
+    self._next_terminator = None
+    self._next_open_brace = None
+    # Built lazily by PreviousNonBlank and NextNonBlank.
+    self._prev_nonblank = None
+    self._next_nonblank = None
+    # Built lazily by WhitespaceCandidates.
+    self._whitespace_candidates = None
+    # The characters of the elided line ElidedCharacters was last asked for.
+    self._characters_linenum = None
+    self._characters = None
+    # Built lazily by BlockEnd.
+    self._brace_depth_before = None
+    self._lines_by_brace_depth = None
+    # Built lazily by DisallowMacros.
+    self._disallow_macros = None
+    # Built lazily by InitializerListBefore.
+    self._initializer_list_before = None
 
   def NumLines(self):
     """Returns the number of lines represented."""
     return self.num_lines
 
+  def NextStatementBoundary(self, linenum):
+    """Finds the next lines that terminate a statement or open a block.
+
+    The index behind this is built with a single backward pass over the
+    comment-free lines the first time it is needed, so that repeated forward
+    scans from nearby lines cost O(1) each.
+
+    Args:
+      linenum: The number of the line to start searching from.
+
+    Returns:
+      A tuple (terminator_linenum, brace_linenum).  The first element is the
+      number of the first line at or after linenum containing ';' or '}', the
+      second is the number of the first such line containing '{'.  Either is
+      NumLines() if there is no such line.
+    """
+    if self._next_terminator is None:
+      next_terminator = [self.num_lines] * (self.num_lines + 1)
+      next_open_brace = [self.num_lines] * (self.num_lines + 1)
+      for i in xrange(self.num_lines - 1, -1, -1):
+        line = self.lines[i]
+        if ';' in line or '}' in line:
+          next_terminator[i] = i
+        else:
+          next_terminator[i] = next_terminator[i + 1]
+        if '{' in line:
+          next_open_brace[i] = i
+        else:
+          next_open_brace[i] = next_open_brace[i + 1]
+      self._next_terminator = next_terminator
+      self._next_open_brace = next_open_brace
+    return (self._next_terminator[linenum], self._next_open_brace[linenum])
+
+  def WhitespaceCandidates(self):
+    """Finds the lines the line-local whitespace checks of CheckStyle flag.
+
+    Rather than each check looking at every line, the lines without raw
+    strings are joined and searched once per check, at C speed, for the few
+    lines that need a closer look.
+
+    Returns:
+      A tuple of four sets of line numbers: the lines containing a tab, the
+      lines ending in whitespace, the lines indented with exactly one or
+      three spaces, and the lines that may be wider than --linelength.
+    """
+    if self._whitespace_candidates is None:
+      text = '\n'.join(self.lines_without_raw_strings)
+      # Wide characters take two columns, so a line of another file may be
+      # too wide from half the line length on.
+      max_length = _line_length if self.is_ascii else _line_length // 2
+      self._whitespace_candidates = (
+          _LinesMatching(_RE_PATTERN_TAB_LINE, text),
+          _LinesMatching(_RE_PATTERN_TRAILING_SPACE, text),
+          _LinesMatching(_RE_PATTERN_ODD_INDENT, text),
+          _LinesMatching(re.compile(r'^[^\n]{%d}' % (max_length + 1), re.M),
+                         text))
+    return self._whitespace_candidates
+
+  def ElidedCharacters(self, linenum):
+    """Returns the set of characters on an elided line.
+
+    The spacing checks look at the same line one after another, and most of
+    their rules can only fire around a particular operator or punctuation
+    character.  The set is collected in a single pass over the line and kept
+    until another line is asked for, so that each rule is a set lookup on
+    the lines it cannot apply to.
+
+    Args:
+      linenum: The number of the line.
+
+    Returns:
+      A frozenset of the characters of elided[linenum].
+    """
+    if linenum != self._characters_linenum:
+      self._characters = frozenset(self.elided[linenum])
+      self._characters_linenum = linenum
+    return self._characters
+
+  def _BuildNonBlankIndex(self):
+    """Computes the previous and next non-blank elided line for every line."""
+    prev_nonblank = [-1] * self.num_lines
+    next_nonblank = [-1] * self.num_lines
+    last = -1
+    for i in xrange(self.num_lines):
+      prev_nonblank[i] = last
+      if not IsBlankLine(self.elided[i]):
+        last = i
+    last = -1
+    for i in xrange(self.num_lines - 1, -1, -1):
+      next_nonblank[i] = last
+      if not IsBlankLine(self.elided[i]):
+        last = i
+    self._prev_nonblank = prev_nonblank
+    self._next_nonblank = next_nonblank
+
+  def PreviousNonBlank(self, linenum):
+    """Returns the number of the last non-blank elided line before linenum.
+
+    Returns -1 if there is no such line.
+    """
+    if self._prev_nonblank is None:
+      self._BuildNonBlankIndex()
+    return self._prev_nonblank[linenum]
+
+  def NextNonBlank(self, linenum):
+    """Returns the number of the first non-blank elided line after linenum.
+
+    Returns -1 if there is no such line.
+    """
+    if self._next_nonblank is None:
+      self._BuildNonBlankIndex()
+    return self._next_nonblank[linenum]
+
+  def BlockEnd(self, linenum):
+    """Finds where the braces opened from a line on are all closed again.
+
+    The elided lines are indexed by their brace depth, the count of '{'
+    minus the count of '}' up to their end, in a single pass the first time
+    this is needed, so that the end of every class of a file is not found by
+    scanning each class on its own.
+
+    Args:
+      linenum: The number of the line to start from.
+
+    Returns:
+      The number of the first line at or after linenum at which as many '}'
+      as '{' were seen since the start of linenum, or 0 if there is none.
+    """
+    if self._lines_by_brace_depth is None:
+      lines_by_brace_depth = {}
+      depth = 0
+      self._brace_depth_before = []
+      for i in xrange(self.num_lines):
+        self._brace_depth_before.append(depth)
+        line = self.elided[i]
+        depth += line.count('{') - line.count('}')
+        lines_by_brace_depth.setdefault(depth, []).append(i)
+      self._lines_by_brace_depth = lines_by_brace_depth
+    lines = self._lines_by_brace_depth.get(
+        self._brace_depth_before[linenum], [])
+    index = bisect.bisect_left(lines, linenum)
+    return lines[index] if index < len(lines) else 0
+
+  def DisallowMacros(self, name):
+    """Finds the DISALLOW_* macros naming a class.
+
+    All the macros of the file are found in a single pass the first time
+    this is needed.
+
+    Args:
+      name: The name of the class.
+
+    Returns:
+      The list of the (linenum, macro) tuples of the lines with a
+      DISALLOW_COPY_AND_ASSIGN or DISALLOW_IMPLICIT_CONSTRUCTORS macro taking
+      name, in order, with the first such macro of each line.
+    """
+    if self._disallow_macros is None:
+      self._disallow_macros = {}
+      for i in xrange(self.num_lines):
+        if 'DISALLOW_' not in self.elided[i]:
+          continue
+        for disallow in FindAll(
+            r'\b(DISALLOW_COPY_AND_ASSIGN|DISALLOW_IMPLICIT_CONSTRUCTORS)'
+            r'\(([^()]*)\)', self.elided[i]):
+          macros = self._disallow_macros.setdefault(disallow.group(2), [])
+          if not macros or macros[-1][0] != i:
+            macros.append((i, disallow.group(1)))
+    return self._disallow_macros.get(name, [])
+
+  def InitializerListBefore(self, linenum):
+    """Tells whether the lines before one leave it in an initializer list.
+
+    This is the verdict of IsInitializerList on the closest line before
+    linenum that has one, as the lines are scanned backwards from there.
+    The verdicts of all lines are found in a single forward pass the first
+    time this is needed.
+
+    Args:
+      linenum: The number of the line.
+
+    Returns:
+      True if the closest line before linenum that starts or ends a
+      constructor initializer list starts one, False otherwise.
+    """
+    if self._initializer_list_before is None:
+      before = [False] * (self.num_lines + 1)
+      for i in xrange(2, self.num_lines):
+        verdict = _InitializerListVerdict(self.elided[i])
+        before[i + 1] = before[i] if verdict is None else verdict
+      self._initializer_list_before = before
+    return self._initializer_list_before[linenum]
+
   @staticmethod
   def _CollapseStrings(elided):
     """Collapses strings and chars on a line to simple "" or '' blocks.
@@ -1361,26 +2584,29 @@ class CleansedLines(object):
 
     # Replace quoted strings and digit separators.  Both single quotes
     # and double quotes are processed in the same loop, otherwise
-    # nested quotes wouldn't work.
-    collapsed = ''
+    # nested quotes wouldn't work.  The line is scanned from position to
+    # position rather than cut, so that many quotes cost linear time.
+    collapsed = []
+    pos = 0
     while True:
       # Find the first quote character
-      match = Match(r'^([^\'"]*)([\'"])(.*)$', elided)
+      match = _RE_PATTERN_QUOTE.search(elided, pos)
       if not match:
-        collapsed += elided
+        collapsed.append(elided[pos:])
         break
-      head, quote, tail = match.groups()
+      start = match.start()
+      head = elided[pos:start]
 
-      if quote == '"':
+      if elided[start] == '"':
         # Collapse double quoted strings
-        second_quote = tail.find('"')
+        second_quote = elided.find('"', start + 1)
         if second_quote >= 0:
-          collapsed += head + '""'
-          elided = tail[second_quote + 1:]
+          collapsed.append(head + '""')
+          pos = second_quote + 1
         else:
           # Unmatched double quote, don't bother processing the rest
           # of the line since this is probably a multiline string.
-          collapsed += elided
+          collapsed.append(elided[pos:])
           break
       else:
         # Found single quote, check nearby text to eliminate digit separators.
@@ -1391,20 +2617,42 @@ class CleansedLines(object):
         # separator.  So we are fine as long as we don't see something
         # like "0.'3" (gcc 4.9.0 will not allow this literal).
         if Search(r'\b(?:0[bBxX]?|[1-9])[0-9a-fA-F]*$', head):
-          match_literal = Match(r'^((?:\'?[0-9a-zA-Z_])*)(.*)$', "'" + tail)
-          collapsed += head + match_literal.group(1).replace("'", '')
-          elided = match_literal.group(2)
+          match_literal = _RE_PATTERN_SEPARATED_DIGITS.match(elided, start)
+          collapsed.append(head + match_literal.group(0).replace("'", ''))
+          pos = match_literal.end()
         else:
-          second_quote = tail.find('\'')
+          second_quote = elided.find('\'', start + 1)
           if second_quote >= 0:
-            collapsed += head + "''"
-            elided = tail[second_quote + 1:]
+            collapsed.append(head + "''")
+            pos = second_quote + 1
           else:
             # Unmatched single quote
-            collapsed += elided
+            collapsed.append(elided[pos:])
             break
 
-    return collapsed
+    return ''.join(collapsed)
+
+
+def _EndsWithOperatorKeyword(line, end):
+  """Tells whether line[:end] ends with the operator keyword and spaces.
+
+  This is Search(r'\\boperator\\s*$', line[:end]) without copying the line
+  or scanning all of it, which the expression scans below would do for every
+  angle bracket of a line.
+
+  Args:
+    line: The line.
+    end: The position to look before.
+
+  Returns:
+    True if the operator keyword ends before end, but for spaces.
+  """
+  while end > 0 and line[end - 1].isspace():
+    end -= 1
+  start = end - len('operator')
+  return (start >= 0 and line.startswith('operator', start) and
+          (start == 0 or not (line[start - 1].isalnum() or
+                              line[start - 1] == '_')))
 
 
 def FindEndOfExpressionInLine(line, startpos, stack):
@@ -1433,7 +2681,7 @@ def FindEndOfExpressionInLine(line, startpos, stack):
           stack.pop()
           if not stack:
             return (-1, None)
-      elif i > 0 and Search(r'\boperator\s*$', line[0:i]):
+      elif i > 0 and _EndsWithOperatorKeyword(line, i):
         # operator<, don't add to stack
         continue
       else:
@@ -1462,7 +2710,7 @@ def FindEndOfExpressionInLine(line, startpos, stack):
 
       # Ignore "->" and operator functions
       if (i > 0 and
-          (line[i - 1] == '-' or Search(r'\boperator\s*$', line[0:i - 1]))):
+          (line[i - 1] == '-' or _EndsWithOperatorKeyword(line, i - 1))):
         continue
 
       # Pop the stack if there is a matching '<'.  Otherwise, ignore
@@ -1557,8 +2805,8 @@ def FindStartOfExpressionInLine(line, endpos, stack):
       # Ignore it if it's a "->" or ">=" or "operator>"
       if (i > 0 and
           (line[i - 1] == '-' or
-           Match(r'\s>=\s', line[i - 1:]) or
-           Search(r'\boperator\s*$', line[0:i]))):
+           Match(r'\s>=\s', line[i - 1:i + 3]) or
+           _EndsWithOperatorKeyword(line, i))):
         i -= 1
       else:
         stack.append('>')
@@ -1644,14 +2892,133 @@ def ReverseCloseExpression(clean_lines, linenum, pos):
   return (line, 0, -1)
 
 
-def CheckForCopyright(filename, lines, error):
-  """Logs an error if no Copyright message appears at the top of the file."""
+class _FileFacts(object):
+  """Facts about a whole file that the file-level checks evaluate.
+
+  Rather than each file-level check making its own passes over the lines,
+  the facts they need are gathered together, mostly by searching the joined
+  lines once per fact.  The copyright notice may be in a comment, so it is
+  looked for on construction, before the comments are removed; the rest is
+  gathered by Scan once the lines are cleansed.  ScanRawLines gathers only
+  the facts about bad characters and the final newline.
+
+  Attributes:
+    has_copyright: Whether one of the first 10 lines mentions a copyright.
+    header_guard_nolint: Whether a NOLINT(build/header_guard) comment exists.
+    ifndef: The argument of the first #ifndef, or '' if there is none.
+    ifndef_linenum: The number of the line of the first #ifndef.
+    define: The argument of the first #define, or '' if there is none.
+    endif: The last line starting with #endif, or '' if there is none.
+    endif_linenum: The number of that line.
+    utf8_lines: The numbers of the lines containing replacement characters.
+    nul_lines: The numbers of the lines containing NUL bytes.
+    num_lines: The number of lines, including the markers added to them.
+    missing_final_newline: Whether the file does not end in a newline.
+  """
+
+  def __init__(self, lines):
+    # We'll say it should occur by line 10. Don't forget there's a
+    # dummy line at the front.
+    self.has_copyright = bool(
+        _RE_PATTERN_COPYRIGHT.search('\n'.join(lines[1:11])))
+    self.header_guard_nolint = False
+    self.ifndef = ''
+    self.ifndef_linenum = 0
+    self.define = ''
+    self.endif = ''
+    self.endif_linenum = 0
+    self.utf8_lines = set()
+    self.nul_lines = set()
+    self.num_lines = len(lines)
+    self.missing_final_newline = False
+    self._raw_lines = lines
+    self._has_line_comments = None
+
+  def Scan(self, clean_lines):
+    """Gathers the facts about the cleansed file.
+
+    Args:
+      clean_lines: A CleansedLines instance containing the file.
+    """
+    raw_lines = clean_lines.lines_without_raw_strings
+    self._raw_lines = raw_lines
+    text = '\n'.join(raw_lines)
+
+    self.header_guard_nolint = bool(
+        _RE_PATTERN_HEADER_GUARD_NOLINT.search(text))
+    match = _RE_PATTERN_IFNDEF.search(text)
+    if match:
+      self.ifndef = match.group(1)
+      self.ifndef_linenum = text.count('\n', 0, match.start())
+    match = _RE_PATTERN_DEFINE.search(text)
+    if match:
+      self.define = match.group(1)
+    endif_pos = None
+    for match in _RE_PATTERN_ENDIF.finditer(text):
+      endif_pos = match.start()
+    if endif_pos is not None:
+      self.endif_linenum = text.count('\n', 0, endif_pos)
+      self.endif = raw_lines[self.endif_linenum]
+
+    self.ScanRawLines(clean_lines.raw_lines)
+
+  def ScanRawLines(self, lines):
+    """Gathers the facts about bad characters and the final newline.
+
+    Args:
+      lines: The lines of the file, with multi-line comments removed.
+    """
+    text = '\n'.join(lines)
+    if u('\ufffd') in text:
+      self.utf8_lines = _LinesMatching(_RE_PATTERN_REPLACEMENT_CHARACTER, text)
+    if '\0' in text:
+      self.nul_lines = _LinesMatching(_RE_PATTERN_NUL, text)
+
+    # The array lines() was created by adding two newlines to the
+    # original file (go figure), then splitting on \n.
+    # To verify that the file ends in \n, we just have to make sure the
+    # last-but-two element of lines() exists and is empty.
+    self.num_lines = len(lines)
+    self.missing_final_newline = len(lines) < 3 or bool(lines[-2])
+
+  def HasLineComments(self):
+    """Returns whether any line of the file has a "//" comment."""
+    if self._has_line_comments is None:
+      self._has_line_comments = False
+      for i in xrange(1, len(self._raw_lines) - 1):
+        line = self._raw_lines[i]
+        if '//' not in line or IsLongLine(line):
+          continue
+        if Match(r'^(?:(?:\'(?:\.|[^\'])*\')|(?:"(?:\.|[^"])*")|[^\'"])*//',
+                 line):
+          self._has_line_comments = True
+          break
+    return self._has_line_comments
+
+
+# Patterns gathering the facts of _FileFacts, each searching the whole file.
+_RE_PATTERN_COPYRIGHT = re.compile(r'Copyright', re.I)
+_RE_PATTERN_HEADER_GUARD_NOLINT = re.compile(
+    r'//[^\S\n]*NOLINT\(build/header_guard\)')
+_RE_PATTERN_IFNDEF = re.compile(r'^[^\S\n]*#ifndef[^\S\n]+(\S+)', re.M)
+_RE_PATTERN_DEFINE = re.compile(r'^[^\S\n]*#define[^\S\n]+(\S+)', re.M)
+_RE_PATTERN_ENDIF = re.compile(r'^#endif', re.M)
+_RE_PATTERN_REPLACEMENT_CHARACTER = re.compile(u('\ufffd'))
+_RE_PATTERN_NUL = re.compile('\0')
+
 
-  # We'll say it should occur by line 10. Don't forget there's a
-  # dummy line at the front.
-  for line in range(1, min(len(lines), 11)):
-    if re.search(r'Copyright', lines[line], re.I): break
-  else:                       # means no copyright line was found
+def CheckForCopyright(filename, lines, error, facts=None):
+  """Logs an error if no Copyright message appears at the top of the file.
+
+  Args:
+    filename: The name of the current file.
+    lines: An array of strings, each representing a line of the file.
+    error: The function to call with any errors found.
+    facts: The _FileFacts of the file, gathered from lines if None.
+  """
+  if facts is None:
+    facts = _FileFacts(lines)
+  if not facts.has_copyright:
     error(filename, 0, 'legal/copyright', 5,
           'No copyright message found.  '
           'You should have a line: "Copyright [year] <Copyright Owner>"')
@@ -1694,12 +3061,12 @@ def GetHeaderGuardCPPVariable(filename):
 
   fileinfo = FileInfo(filename)
   file_path_from_root = fileinfo.RepositoryName()
-  if _root:
-    file_path_from_root = re.sub('^' + _root + os.sep, '', file_path_from_root)
+  if _root and file_path_from_root.startswith(_root + os.sep):
+    file_path_from_root = file_path_from_root[len(_root + os.sep):]
   return re.sub(r'[^a-zA-Z0-9]', '_', file_path_from_root).upper() + '_'
 
 
-def CheckForHeaderGuard(filename, clean_lines, error):
+def CheckForHeaderGuard(filename, clean_lines, error, facts=None):
   """Checks that the file contains a header guard.
 
   Logs an error if no #ifndef header guard is present.  For other
@@ -1709,7 +3076,11 @@ def CheckForHeaderGuard(filename, clean_lines, error):
     filename: The name of the C++ header file.
     clean_lines: A CleansedLines instance containing the file.
     error: The function to call with any errors found.
+    facts: The _FileFacts of the file, gathered from clean_lines if None.
   """
+  if facts is None:
+    facts = _FileFacts(clean_lines.raw_lines)
+    facts.Scan(clean_lines)
 
   # Don't check for header guards if there are error suppression
   # comments somewhere in this file.
@@ -1717,36 +3088,21 @@ def CheckForHeaderGuard(filename, clean_lines, error):
   # Because this is silencing a warning for a nonexistent line, we
   # only support the very specific NOLINT(build/header_guard) syntax,
   # and not the general NOLINT or NOLINT(*) syntax.
-  raw_lines = clean_lines.lines_without_raw_strings
-  for i in raw_lines:
-    if Search(r'//\s*NOLINT\(build/header_guard\)', i):
-      return
+  if facts.header_guard_nolint:
+    return
 
+  raw_lines = clean_lines.lines_without_raw_strings
   cppvar = GetHeaderGuardCPPVariable(filename)
 
-  ifndef = ''
-  ifndef_linenum = 0
-  define = ''
-  endif = ''
-  endif_linenum = 0
-  for linenum, line in enumerate(raw_lines):
-    linesplit = line.split()
-    if len(linesplit) >= 2:
-      # find the first occurrence of #ifndef and #define, save arg
-      if not ifndef and linesplit[0] == '#ifndef':
-        # set ifndef to the header guard presented on the #ifndef line.
-        ifndef = linesplit[1]
-        ifndef_linenum = linenum
-      if not define and linesplit[0] == '#define':
-        define = linesplit[1]
-    # find the last occurrence of #endif, save entire line
-    if line.startswith('#endif'):
-      endif = line
-      endif_linenum = linenum
+  ifndef = facts.ifndef
+  ifndef_linenum = facts.ifndef_linenum
+  define = facts.define
+  endif = facts.endif
+  endif_linenum = facts.endif_linenum
 
   if not ifndef or not define or ifndef != define:
     error(filename, 0, 'build/header_guard', 5,
-          'No #ifndef header guard found, suggested CPP variable is: %s' %
+          'No #ifndef header guard found, suggested CPP variable is: %s',
           cppvar)
     return
 
@@ -1760,41 +3116,36 @@ def CheckForHeaderGuard(filename, clean_lines, error):
     ParseNolintSuppressions(filename, raw_lines[ifndef_linenum], ifndef_linenum,
                             error)
     error(filename, ifndef_linenum, 'build/header_guard', error_level,
-          '#ifndef header guard has wrong style, please use: %s' % cppvar)
+          '#ifndef header guard has wrong style, please use: %s', cppvar)
 
   # Check for "//" comments on endif line.
   ParseNolintSuppressions(filename, raw_lines[endif_linenum], endif_linenum,
                           error)
-  match = Match(r'#endif\s*//\s*' + cppvar + r'(_)?\b', endif)
-  if match:
-    if match.group(1) == '_':
+  # The patterns take any guard, which is then compared, so that they do not
+  # depend on the file.
+  match = Match(r'#endif\s*//\s*(\w+)', endif)
+  if match and match.group(1) in (cppvar, cppvar + '_'):
+    if match.group(1) != cppvar:
       # Issue low severity warning for deprecated double trailing underscore
       error(filename, endif_linenum, 'build/header_guard', 0,
-            '#endif line should be "#endif  // %s"' % cppvar)
+            '#endif line should be "#endif  // %s"', cppvar)
     return
 
   # Didn't find the corresponding "//" comment.  If this file does not
   # contain any "//" comments at all, it could be that the compiler
   # only wants "/**/" comments, look for those instead.
-  no_single_line_comments = True
-  for i in xrange(1, len(raw_lines) - 1):
-    line = raw_lines[i]
-    if Match(r'^(?:(?:\'(?:\.|[^\'])*\')|(?:"(?:\.|[^"])*")|[^\'"])*//', line):
-      no_single_line_comments = False
-      break
-
-  if no_single_line_comments:
-    match = Match(r'#endif\s*/\*\s*' + cppvar + r'(_)?\s*\*/', endif)
-    if match:
-      if match.group(1) == '_':
+  if not facts.HasLineComments():
+    match = Match(r'#endif\s*/\*\s*(\w+)\s*\*/', endif)
+    if match and match.group(1) in (cppvar, cppvar + '_'):
+      if match.group(1) != cppvar:
         # Low severity warning for double trailing underscore
         error(filename, endif_linenum, 'build/header_guard', 0,
-              '#endif line should be "#endif  /* %s */"' % cppvar)
+              '#endif line should be "#endif  /* %s */"', cppvar)
       return
 
   # Didn't find anything
   error(filename, endif_linenum, 'build/header_guard', 5,
-        '#endif line should be "#endif  // %s"' % cppvar)
+        '#endif line should be "#endif  // %s"', cppvar)
 
 
 def CheckHeaderFileIncluded(filename, include_state, error):
@@ -1818,11 +3169,11 @@ def CheckHeaderFileIncluded(filename, include_state, error):
         first_include = f[1]
 
   error(filename, first_include, 'build/include', 5,
-        '%s should include its header file %s' % (fileinfo.RepositoryName(),
-                                                  headername))
+        '%s should include its header file %s',
+        fileinfo.RepositoryName(), headername)
 
 
-def CheckForBadCharacters(filename, lines, error):
+def CheckForBadCharacters(filename, lines, error, facts=None):
   """Logs an error for each line containing bad characters.
 
   Two kinds of bad characters:
@@ -1838,30 +3189,33 @@ def CheckForBadCharacters(filename, lines, error):
     filename: The name of the current file.
     lines: An array of strings, each representing a line of the file.
     error: The function to call with any errors found.
+    facts: The _FileFacts of the file, gathered from lines if None.
   """
-  for linenum, line in enumerate(lines):
-    if u('\ufffd') in line:
+  if facts is None:
+    facts = _FileFacts(lines)
+    facts.ScanRawLines(lines)
+  for linenum in sorted(facts.utf8_lines | facts.nul_lines):
+    if linenum in facts.utf8_lines:
       error(filename, linenum, 'readability/utf8', 5,
             'Line contains invalid UTF-8 (or Unicode replacement character).')
-    if '\0' in line:
+    if linenum in facts.nul_lines:
       error(filename, linenum, 'readability/nul', 5, 'Line contains NUL byte.')
 
 
-def CheckForNewlineAtEOF(filename, lines, error):
+def CheckForNewlineAtEOF(filename, lines, error, facts=None):
   """Logs an error if there is no newline char at the end of the file.
 
   Args:
     filename: The name of the current file.
     lines: An array of strings, each representing a line of the file.
     error: The function to call with any errors found.
+    facts: The _FileFacts of the file, gathered from lines if None.
   """
-
-  # The array lines() was created by adding two newlines to the
-  # original file (go figure), then splitting on \n.
-  # To verify that the file ends in \n, we just have to make sure the
-  # last-but-two element of lines() exists and is empty.
-  if len(lines) < 3 or lines[-2]:
-    error(filename, len(lines) - 2, 'whitespace/ending_newline', 5,
+  if facts is None:
+    facts = _FileFacts(lines)
+    facts.ScanRawLines(lines)
+  if facts.missing_final_newline:
+    error(filename, facts.num_lines - 2, 'whitespace/ending_newline', 5,
           'Could not find a newline character at the end of the file.')
 
 
@@ -1932,6 +3286,15 @@ _THREADING_LIST = (
     ('ttyname(', 'ttyname_r(', _UNSAFE_FUNC_PREFIX + r'ttyname\([^)]+\)'),
     )
 
+# The patterns of _THREADING_LIST fused into one regexp, with a group named
+# after each function.  The arguments are only looked ahead at, so that a
+# call nested in the arguments of another one is found as well.
+_RE_PATTERN_THREADING = _UNSAFE_FUNC_PREFIX + '(?:%s)' % '|'.join(
+    '(?P<%s>%s)(?=%s)' % (single_thread_func[:-1], single_thread_func[:-1],
+                          pattern[len(_UNSAFE_FUNC_PREFIX) +
+                                  len(single_thread_func) - 1:])
+    for single_thread_func, _, pattern in _THREADING_LIST)
+
 
 def CheckPosixThreading(filename, clean_lines, linenum, error):
   """Checks for calls to thread-unsafe functions.
@@ -1949,14 +3312,13 @@ def CheckPosixThreading(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
-  for single_thread_func, multithread_safe_func, pattern in _THREADING_LIST:
-    # Additional pattern matching check to confirm that this is the
-    # function we are looking for
-    if Search(pattern, line):
+  called = set(match.lastgroup
+               for match in FindAll(_RE_PATTERN_THREADING, line))
+  for single_thread_func, multithread_safe_func, _ in _THREADING_LIST:
+    if single_thread_func[:-1] in called:
       error(filename, linenum, 'runtime/threadsafe_fn', 2,
-            'Consider using ' + multithread_safe_func +
-            '...) instead of ' + single_thread_func +
-            '...) for improved thread safety.')
+            'Consider using %s...) instead of %s...) for improved thread '
+            'safety.', multithread_safe_func, single_thread_func)
 
 
 def CheckVlogArguments(filename, clean_lines, linenum, error):
@@ -2027,6 +3389,9 @@ class _BlockInfo(object):
     self.open_parentheses = 0
     self.inline_asm = _NO_ASM
     self.check_namespace_indentation = False
+    # The index in the nesting stack of the innermost class or struct this
+    # block is in, or -1.  This is set by NestingState when it is pushed.
+    self.outer_class_depth = -1
 
   def CheckBegin(self, filename, clean_lines, linenum, error):
     """Run checks that applies to text up to the opening brace.
@@ -2100,14 +3465,7 @@ class _ClassInfo(_BlockInfo):
     #   } *x = { ...
     #
     # But it's still good enough for CheckSectionSpacing.
-    self.last_line = 0
-    depth = 0
-    for i in range(linenum, clean_lines.NumLines()):
-      line = clean_lines.elided[i]
-      depth += line.count('{') - line.count('}')
-      if not depth:
-        self.last_line = i
-        break
+    self.last_line = clean_lines.BlockEnd(linenum)
 
   def CheckBegin(self, filename, clean_lines, linenum, error):
     # Look for a bare ':'
@@ -2117,20 +3475,13 @@ class _ClassInfo(_BlockInfo):
   def CheckEnd(self, filename, clean_lines, linenum, error):
     # If there is a DISALLOW macro, it should appear near the end of
     # the class.
-    seen_last_thing_in_class = False
-    for i in xrange(linenum - 1, self.starting_linenum, -1):
-      match = Search(
-          r'\b(DISALLOW_COPY_AND_ASSIGN|DISALLOW_IMPLICIT_CONSTRUCTORS)\(' +
-          self.name + r'\)',
-          clean_lines.elided[i])
-      if match:
-        if seen_last_thing_in_class:
-          error(filename, i, 'readability/constructors', 3,
-                match.group(1) + ' should be the last thing in the class')
-        break
-
-      if not Match(r'^\s*$', clean_lines.elided[i]):
-        seen_last_thing_in_class = True
+    macros = clean_lines.DisallowMacros(self.name)
+    index = bisect.bisect_left(macros, (linenum,)) - 1
+    if index >= 0 and macros[index][0] > self.starting_linenum:
+      (i, macro) = macros[index]
+      if clean_lines.NextNonBlank(i) < linenum:
+        error(filename, i, 'readability/constructors', 3,
+              '%s should be the last thing in the class', macro)
 
     # Check that closing brace is aligned with beginning of the class.
     # Only do this if the closing brace is indented by only whitespaces.
@@ -2142,7 +3493,7 @@ class _ClassInfo(_BlockInfo):
       else:
         parent = 'class ' + self.name
       error(filename, linenum, 'whitespace/indent', 3,
-            'Closing brace should be aligned with beginning of %s' % parent)
+            'Closing brace should be aligned with beginning of %s', parent)
 
 
 class _NamespaceInfo(_BlockInfo):
@@ -2187,11 +3538,10 @@ class _NamespaceInfo(_BlockInfo):
     # expected namespace.
     if self.name:
       # Named namespace
-      if not Match((r'};*\s*(//|/\*).*\bnamespace\s+' + re.escape(self.name) +
-                    r'[\*/\.\\\s]*$'),
-                   line):
+      match = Match(r'};*\s*(//|/\*).*\bnamespace\s+(.*?)[\*/\.\\\s]*$', line)
+      if not match or match.group(2) != self.name:
         error(filename, linenum, 'readability/namespace', 5,
-              'Namespace should be terminated with "// namespace %s"' %
+              'Namespace should be terminated with "// namespace %s"',
               self.name)
     else:
       # Anonymous namespace
@@ -2247,6 +3597,10 @@ class NestingState(object):
     # Stack of _PreprocessorInfo objects.
     self.pp_stack = []
 
+    # The blocks of the stack below this depth may be shared with the
+    # checkpoints of pp_stack, see _UnshareTop.
+    self._shared_depth = 0
+
   def SeenOpenBrace(self):
     """Check if we have seen the opening brace for the innermost block.
 
@@ -2364,7 +3718,7 @@ class NestingState(object):
     if Match(r'^\s*#\s*(if|ifdef|ifndef)\b', line):
       # Beginning of #if block, save the nesting stack here.  The saved
       # stack will allow us to restore the parsing state in the #else case.
-      self.pp_stack.append(_PreprocessorInfo(copy.deepcopy(self.stack)))
+      self.pp_stack.append(_PreprocessorInfo(self._Checkpoint()))
     elif Match(r'^\s*#\s*(else|elif)\b', line):
       # Beginning of #else block
       if self.pp_stack:
@@ -2373,10 +3727,11 @@ class NestingState(object):
           # whole nesting stack up to this point.  This is what we
           # keep after the #endif.
           self.pp_stack[-1].seen_else = True
-          self.pp_stack[-1].stack_before_else = copy.deepcopy(self.stack)
+          self.pp_stack[-1].stack_before_else = self._Checkpoint()
 
         # Restore the stack to how it was before the #if
-        self.stack = copy.deepcopy(self.pp_stack[-1].stack_before_if)
+        self.stack = list(self.pp_stack[-1].stack_before_if)
+        self._shared_depth = len(self.stack)
       else:
         # TODO(unknown): unexpected #else, issue warning?
         pass
@@ -2390,12 +3745,45 @@ class NestingState(object):
           # Here we can just use a shallow copy since we are the last
           # reference to it.
           self.stack = self.pp_stack[-1].stack_before_else
+          self._shared_depth = len(self.stack)
         # Drop the corresponding #if
         self.pp_stack.pop()
       else:
         # TODO(unknown): unexpected #endif, issue warning?
         pass
 
+  def _Checkpoint(self):
+    """Returns a checkpoint of the stack, sharing its blocks.
+
+    Copying the blocks would cost time in the depth of the stack at every
+    preprocessor branch.  Instead, a shared block is copied into the
+    checkpoints holding it before it is modified, see _UnshareTop.
+    """
+    self._shared_depth = len(self.stack)
+    return list(self.stack)
+
+  def _UnshareTop(self):
+    """Lets the innermost block be modified without changing checkpoints."""
+    depth = len(self.stack) - 1
+    if 0 <= depth < self._shared_depth:
+      block = self.stack[depth]
+      saved = copy.copy(block)
+      for pp in self.pp_stack:
+        for checkpoint in (pp.stack_before_if, pp.stack_before_else):
+          if depth < len(checkpoint) and checkpoint[depth] is block:
+            checkpoint[depth] = saved
+      self._shared_depth = depth
+
+  def _Push(self, block):
+    """Pushes a block, with the depth of the innermost class it is in."""
+    if self.stack:
+      top = self.stack[-1]
+      if isinstance(top, _ClassInfo):
+        block.outer_class_depth = len(self.stack) - 1
+      else:
+        block.outer_class_depth = top.outer_class_depth
+    self.stack.append(block)
+
   # TODO(unknown): Update() is too long, but we will refactor later.
   def Update(self, filename, clean_lines, linenum, error):
     """Update nesting state with current line.
@@ -2424,6 +3812,9 @@ class NestingState(object):
     # Count parentheses.  This is to avoid adding struct arguments to
     # the nesting stack.
     if self.stack:
+      # This is the only block modified below, but for new ones and those
+      # whose opening brace is found.
+      self._UnshareTop()
       inner_block = self.stack[-1]
       depth_change = line.count('(') - line.count(')')
       inner_block.open_parentheses += depth_change
@@ -2457,7 +3848,7 @@ class NestingState(object):
         break
 
       new_namespace = _NamespaceInfo(namespace_decl_match.group(1), linenum)
-      self.stack.append(new_namespace)
+      self._Push(new_namespace)
 
       line = namespace_decl_match.group(2)
       if line.find('{') != -1:
@@ -2486,7 +3877,7 @@ class NestingState(object):
       # template argument list.
       end_declaration = len(class_decl_match.group(1))
       if not self.InTemplateArgumentList(clean_lines, linenum, end_declaration):
-        self.stack.append(_ClassInfo(
+        self._Push(_ClassInfo(
             class_decl_match.group(3), class_decl_match.group(2),
             clean_lines, linenum))
         line = class_decl_match.group(4)
@@ -2519,8 +3910,8 @@ class NestingState(object):
           if access_match.group(3):
             slots = access_match.group(3)
           error(filename, linenum, 'whitespace/indent', 3,
-                '%s%s: should be indented +1 space inside %s' % (
-                    access_match.group(2), slots, parent))
+                '%s%s: should be indented +1 space inside %s',
+                access_match.group(2), slots, parent)
 
     # Consume braces or semicolons from what's left of the line
     while True:
@@ -2535,11 +3926,12 @@ class NestingState(object):
         # namespace/class head as complete.  Push a new block onto the
         # stack otherwise.
         if not self.SeenOpenBrace():
+          self._UnshareTop()
           self.stack[-1].seen_open_brace = True
         elif Match(r'^extern\s*"[^"]*"\s*\{', line):
-          self.stack.append(_ExternCInfo())
+          self._Push(_ExternCInfo())
         else:
-          self.stack.append(_BlockInfo(True))
+          self._Push(_BlockInfo(True))
           if _MATCH_ASM.match(line):
             self.stack[-1].inline_asm = _BLOCK_ASM
 
@@ -2567,10 +3959,15 @@ class NestingState(object):
     Returns:
       A _ClassInfo object if we are inside a class, or None otherwise.
     """
-    for i in range(len(self.stack), 0, -1):
-      classinfo = self.stack[i - 1]
-      if isinstance(classinfo, _ClassInfo):
-        return classinfo
+    if not self.stack:
+      return None
+    top = self.stack[-1]
+    if isinstance(top, _ClassInfo):
+      return top
+    # The blocks of a checkpoint are those of the stack it was taken from,
+    # or copies of them, so the depths recorded by _Push hold in both.
+    if top.outer_class_depth >= 0:
+      return self.stack[top.outer_class_depth]
     return None
 
   def CheckCompletedBlocks(self, filename, error):
@@ -2587,11 +3984,11 @@ class NestingState(object):
     for obj in self.stack:
       if isinstance(obj, _ClassInfo):
         error(filename, obj.starting_linenum, 'build/class', 5,
-              'Failed to find complete declaration of class %s' %
+              'Failed to find complete declaration of class %s',
               obj.name)
       elif isinstance(obj, _NamespaceInfo):
         error(filename, obj.starting_linenum, 'build/namespaces', 5,
-              'Failed to find complete declaration of namespace %s' %
+              'Failed to find complete declaration of namespace %s',
               obj.name)
 
 
@@ -2620,8 +4017,9 @@ def CheckForNonStandardConstructs(filename, clean_lines, linenum,
     linenum: The number of the line to check.
     nesting_state: A NestingState instance which maintains information about
                    the current stack of nested blocks being parsed.
-    error: A callable to which errors are reported, which takes 4 arguments:
-           filename, line number, error level, and message
+    error: A callable to which errors are reported, which takes 5 arguments:
+           filename, line number, category, confidence, and message,
+           optionally followed by arguments for the message (see Error).
   """
 
   # Remove comments from the line, but leave in strings for now.
@@ -2638,7 +4036,10 @@ def CheckForNonStandardConstructs(filename, clean_lines, linenum,
   # Remove escaped backslashes before looking for undefined escapes.
   line = line.replace('\\\\', '')
 
-  if Search(r'("|\').*\\(%|\[|\(|{)', line):
+  # Searched from the first quote on, rather than with a regexp starting at
+  # any quote, which is quadratic in the number of quotes of the line.
+  quote = _RE_PATTERN_QUOTE.search(line)
+  if quote and Search(r'\\(%|\[|\(|{)', line[quote.end():]):
     error(filename, linenum, 'build/printf_format', 3,
           '%, [, (, and { are undefined character escapes.  Unescape them.')
 
@@ -2694,18 +4095,20 @@ def CheckForNonStandardConstructs(filename, clean_lines, linenum,
   # non-single-argument constructors which are also technically valid, but
   # strongly suggest something is wrong.
   explicit_constructor_match = Match(
-      r'\s+(?:inline\s+)?(explicit\s+)?(?:inline\s+)?%s\s*'
-      r'\(((?:[^()]|\([^()]*\))*)\)'
-      % re.escape(base_classname),
+      r'\s+(?:inline\s+)?(explicit\s+)?(?:inline\s+)?(\w+)\s*'
+      r'\(((?:[^()]|\([^()]*\))*)\)',
       line)
+  if (explicit_constructor_match and
+      explicit_constructor_match.group(2) != base_classname):
+    explicit_constructor_match = None
 
   if explicit_constructor_match:
     is_marked_explicit = explicit_constructor_match.group(1)
 
-    if not explicit_constructor_match.group(2):
+    if not explicit_constructor_match.group(3):
       constructor_args = []
     else:
-      constructor_args = explicit_constructor_match.group(2).split(',')
+      constructor_args = explicit_constructor_match.group(3).split(',')
 
     # collapse arguments so that commas in template parameter lists and function
     # argument parameter lists don't split arguments in two
@@ -2737,10 +4140,12 @@ def CheckForNonStandardConstructs(filename, clean_lines, linenum,
     initializer_list_constructor = bool(
         onearg_constructor and
         Search(r'\bstd\s*::\s*initializer_list\b', constructor_args[0]))
+    copy_constructor_match = onearg_constructor and Match(
+        r'(const\s+)?(\w+)(\s*<[^>]*>)?(\s+const)?\s*(?:<\w+>\s*)?&',
+        constructor_args[0].strip())
     copy_constructor = bool(
-        onearg_constructor and
-        Match(r'(const\s+)?%s(\s*<[^>]*>)?(\s+const)?\s*(?:<\w+>\s*)?&'
-              % re.escape(base_classname), constructor_args[0].strip()))
+        copy_constructor_match and
+        copy_constructor_match.group(2) == base_classname)
 
     if (not is_marked_explicit and
         onearg_constructor and
@@ -2773,6 +4178,9 @@ def CheckSpacingForFunctionCall(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
+  characters = clean_lines.ElidedCharacters(linenum)
+  if '(' not in characters and ')' not in characters:
+    return
 
   # Since function calls often occur inside if/for/while/switch
   # expressions - which have their own, more liberal conventions - we
@@ -2893,7 +4301,6 @@ def CheckForFunctionLengths(filename, clean_lines, linenum,
   """
   lines = clean_lines.lines
   line = lines[linenum]
-  joined_line = ''
 
   starting_func = False
   regexp = r'(\w(\w|::|\*|\&|\s)*)\('  # decls * & space::name( ...
@@ -2907,28 +4314,25 @@ def CheckForFunctionLengths(filename, clean_lines, linenum,
       starting_func = True
 
   if starting_func:
-    body_found = False
-    for start_linenum in range(linenum, clean_lines.NumLines()):
-      start_line = lines[start_linenum]
-      joined_line += ' ' + start_line.lstrip()
-      if Search(r'(;|})', start_line):  # Declarations and trivial functions
-        body_found = True
-        break                              # ... ignore
-      elif Search(r'{', start_line):
-        body_found = True
-        function = Search(r'((\w|:)*)\(', line).group(1)
-        if Match(r'TEST', function):    # Handle TEST... macros
-          parameter_regexp = Search(r'(\(.*\))', joined_line)
-          if parameter_regexp:             # Ignore bad syntax
-            function += parameter_regexp.group(1)
-        else:
-          function += '()'
-        function_state.Begin(function)
-        break
-    if not body_found:
-      # No body for the function (or evidence of a non-function) was found.
-      error(filename, linenum, 'readability/fn_size', 5,
-            'Lint failed to find start of function body.')
+    (terminator_linenum,
+     brace_linenum) = clean_lines.NextStatementBoundary(linenum)
+    if terminator_linenum <= brace_linenum:
+      if terminator_linenum >= clean_lines.NumLines():
+        # No body for the function (or evidence of a non-function) was found.
+        error(filename, linenum, 'readability/fn_size', 5,
+              'Lint failed to find start of function body.')
+      # Otherwise it is a declaration or trivial function, ignore it.
+    else:
+      function = Search(r'((\w|:)*)\(', line).group(1)
+      if Match(r'TEST', function):    # Handle TEST... macros
+        joined_line = ''.join(' ' + lines[i].lstrip()
+                              for i in xrange(linenum, brace_linenum + 1))
+        parameter_regexp = Search(r'(\(.*\))', joined_line)
+        if parameter_regexp:             # Ignore bad syntax
+          function += parameter_regexp.group(1)
+      else:
+        function += '()'
+      function_state.Begin(function)
   elif Match(r'^\}\s*$', line):  # function end
     function_state.Check(error, filename, linenum)
     function_state.End()
@@ -3015,7 +4419,7 @@ def CheckAccess(filename, clean_lines, linenum, nesting_state, error):
   if nesting_state.stack and isinstance(nesting_state.stack[-1], _ClassInfo):
     if nesting_state.stack[-1].access != 'private':
       error(filename, linenum, 'readability/constructors', 3,
-            '%s must be in the private: section' % matched.group(1))
+            '%s must be in the private: section', matched.group(1))
 
   else:
     # Found DISALLOW* macro outside a class declaration, or perhaps it
@@ -3127,7 +4531,7 @@ def CheckSpacing(filename, clean_lines, linenum, nesting_state, error):
     matched = Match(r'\s*(public|protected|private):', prev_line)
     if matched:
       error(filename, linenum, 'whitespace/blank_line', 3,
-            'Do not leave a blank line after "%s:"' % matched.group(1))
+            'Do not leave a blank line after "%s:"', matched.group(1))
 
   # Next, check comments
   next_line_start = 0
@@ -3138,17 +4542,20 @@ def CheckSpacing(filename, clean_lines, linenum, nesting_state, error):
 
   # get rid of comments and strings
   line = clean_lines.elided[linenum]
+  characters = clean_lines.ElidedCharacters(linenum)
 
   # You shouldn't have spaces before your brackets, except maybe after
   # 'delete []' or 'return []() {};'
-  if Search(r'\w\s+\[', line) and not Search(r'(?:delete|return)\s+\[', line):
+  if ('[' in characters and Search(r'\w\s+\[', line) and
+      not Search(r'(?:delete|return)\s+\[', line)):
     error(filename, linenum, 'whitespace/braces', 5,
           'Extra space before [')
 
   # In range-based for, we wanted spaces before and after the colon, but
   # not around "::" tokens that might appear.
-  if (Search(r'for *\(.*[^:]:[^: ]', line) or
-      Search(r'for *\(.*[^: ]:[^:]', line)):
+  if (':' in characters and '(' in characters and
+      (Search(r'for *\(.*[^:]:[^: ]', line) or
+       Search(r'for *\(.*[^: ]:[^:]', line))):
     error(filename, linenum, 'whitespace/forcolon', 2,
           'Missing space around colon in range-based for loop')
 
@@ -3163,6 +4570,9 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
+  # Replacing the operators of operator methods below only removes
+  # characters, so these are all the characters the rules can see.
+  characters = clean_lines.ElidedCharacters(linenum)
 
   # Don't try to do spacing checks for operator methods.  Do this by
   # replacing the troublesome characters with something else,
@@ -3170,7 +4580,7 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
   #
   # The replacement is done repeatedly to avoid false positives from
   # operators that call operators.
-  while True:
+  while 'operator' in line:
     match = Match(r'^(.*\boperator\b)(\S+)(\s*\(.*)$', line)
     if match:
       line = match.group(1) + ('_' * len(match.group(2))) + match.group(3)
@@ -3181,7 +4591,8 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
   # Otherwise not.  Note we only check for non-spaces on *both* sides;
   # sometimes people put non-spaces on one side when aligning ='s among
   # many lines (not that this is behavior that I approve of...)
-  if ((Search(r'[\w.]=', line) or
+  if ('=' in characters and
+      (Search(r'[\w.]=', line) or
        Search(r'=[\w.]', line))
       and not Search(r'\b(if|while|for) ', line)
       # Operators taken from [lex.operators] in C++11 standard.
@@ -3205,16 +4616,19 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
   #
   # Note that && is not included here.  Those are checked separately
   # in CheckRValueReference
-  match = Search(r'[^<>=!\s](==|!=|<=|>=|\|\|)[^<>=!\s,;\)]', line)
+  match = None
+  if '=' in characters or '|' in characters:
+    match = Search(r'[^<>=!\s](==|!=|<=|>=|\|\|)[^<>=!\s,;\)]', line)
   if match:
     error(filename, linenum, 'whitespace/operators', 3,
-          'Missing spaces around %s' % match.group(1))
-  elif not Match(r'#.*include', line):
+          'Missing spaces around %s', match.group(1))
+  elif (('<' in characters or '>' in characters) and
+        not Match(r'#.*include', line)):
     # Look for < that is not surrounded by spaces.  This is only
     # triggered if both sides are missing spaces, even though
     # technically should should flag if at least one side is missing a
     # space.  This is done to avoid some false positives with shifts.
-    match = Match(r'^(.*[^\s<])<[^\s=<,]', line)
+    match = '<' in characters and Match(r'^(.*[^\s<])<[^\s=<,]', line)
     if match:
       (_, _, end_pos) = CloseExpression(
           clean_lines, linenum, len(match.group(1)))
@@ -3225,7 +4639,7 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
     # Look for > that is not surrounded by spaces.  Similar to the
     # above, we only trigger if both sides are missing spaces to avoid
     # false positives with shifts.
-    match = Match(r'^(.*[^-\s>])>[^\s=>,]', line)
+    match = '>' in characters and Match(r'^(.*[^-\s>])>[^\s=>,]', line)
     if match:
       (_, _, start_pos) = ReverseCloseExpression(
           clean_lines, linenum, len(match.group(1)))
@@ -3238,7 +4652,8 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
   #
   # We also allow operators following an opening parenthesis, since
   # those tend to be macros that deal with operators.
-  match = Search(r'(operator|[^\s(<])(?:L|UL|ULL|l|ul|ull)?<<([^\s,=<])', line)
+  match = '<' in characters and Search(
+      r'(operator|[^\s(<])(?:L|UL|ULL|l|ul|ull)?<<([^\s,=<])', line)
   if (match and not (match.group(1).isdigit() and match.group(2).isdigit()) and
       not (match.group(1) == 'operator' and match.group(2) == ';')):
     error(filename, linenum, 'whitespace/operators', 3,
@@ -3256,16 +4671,16 @@ def CheckOperatorSpacing(filename, clean_lines, linenum, error):
   # follows would be part of an identifier, and there should still be
   # a space separating the template type and the identifier.
   #   type<type<type>> alpha
-  match = Search(r'>>[a-zA-Z_]', line)
-  if match:
+  if '>' in characters and Search(r'>>[a-zA-Z_]', line):
     error(filename, linenum, 'whitespace/operators', 3,
           'Missing spaces around >>')
 
   # There shouldn't be space around unary operators
-  match = Search(r'(!\s|~\s|[\s]--[\s;]|[\s]\+\+[\s;])', line)
+  match = (not characters.isdisjoint('!~-+') and
+           Search(r'(!\s|~\s|[\s]--[\s;]|[\s]\+\+[\s;])', line))
   if match:
     error(filename, linenum, 'whitespace/operators', 4,
-          'Extra space for operator %s' % match.group(1))
+          'Extra space for operator %s', match.group(1))
 
 
 def CheckParenthesisSpacing(filename, clean_lines, linenum, error):
@@ -3278,12 +4693,14 @@ def CheckParenthesisSpacing(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
+  if '(' not in clean_lines.ElidedCharacters(linenum):
+    return
 
   # No spaces after an if, while, switch, or for
   match = Search(r' (if\(|for\(|while\(|switch\()', line)
   if match:
     error(filename, linenum, 'whitespace/parens', 5,
-          'Missing space before ( in %s' % match.group(1))
+          'Missing space before ( in %s', match.group(1))
 
   # For if/for/while/switch, the left and right parens should be
   # consistent about how many spaces are inside the parens, and
@@ -3299,10 +4716,10 @@ def CheckParenthesisSpacing(filename, clean_lines, linenum, error):
               len(match.group(2)) == 1 + len(match.group(4)) or
               not match.group(2) and Search(r'\bfor\s*\(.*; \)', line)):
         error(filename, linenum, 'whitespace/parens', 5,
-              'Mismatching spaces inside () in %s' % match.group(1))
+              'Mismatching spaces inside () in %s', match.group(1))
     if len(match.group(2)) not in [0, 1]:
       error(filename, linenum, 'whitespace/parens', 5,
-            'Should have zero or one spaces inside ( and ) in %s' %
+            'Should have zero or one spaces inside ( and ) in %s',
             match.group(1))
 
 
@@ -3317,6 +4734,7 @@ def CheckCommaSpacing(filename, clean_lines, linenum, error):
   """
   raw = clean_lines.lines_without_raw_strings
   line = clean_lines.elided[linenum]
+  characters = clean_lines.ElidedCharacters(linenum)
 
   # You should always have a space after a comma (either as fn arg or operator)
   #
@@ -3328,7 +4746,8 @@ def CheckCommaSpacing(filename, clean_lines, linenum, error):
   # verify that lines contain missing whitespaces, second pass on raw
   # lines to confirm that those missing whitespaces are not due to
   # elided comments.
-  if (Search(r',[^,\s]', ReplaceAll(r'\boperator\s*,\s*\(', 'F(', line)) and
+  if (',' in characters and
+      Search(r',[^,\s]', ReplaceAll(r'\boperator\s*,\s*\(', 'F(', line)) and
       Search(r',[^,\s]', raw[linenum])):
     error(filename, linenum, 'whitespace/comma', 3,
           'Missing space after ,')
@@ -3337,7 +4756,7 @@ def CheckCommaSpacing(filename, clean_lines, linenum, error):
   # except for few corner cases
   # TODO(unknown): clarify if 'if (1) { return 1;}' is requires one more
   # space after ;
-  if Search(r';[^\s};\\)/]', line):
+  if ';' in characters and Search(r';[^\s};\\)/]', line):
     error(filename, linenum, 'whitespace/semicolon', 3,
           'Missing space after ;')
 
@@ -3352,12 +4771,13 @@ def CheckBracesSpacing(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
+  characters = clean_lines.ElidedCharacters(linenum)
 
   # Except after an opening paren, or after another opening brace (in case of
   # an initializer list, for instance), you should have spaces before your
   # braces. And since you should never have braces at the beginning of a line,
   # this is an easy test.
-  match = Match(r'^(.*[^ ({>]){', line)
+  match = '{' in characters and Match(r'^(.*[^ ({>]){', line)
   if match:
     # Try a bit harder to check for brace initialization.  This
     # happens in one of the following forms:
@@ -3400,21 +4820,22 @@ def CheckBracesSpacing(filename, clean_lines, linenum, error):
             'Missing space before {')
 
   # Make sure '} else {' has spaces.
-  if Search(r'}else', line):
+  if '}' in characters and Search(r'}else', line):
     error(filename, linenum, 'whitespace/braces', 5,
           'Missing space before else')
 
   # You shouldn't have a space before a semicolon at the end of the line.
   # There's a special case for "for" since the style guide allows space before
   # the semicolon there.
-  if Search(r':\s*;\s*$', line):
+  semicolon = ';' in characters
+  if semicolon and Search(r':\s*;\s*$', line):
     error(filename, linenum, 'whitespace/semicolon', 5,
           'Semicolon defining empty statement. Use {} instead.')
-  elif Search(r'^\s*;\s*$', line):
+  elif semicolon and Search(r'^\s*;\s*$', line):
     error(filename, linenum, 'whitespace/semicolon', 5,
           'Line contains only semicolon. If this should be an empty statement, '
           'use {} instead.')
-  elif (Search(r'\s+;\s*$', line) and
+  elif (semicolon and Search(r'\s+;\s*$', line) and
         not Search(r'\bfor\b', line)):
     error(filename, linenum, 'whitespace/semicolon', 5,
           'Extra space before last semicolon. If this should be an empty '
@@ -3890,7 +5311,7 @@ def CheckSectionSpacing(filename, clean_lines, class_info, linenum, error):
           break
       if end_class_head < linenum - 1:
         error(filename, linenum, 'whitespace/blank_line', 3,
-              '"%s:" should be preceded by a blank line' % matched.group(1))
+              '"%s:" should be preceded by a blank line', matched.group(1))
 
 
 def GetPreviousNonBlankLine(clean_lines, linenum):
@@ -3907,12 +5328,9 @@ def GetPreviousNonBlankLine(clean_lines, linenum):
     if this is the first non-blank line.
   """
 
-  prevlinenum = linenum - 1
-  while prevlinenum >= 0:
-    prevline = clean_lines.elided[prevlinenum]
-    if not IsBlankLine(prevline):     # if not a blank line...
-      return (prevline, prevlinenum)
-    prevlinenum -= 1
+  prevlinenum = clean_lines.PreviousNonBlank(linenum)
+  if prevlinenum >= 0:
+    return (clean_lines.elided[prevlinenum], prevlinenum)
   return ('', -1)
 
 
@@ -4213,17 +5631,19 @@ def FindCheckMacro(line):
     (macro name, start position), or (None, -1) if no replaceable
     macro is found.
   """
+  # Every CHECK-like macro contains one of these.
+  if 'CHECK' not in line and '_TRUE' not in line and '_FALSE' not in line:
+    return (None, -1)
+
+  # Find the opening parenthesis of the last call of each macro.  Matching
+  # the whole name makes sure that this is the expected CHECK macro, as
+  # opposed to some other macro that happens to contain the CHECK substring.
+  opening_parenthesis = {}
+  for matched in FindAll(_RE_PATTERN_CHECK_MACRO, line):
+    opening_parenthesis[matched.group(1)] = matched.end() - 1
   for macro in _CHECK_MACROS:
-    i = line.find(macro)
-    if i >= 0:
-      # Find opening parenthesis.  Do a regular expression match here
-      # to make sure that we are matching the expected CHECK macro, as
-      # opposed to some other macro that happens to contain the CHECK
-      # substring.
-      matched = Match(r'^(.*\b' + macro + r'\s*)\(', line)
-      if not matched:
-        continue
-      return (macro, len(matched.group(1)))
+    if macro in opening_parenthesis:
+      return (macro, opening_parenthesis[macro])
   return (None, -1)
 
 
@@ -4340,9 +5760,8 @@ def CheckCheck(filename, clean_lines, linenum, error):
     # We are still keeping the less descriptive message because if lhs
     # or rhs gets long, the error message might become unreadable.
     error(filename, linenum, 'readability/check', 2,
-          'Consider using %s instead of %s(a %s b)' % (
-              _CHECK_REPLACEMENT[check_macro][operator],
-              check_macro, operator))
+          'Consider using %s instead of %s(a %s b)',
+          _CHECK_REPLACEMENT[check_macro][operator], check_macro, operator)
 
 
 def CheckAltTokens(filename, clean_lines, linenum, error):
@@ -4373,8 +5792,13 @@ def CheckAltTokens(filename, clean_lines, linenum, error):
 
   for match in _ALT_TOKEN_REPLACEMENT_PATTERN.finditer(line):
     error(filename, linenum, 'readability/alt_tokens', 2,
-          'Use operator %s instead of %s' % (
-              _ALT_TOKEN_REPLACEMENT[match.group(1)], match.group(1)))
+          'Use operator %s instead of %s',
+          _ALT_TOKEN_REPLACEMENT[match.group(1)], match.group(1))
+
+
+# Widths of recent non-ASCII lines, emptied when it reaches its maximum size.
+_line_width_cache = {}
+_LINE_WIDTH_CACHE_SIZE = 4096
 
 
 def GetLineWidth(line):
@@ -4387,18 +5811,103 @@ def GetLineWidth(line):
     The width of the line in column positions, accounting for Unicode
     combining characters and wide characters.
   """
-  if isinstance(line, unicode):
-    width = 0
-    for uc in unicodedata.normalize('NFC', line):
-      if unicodedata.east_asian_width(uc) in ('W', 'F'):
-        width += 2
-      elif not unicodedata.combining(uc):
-        width += 1
+  if isinstance(line, unicode) and not IsAscii(line):
+    width = _line_width_cache.get(line)
+    if width is None:
+      width = 0
+      for uc in unicodedata.normalize('NFC', line):
+        if unicodedata.east_asian_width(uc) in ('W', 'F'):
+          width += 2
+        elif not unicodedata.combining(uc):
+          width += 1
+      if len(_line_width_cache) >= _LINE_WIDTH_CACHE_SIZE:
+        _line_width_cache.clear()
+      _line_width_cache[line] = width
     return width
   else:
     return len(line)
 
 
+def CheckLongLine(filename, clean_lines, linenum, error):
+  """Checks a line longer than --long-line-threshold.
+
+  Such lines, typically generated tables or minified code, only get the
+  checks whose cost is linear in their length: tabs, trailing whitespace and
+  a single line length error, counting characters rather than their widths.
+  Everything that matches expressions is skipped.
+
+  Args:
+    filename: The name of the current file.
+    clean_lines: A CleansedLines instance containing the file.
+    linenum: The number of the line to check.
+    error: The function to call with any errors found.
+  """
+  line = clean_lines.lines_without_raw_strings[linenum]
+  if '\t' in line:
+    error(filename, linenum, 'whitespace/tab', 1,
+          'Tab found; better to use spaces')
+  if line[-1].isspace():
+    error(filename, linenum, 'whitespace/end_of_line', 4,
+          'Line ends in whitespace.  Consider deleting these extra spaces.')
+  extended_length = int((_line_length * 1.25))
+  if len(line) > extended_length:
+    error(filename, linenum, 'whitespace/line_length', 4,
+          'Lines should very rarely be longer than %i characters',
+          extended_length)
+  elif len(line) > _line_length:
+    error(filename, linenum, 'whitespace/line_length', 2,
+          'Lines should be <= %i characters long', _line_length)
+
+
+def CheckLineLength(filename, clean_lines, linenum, file_extension, error):
+  """Checks the width of a line against --linelength.
+
+  Args:
+    filename: The name of the current file.
+    clean_lines: A CleansedLines instance containing the file.
+    linenum: The number of the line to check.
+    file_extension: The extension (without the dot) of the filename.
+    error: The function to call with any errors found.
+  """
+  line = clean_lines.lines_without_raw_strings[linenum]
+
+  # Check if the line is a header guard.
+  is_header_guard = False
+  if file_extension == 'h':
+    cppvar = GetHeaderGuardCPPVariable(filename)
+    if (line.startswith('#ifndef %s' % cppvar) or
+        line.startswith('#define %s' % cppvar) or
+        line.startswith('#endif  // %s' % cppvar)):
+      is_header_guard = True
+  # #include lines and header guards can be long, since there's no clean way to
+  # split them.
+  #
+  # URLs can be long too.  It's possible to split these, but it makes them
+  # harder to cut&paste.
+  #
+  # The "$Id:...$" comment may also get very long without it being the
+  # developers fault.
+  #
+  # Doxygen documentation copying can get pretty long when using an overloaded
+  # function declaration
+  if (not line.startswith('#include') and not is_header_guard and
+      not Match(r'^\s*//.*http(s?)://\S*$', line) and
+      not Match(r'^// \$Id:.*#[0-9]+ \$$', line) and
+      not Match(r'^\s*/// [@\\](copydoc|copydetails|copybrief) .*$', line)):
+    if clean_lines.is_ascii:
+      line_width = len(line)
+    else:
+      line_width = GetLineWidth(line)
+    extended_length = int((_line_length * 1.25))
+    if line_width > extended_length:
+      error(filename, linenum, 'whitespace/line_length', 4,
+            'Lines should very rarely be longer than %i characters',
+            extended_length)
+    elif line_width > _line_length:
+      error(filename, linenum, 'whitespace/line_length', 2,
+            'Lines should be <= %i characters long', _line_length)
+
+
 def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
                error):
   """Checks rules from the 'C++ style rules' section of cppguide.html.
@@ -4423,7 +5932,10 @@ def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
   raw_lines = clean_lines.lines_without_raw_strings
   line = raw_lines[linenum]
 
-  if line.find('\t') != -1:
+  (tab_lines, trailing_space_lines, odd_indent_lines,
+   long_lines) = clean_lines.WhitespaceCandidates()
+
+  if linenum in tab_lines:
     error(filename, linenum, 'whitespace/tab', 1,
           'Tab found; better to use spaces')
 
@@ -4441,16 +5953,13 @@ def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
   # if(prevodd && match(prevprev, " +for \\(")) complain = 0;
   scope_or_label_pattern = r'\s*\w+\s*:\s*\\?$'
   classinfo = nesting_state.InnermostClass()
-  initial_spaces = 0
   cleansed_line = clean_lines.elided[linenum]
-  while initial_spaces < len(line) and line[initial_spaces] == ' ':
-    initial_spaces += 1
-  if line and line[-1].isspace():
+  if linenum in trailing_space_lines:
     error(filename, linenum, 'whitespace/end_of_line', 4,
           'Line ends in whitespace.  Consider deleting these extra spaces.')
   # There are certain situations we allow one space, notably for
   # section labels, and also lines containing multi-line raw strings.
-  elif ((initial_spaces == 1 or initial_spaces == 3) and
+  elif (linenum in odd_indent_lines and
         not Match(scope_or_label_pattern, cleansed_line) and
         not (clean_lines.raw_lines[linenum] != line and
              Match(r'^\s*""', line))):
@@ -4458,38 +5967,8 @@ def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
           'Weird number of spaces at line-start.  '
           'Are you using a 2-space indent?')
 
-  # Check if the line is a header guard.
-  is_header_guard = False
-  if file_extension == 'h':
-    cppvar = GetHeaderGuardCPPVariable(filename)
-    if (line.startswith('#ifndef %s' % cppvar) or
-        line.startswith('#define %s' % cppvar) or
-        line.startswith('#endif  // %s' % cppvar)):
-      is_header_guard = True
-  # #include lines and header guards can be long, since there's no clean way to
-  # split them.
-  #
-  # URLs can be long too.  It's possible to split these, but it makes them
-  # harder to cut&paste.
-  #
-  # The "$Id:...$" comment may also get very long without it being the
-  # developers fault.
-  #
-  # Doxygen documentation copying can get pretty long when using an overloaded
-  # function declaration
-  if (not line.startswith('#include') and not is_header_guard and
-      not Match(r'^\s*//.*http(s?)://\S*$', line) and
-      not Match(r'^// \$Id:.*#[0-9]+ \$$', line) and
-      not Match(r'^\s*/// [@\\](copydoc|copydetails|copybrief) .*$', line)):
-    line_width = GetLineWidth(line)
-    extended_length = int((_line_length * 1.25))
-    if line_width > extended_length:
-      error(filename, linenum, 'whitespace/line_length', 4,
-            'Lines should very rarely be longer than %i characters' %
-            extended_length)
-    elif line_width > _line_length:
-      error(filename, linenum, 'whitespace/line_length', 2,
-            'Lines should be <= %i characters long' % _line_length)
+  if linenum in long_lines:
+    CheckLineLength(filename, clean_lines, linenum, file_extension, error)
 
   if (cleansed_line.count(';') > 1 and
       # allow simple single line lambdas
@@ -4507,9 +5986,11 @@ def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
           'More than one command on the same line')
 
   # Some more style checks
-  CheckBraces(filename, clean_lines, linenum, error)
-  CheckTrailingSemicolon(filename, clean_lines, linenum, error)
-  CheckEmptyBlockBody(filename, clean_lines, linenum, error)
+  expensive_checks = not _cpplint_state.skip_expensive_checks
+  if expensive_checks:
+    CheckBraces(filename, clean_lines, linenum, error)
+    CheckTrailingSemicolon(filename, clean_lines, linenum, error)
+    CheckEmptyBlockBody(filename, clean_lines, linenum, error)
   CheckAccess(filename, clean_lines, linenum, nesting_state, error)
   CheckSpacing(filename, clean_lines, linenum, nesting_state, error)
   CheckOperatorSpacing(filename, clean_lines, linenum, error)
@@ -4517,8 +5998,9 @@ def CheckStyle(filename, clean_lines, linenum, file_extension, nesting_state,
   CheckCommaSpacing(filename, clean_lines, linenum, error)
   CheckBracesSpacing(filename, clean_lines, linenum, error)
   CheckSpacingForFunctionCall(filename, clean_lines, linenum, error)
-  CheckRValueReference(filename, clean_lines, linenum, nesting_state, error)
-  CheckCheck(filename, clean_lines, linenum, error)
+  if expensive_checks:
+    CheckRValueReference(filename, clean_lines, linenum, nesting_state, error)
+    CheckCheck(filename, clean_lines, linenum, error)
   CheckAltTokens(filename, clean_lines, linenum, error)
   classinfo = nesting_state.InnermostClass()
   if classinfo:
@@ -4677,8 +6159,7 @@ def CheckIncludeLine(filename, clean_lines, linenum, include_state, error):
     duplicate_line = include_state.FindHeader(include)
     if duplicate_line >= 0:
       error(filename, linenum, 'build/include', 4,
-            '"%s" already included at %s:%s' %
-            (include, filename, duplicate_line))
+            '"%s" already included at %s:%s', include, filename, duplicate_line)
     elif (include.endswith('.cc') and
           os.path.dirname(fileinfo.RepositoryName()) != os.path.dirname(include)):
       error(filename, linenum, 'build/include', 4,
@@ -4701,13 +6182,13 @@ def CheckIncludeLine(filename, clean_lines, linenum, include_state, error):
           _ClassifyInclude(fileinfo, include, is_system))
       if error_message:
         error(filename, linenum, 'build/include_order', 4,
-              '%s. Should be: %s.h, c system, c++ system, other.' %
-              (error_message, fileinfo.BaseName()))
+              '%s. Should be: %s.h, c system, c++ system, other.',
+              error_message, fileinfo.BaseName())
       canonical_include = include_state.CanonicalizeAlphabeticalOrder(include)
       if not include_state.IsInAlphabeticalOrder(
           clean_lines, linenum, canonical_include):
         error(filename, linenum, 'build/include_alpha', 4,
-              'Include "%s" not in alphabetical order' % include)
+              'Include "%s" not in alphabetical order', include)
       include_state.SetLastHeader(canonical_include)
 
 
@@ -4851,7 +6332,7 @@ def CheckLanguage(filename, clean_lines, linenum, file_extension,
     match = Search(r'\b(short|long(?! +double)|long long)\b', line)
     if match:
       error(filename, linenum, 'runtime/int', 4,
-            'Use int16/int64/etc, rather than the C type %s' % match.group(1))
+            'Use int16/int64/etc, rather than the C type %s', match.group(1))
 
   # Check if some verboten operator overloading is going on
   # TODO(unknown): catch out-of-line unary operator&:
@@ -4883,15 +6364,14 @@ def CheckLanguage(filename, clean_lines, linenum, file_extension,
       function_name = re.search(r'\b((?:string)?printf)\s*\(',
                                 line, re.I).group(1)
       error(filename, linenum, 'runtime/printf', 4,
-            'Potential format string bug. Do %s("%%s", %s) instead.'
-            % (function_name, match.group(1)))
+            'Potential format string bug. Do %s("%%s", %s) instead.',
+            function_name, match.group(1))
 
   # Check for potential memset bugs like memset(buf, sizeof(buf), 0).
   match = Search(r'memset\s*\(([^,]*),\s*([^,]*),\s*0\s*\)', line)
   if match and not Match(r"^''|-?[0-9]+|0x[0-9A-Fa-f]$", match.group(2)):
     error(filename, linenum, 'runtime/memset', 4,
-          'Did you mean "memset(%s, 0, %s)"?'
-          % (match.group(1), match.group(2)))
+          'Did you mean "memset(%s, 0, %s)"?', match.group(1), match.group(2))
 
   if Search(r'\busing namespace\b', line):
     error(filename, linenum, 'build/namespaces', 5,
@@ -4993,14 +6473,23 @@ def CheckGlobalStatic(filename, clean_lines, linenum, error):
       not Match(r'\s*(<.*>)?(::[a-zA-Z0-9_]+)*\s*\(([^"]|$)', match.group(3))):
     error(filename, linenum, 'runtime/string', 4,
           'For a static/global string constant, use a C style string instead: '
-          '"%schar %s[]".' %
-          (match.group(1), match.group(2)))
+          '"%schar %s[]".', match.group(1), match.group(2))
 
   if Search(r'\b([A-Za-z0-9_]*_)\(\1\)', line):
     error(filename, linenum, 'runtime/init', 4,
           'You seem to be initializing a member variable with itself.')
 
 
+# The patterns of CheckPrintf fused into one regexp.  They are looked ahead
+# at, so that each one is found at its leftmost position even where they
+# overlap, and only where an 's' is, which spares trying them everywhere.
+_RE_PATTERN_PRINTF = (
+    r'(?=s)(?='
+    r'(?P<snprintf>snprintf\s*\((?P<buffer>[^,]*),\s*(?P<size>[0-9]*)\s*,)|'
+    r'\b(?P<sprintf>sprintf\s*\()|'
+    r'\b(?P<strcpy>strcpy|strcat)\s*\()')
+
+
 def CheckPrintf(filename, clean_lines, linenum, error):
   """Check for printf related issues.
 
@@ -5012,22 +6501,26 @@ def CheckPrintf(filename, clean_lines, linenum, error):
   """
   line = clean_lines.elided[linenum]
 
+  matches = {}
+  for match in FindAll(_RE_PATTERN_PRINTF, line):
+    matches.setdefault(match.lastgroup, match)
+
   # When snprintf is used, the second argument shouldn't be a literal.
-  match = Search(r'snprintf\s*\(([^,]*),\s*([0-9]*)\s*,', line)
-  if match and match.group(2) != '0':
+  match = matches.get('snprintf')
+  if match and match.group('size') != '0':
     # If 2nd arg is zero, snprintf is used to calculate size.
     error(filename, linenum, 'runtime/printf', 3,
           'If you can, use sizeof(%s) instead of %s as the 2nd arg '
-          'to snprintf.' % (match.group(1), match.group(2)))
+          'to snprintf.', match.group('buffer'), match.group('size'))
 
   # Check if some verboten C functions are being used.
-  if Search(r'\bsprintf\s*\(', line):
+  if 'sprintf' in matches:
     error(filename, linenum, 'runtime/printf', 5,
           'Never use sprintf. Use snprintf instead.')
-  match = Search(r'\b(strcpy|strcat)\s*\(', line)
+  match = matches.get('strcpy')
   if match:
     error(filename, linenum, 'runtime/printf', 4,
-          'Almost always, snprintf is better than %s' % match.group(1))
+          'Almost always, snprintf is better than %s', match.group('strcpy'))
 
 
 def IsDerivedFunction(clean_lines, linenum):
@@ -5078,36 +6571,51 @@ def IsInitializerList(clean_lines, linenum):
     True if current line appears to be inside constructor initializer
     list, False otherwise.
   """
-  for i in xrange(linenum, 1, -1):
-    line = clean_lines.elided[i]
-    if i == linenum:
-      remove_function_body = Match(r'^(.*)\{\s*$', line)
-      if remove_function_body:
-        line = remove_function_body.group(1)
-
-    if Search(r'\s:\s*\w+[({]', line):
-      # A lone colon tend to indicate the start of a constructor
-      # initializer list.  It could also be a ternary operator, which
-      # also tend to appear in constructor initializer lists as
-      # opposed to parameter lists.
-      return True
-    if Search(r'\}\s*,\s*$', line):
-      # A closing brace followed by a comma is probably the end of a
-      # brace-initialized member in constructor initializer list.
-      return True
-    if Search(r'[{};]\s*$', line):
-      # Found one of the following:
-      # - A closing brace or semicolon, probably the end of the previous
-      #   function.
-      # - An opening brace, probably the start of current class or namespace.
-      #
-      # Current line is probably not inside an initializer list since
-      # we saw one of those things without seeing the starting colon.
-      return False
+  if linenum < 2:
+    return False
+  line = clean_lines.elided[linenum]
+  remove_function_body = Match(r'^(.*)\{\s*$', line)
+  if remove_function_body:
+    line = remove_function_body.group(1)
+  verdict = _InitializerListVerdict(line)
+  if verdict is not None:
+    return verdict
+  # The previous lines are scanned backwards for the first one with a
+  # verdict, once for the whole file.  Got to the beginning of the file
+  # without seeing the start of constructor initializer list otherwise.
+  return clean_lines.InitializerListBefore(linenum)
 
-  # Got to the beginning of the file without seeing the start of
-  # constructor initializer list.
-  return False
+
+def _InitializerListVerdict(line):
+  """Tells whether a line starts or ends a constructor initializer list.
+
+  Args:
+    line: An elided line.
+
+  Returns:
+    True if the line starts an initializer list, False if it ends a block or
+    statement outside of one, None if it tells neither.
+  """
+  if Search(r'\s:\s*\w+[({]', line):
+    # A lone colon tend to indicate the start of a constructor
+    # initializer list.  It could also be a ternary operator, which
+    # also tend to appear in constructor initializer lists as
+    # opposed to parameter lists.
+    return True
+  if Search(r'\}\s*,\s*$', line):
+    # A closing brace followed by a comma is probably the end of a
+    # brace-initialized member in constructor initializer list.
+    return True
+  if Search(r'[{};]\s*$', line):
+    # Found one of the following:
+    # - A closing brace or semicolon, probably the end of the previous
+    #   function.
+    # - An opening brace, probably the start of current class or namespace.
+    #
+    # Current line is probably not inside an initializer list since
+    # we saw one of those things without seeing the starting colon.
+    return False
+  return None
 
 
 def CheckForNonConstReference(filename, clean_lines, linenum,
@@ -5244,10 +6752,18 @@ def CheckForNonConstReference(filename, clean_lines, linenum,
     if not Match(_RE_PATTERN_CONST_REF_PARAM, parameter):
       error(filename, linenum, 'runtime/references', 2,
             'Is this a non-const reference? '
-            'If so, make const or use a pointer: ' +
+            'If so, make const or use a pointer: %s',
             ReplaceAll(' *<', '<', parameter))
 
 
+# What the patterns of CheckCasts all need: a conversion function call, a
+# type in parentheses, or an address taken.
+_RE_PATTERN_CAST_CANDIDATE = (
+    r'\b(?:int|float|double|bool|char|int32|uint32|int64|uint64)\(|'
+    r'\(\w+\s?\**\s?\)|'
+    r'&')
+
+
 def CheckCasts(filename, clean_lines, linenum, error):
   """Various cast related checks.
 
@@ -5258,6 +6774,8 @@ def CheckCasts(filename, clean_lines, linenum, error):
     error: The function to call with any errors found.
   """
   line = clean_lines.elided[linenum]
+  if not Search(_RE_PATTERN_CAST_CANDIDATE, line):
+    return
 
   # Check to see if they're using an conversion function cast.
   # I just try to capture the most common basic types, though there are more.
@@ -5305,7 +6823,7 @@ def CheckCasts(filename, clean_lines, linenum, error):
         not Search(r'new\(\S+\)\s*' + matched_type, line)):
       error(filename, linenum, 'readability/casting', 4,
             'Using deprecated casting style.  '
-            'Use static_cast<%s>(...) instead' %
+            'Use static_cast<%s>(...) instead',
             matched_type)
 
   if not expecting_function:
@@ -5465,8 +6983,8 @@ def CheckCStyleCast(filename, clean_lines, linenum, cast_type, pattern, error):
 
   # At this point, all that should be left is actual casts.
   error(filename, linenum, 'readability/casting', 4,
-        'Using C-style cast.  Use %s<%s>(...) instead' %
-        (cast_type, match.group(1)))
+        'Using C-style cast.  Use %s<%s>(...) instead',
+        cast_type, match.group(1))
 
   return True
 
@@ -5619,19 +7137,20 @@ def UpdateIncludeState(filename, include_dict, io=codecs):
     True if a header was successfully added. False otherwise.
   """
   headerfile = None
-  try:
-    headerfile = io.open(filename, 'r', 'utf8', 'replace')
-  except IOError:
-    return False
-  linenum = 0
-  for line in headerfile:
-    linenum += 1
-    clean_line = CleanseComments(line)
-    match = _RE_PATTERN_INCLUDE.search(clean_line)
-    if match:
-      include = match.group(2)
-      include_dict.setdefault(include, linenum)
-  return True
+  with _TraceSpan('read header', header=filename):
+    try:
+      headerfile = io.open(filename, 'r', 'utf8', 'replace')
+    except IOError:
+      return False
+    linenum = 0
+    for line in headerfile:
+      linenum += 1
+      clean_line = CleanseComments(line)
+      match = _RE_PATTERN_INCLUDE.search(clean_line)
+      if match:
+        include = match.group(2)
+        include_dict.setdefault(include, linenum)
+    return True
 
 
 def CheckForIncludeWhatYouUse(filename, clean_lines, include_state, error,
@@ -5725,7 +7244,7 @@ def CheckForIncludeWhatYouUse(filename, clean_lines, include_state, error,
     if required_header_unstripped.strip('<>"') not in include_dict:
       error(filename, required[required_header_unstripped][0],
             'build/include_what_you_use', 4,
-            'Add #include ' + required_header_unstripped + ' for ' + template)
+            'Add #include %s for %s', required_header_unstripped, template)
 
 
 _RE_PATTERN_EXPLICIT_MAKEPAIR = re.compile(r'\bmake_pair\s*<')
@@ -5831,8 +7350,8 @@ def CheckRedundantVirtual(filename, clean_lines, linenum, error):
     match = Search(r'\b(override|final)\b', line)
     if match:
       error(filename, linenum, 'readability/inheritance', 4,
-            ('"virtual" is redundant since function is '
-             'already declared as "%s"' % match.group(1)))
+            '"virtual" is redundant since function is '
+            'already declared as "%s"', match.group(1))
 
     # Set end_col to check whole lines after we are done with the
     # first line.
@@ -5936,6 +7455,14 @@ def CheckItemIndentationInNamespace(filename, raw_lines_no_comments, linenum,
           'Do not indent within a namespace')
 
 
+# Checks that scan beyond the current line with CloseExpression and friends,
+# and are skipped once a file exceeds its --file-time-budget.
+_EXPENSIVE_CHECKS = ('CheckBraces', 'CheckTrailingSemicolon',
+                     'CheckEmptyBlockBody', 'CheckRValueReference',
+                     'CheckCheck', 'CheckForNonConstReference',
+                     'CheckDefaultLambdaCaptures', 'CheckRedundantVirtual')
+
+
 def ProcessLine(filename, file_extension, clean_lines, line,
                 include_state, function_state, nesting_state, error,
                 extra_check_functions=[]):
@@ -5951,15 +7478,21 @@ def ProcessLine(filename, file_extension, clean_lines, line,
     function_state: A _FunctionState instance which counts function lines, etc.
     nesting_state: A NestingState instance which maintains information about
                    the current stack of nested blocks being parsed.
-    error: A callable to which errors are reported, which takes 4 arguments:
-           filename, line number, error level, and message
+    error: A callable to which errors are reported, which takes 5 arguments:
+           filename, line number, category, confidence, and message.  If it
+           has a true message_args attribute, it is passed the unformatted
+           message followed by its arguments instead (see Error).
     extra_check_functions: An array of additional check functions that will be
                            run on each source line. Each function takes 4
                            arguments: filename, clean_lines, line, error
   """
+  error = _ErrorWithMessageArgs(error)
   raw_lines = clean_lines.raw_lines
   ParseNolintSuppressions(filename, raw_lines[line], line, error)
   nesting_state.Update(filename, clean_lines, line, error)
+  if IsLongLine(clean_lines.lines_without_raw_strings[line]):
+    CheckLongLine(filename, clean_lines, line, error)
+    return
   CheckForNamespaceIndentation(filename, nesting_state, clean_lines, line,
                                error)
   if nesting_state.InAsmBlock(): return
@@ -5968,19 +7501,36 @@ def ProcessLine(filename, file_extension, clean_lines, line,
   CheckStyle(filename, clean_lines, line, file_extension, nesting_state, error)
   CheckLanguage(filename, clean_lines, line, file_extension, include_state,
                 nesting_state, error)
-  CheckForNonConstReference(filename, clean_lines, line, nesting_state, error)
+  expensive_checks = not _cpplint_state.skip_expensive_checks
+  if expensive_checks:
+    CheckForNonConstReference(filename, clean_lines, line, nesting_state,
+                              error)
   CheckForNonStandardConstructs(filename, clean_lines, line,
                                 nesting_state, error)
   CheckVlogArguments(filename, clean_lines, line, error)
   CheckPosixThreading(filename, clean_lines, line, error)
   CheckInvalidIncrement(filename, clean_lines, line, error)
   CheckMakePairUsesDeduction(filename, clean_lines, line, error)
-  CheckDefaultLambdaCaptures(filename, clean_lines, line, error)
-  CheckRedundantVirtual(filename, clean_lines, line, error)
+  if expensive_checks:
+    CheckDefaultLambdaCaptures(filename, clean_lines, line, error)
+    CheckRedundantVirtual(filename, clean_lines, line, error)
   CheckRedundantOverrideOrFinal(filename, clean_lines, line, error)
   for check_fn in extra_check_functions:
     check_fn(filename, clean_lines, line, error)
 
+# These are classes and free functions.  The classes are always
+# mentioned as std::*, but we only catch the free functions if
+# they're not found by ADL.  They're alphabetical by header.
+_UNAPPROVED_CXX11_NAMES = (
+    # type_traits
+    'alignment_of',
+    'aligned_union',
+    )
+
+_RE_PATTERN_UNAPPROVED_CXX11_NAME = r'\bstd::(%s)\b' % '|'.join(
+    _UNAPPROVED_CXX11_NAMES)
+
+
 def FlagCxx11Features(filename, clean_lines, linenum, error):
   """Flag those c++11 features that we only allow in certain places.
 
@@ -6006,25 +7556,41 @@ def FlagCxx11Features(filename, clean_lines, linenum, error):
                                       'system_error',
                                      ):
     error(filename, linenum, 'build/c++11', 5,
-          ('<%s> is an unapproved C++11 header.') % include.group(1))
+          '<%s> is an unapproved C++11 header.', include.group(1))
 
   # The only place where we need to worry about C++11 keywords and library
   # features in preprocessor directives is in macro definitions.
   if Match(r'\s*#', line) and not Match(r'\s*#\s*define\b', line): return
 
-  # These are classes and free functions.  The classes are always
-  # mentioned as std::*, but we only catch the free functions if
-  # they're not found by ADL.  They're alphabetical by header.
-  for top_name in (
-      # type_traits
-      'alignment_of',
-      'aligned_union',
-      ):
-    if Search(r'\bstd::%s\b' % top_name, line):
+  used = set(match.group(1)
+             for match in FindAll(_RE_PATTERN_UNAPPROVED_CXX11_NAME, line))
+  for top_name in _UNAPPROVED_CXX11_NAMES:
+    if top_name in used:
       error(filename, linenum, 'build/c++11', 5,
-            ('std::%s is an unapproved C++11 class or function.  Send c-style '
-             'an example of where it would make your code more readable, and '
-             'they may let you use it.') % top_name)
+            'std::%s is an unapproved C++11 class or function.  Send c-style '
+            'an example of where it would make your code more readable, and '
+            'they may let you use it.', top_name)
+
+
+def _ReportRegexTimeout(filename, lines, linenum, timeout, error):
+  """Reports a check abandoned by the --regex-timeout watchdog.
+
+  Args:
+    filename: The name of the current file.
+    lines: An array of strings, each representing a line of the file.
+    linenum: The number of the line being checked, or None for checks of the
+             whole file, in which case the line holding the searched string
+             is reported if there is one.
+    timeout: The _RegexTimeout raised by the check.
+    error: The function to call with any errors found.
+  """
+  if linenum is None:
+    linenum = 0
+    if timeout.subject in lines:
+      linenum = lines.index(timeout.subject)
+  error(filename, linenum, 'lint/regex_timeout', 1,
+        'Regular expression %r took longer than %g seconds, skipped the '
+        'remaining checks of this line', timeout.pattern, _regex_timeout)
 
 
 def ProcessFileData(filename, file_extension, lines, error,
@@ -6036,12 +7602,15 @@ def ProcessFileData(filename, file_extension, lines, error,
     file_extension: The extension (dot not included) of the file.
     lines: An array of strings, each representing a line of the file, with the
            last element being empty if the file is terminated with a newline.
-    error: A callable to which errors are reported, which takes 4 arguments:
-           filename, line number, error level, and message
+    error: A callable to which errors are reported, which takes 5 arguments:
+           filename, line number, category, confidence, and message.  If it
+           has a true message_args attribute, it is passed the unformatted
+           message followed by its arguments instead (see Error).
     extra_check_functions: An array of additional check functions that will be
                            run on each source line. Each function takes 4
                            arguments: filename, clean_lines, line, error
   """
+  error = _ErrorWithMessageArgs(error)
   lines = (['// marker so line numbers and indices both start at 1'] + lines +
            ['// marker so line numbers end in a known way'])
 
@@ -6050,23 +7619,47 @@ def ProcessFileData(filename, file_extension, lines, error,
   nesting_state = NestingState()
 
   ResetNolintSuppressions()
+  _cpplint_state.StartFileTimeBudget()
 
-  CheckForCopyright(filename, lines, error)
+  facts = _FileFacts(lines)
+  CheckForCopyright(filename, lines, error, facts=facts)
 
   RemoveMultiLineComments(filename, lines, error)
-  clean_lines = CleansedLines(lines)
+  ParseAllNolintSuppressions(filename, lines, error)
+  with _TraceSpan('CleansedLines'):
+    clean_lines = CleansedLines(lines)
+  facts.Scan(clean_lines)
 
   if file_extension == 'h':
-    CheckForHeaderGuard(filename, clean_lines, error)
-
-  for line in range(clean_lines.NumLines()):
-    ProcessLine(filename, file_extension, clean_lines, line,
-                include_state, function_state, nesting_state, error,
-                extra_check_functions)
-    FlagCxx11Features(filename, clean_lines, line, error)
-  nesting_state.CheckCompletedBlocks(filename, error)
+    try:
+      CheckForHeaderGuard(filename, clean_lines, error, facts=facts)
+    except _RegexTimeout as timeout:
+      _ReportRegexTimeout(filename, lines, None, timeout, error)
+
+  with _TraceSpan('lines'):
+    for line in range(clean_lines.NumLines()):
+      if _cpplint_state.FileTimeBudgetRanOut():
+        # A note rather than an error, so that a file that is otherwise
+        # clean does not fail the run.
+        _cpplint_state.reporter.ReportNote(
+            filename, 'exceeded its time budget of %g seconds at line %d, '
+            'skipped %s on the remaining lines  [lint/budget_exceeded]' %
+            (_cpplint_state.file_time_budget, line,
+             ', '.join(_EXPENSIVE_CHECKS)))
+      try:
+        ProcessLine(filename, file_extension, clean_lines, line,
+                    include_state, function_state, nesting_state, error,
+                    extra_check_functions)
+        FlagCxx11Features(filename, clean_lines, line, error)
+      except _RegexTimeout as timeout:
+        _ReportRegexTimeout(filename, lines, line, timeout, error)
+    nesting_state.CheckCompletedBlocks(filename, error)
 
-  CheckForIncludeWhatYouUse(filename, clean_lines, include_state, error)
+  with _TraceSpan('CheckForIncludeWhatYouUse'):
+    try:
+      CheckForIncludeWhatYouUse(filename, clean_lines, include_state, error)
+    except _RegexTimeout as timeout:
+      _ReportRegexTimeout(filename, lines, None, timeout, error)
 
   # Check that the .cc file has included its header if it exists.
   if file_extension == 'cc':
@@ -6074,9 +7667,9 @@ def ProcessFileData(filename, file_extension, lines, error,
 
   # We check here rather than inside ProcessLine so that we see raw
   # lines rather than "cleaned" lines.
-  CheckForBadCharacters(filename, lines, error)
+  CheckForBadCharacters(filename, lines, error, facts=facts)
 
-  CheckForNewlineAtEOF(filename, lines, error)
+  CheckForNewlineAtEOF(filename, lines, error, facts=facts)
 
 def ProcessConfigOverrides(filename):
   """ Loads the configuration files and processes the config overrides.
@@ -6154,6 +7747,323 @@ def ProcessConfigOverrides(filename):
   return True
 
 
+def ReadFileLines(filename):
+  """Reads the lines of a file, with their end-of-line sequences removed.
+
+  The file is read and decoded as UTF-8 in bulk, replacing invalid bytes
+  only if decoding it strictly fails.  Its LF and CR-LF sequences are
+  counted before it is split, so that the lines only need to be visited one
+  by one if some of them end in CR-LF, and line numbers are only recorded
+  if the two are mixed.
+
+  We don't issue any warnings if all lines are uniformly LF or CR-LF, since
+  critique can handle these just fine, and the style guide doesn't dictate
+  a particular end of line sequence.  We can't depend on os.linesep to
+  determine what the desired end-of-line sequence should be, since that
+  will return the server-side end-of-line sequence.
+
+  Args:
+    filename: The name of the file to read, or "-" for the standard input,
+              following the UNIX convention.
+
+  The size of the file is recorded in _cpplint_state.file_bytes.
+
+  Returns:
+    A tuple (lines, crlf_lines).  lines is the list of lines, the last one
+    being empty if the file ends with a newline.  crlf_lines is the list of
+    the numbers of the lines ending in CR-LF if the file mixes them with
+    lines ending in LF, and an empty list otherwise.
+
+  Raises:
+    IOError: The file cannot be read.
+  """
+  _cpplint_state.file_bytes = 0
+  with _TraceSpan('read'):
+    if filename == '-':
+      data = getattr(sys.stdin, 'buffer', sys.stdin).read()
+    else:
+      with open(filename, 'rb') as source:
+        data = source.read()
+    _cpplint_state.file_bytes = len(data)
+  with _TraceSpan('decode'):
+    try:
+      text = data.decode('utf8')
+    except UnicodeDecodeError:
+      text = data.decode('utf8', 'replace')
+    lines = text.split('\n')
+
+    crlf_count = data.count(b'\r\n')
+    if not crlf_count:
+      return (lines, [])
+    # The last line is not followed by a newline, so it keeps any '\r'.
+    mixed = crlf_count < data.count(b'\n')
+    crlf_lines = []
+    for linenum in xrange(len(lines) - 1):
+      if lines[linenum].endswith('\r'):
+        lines[linenum] = lines[linenum].rstrip('\r')
+        if mixed:
+          crlf_lines.append(linenum + 1)
+    return (lines, crlf_lines)
+
+
+class _CheckProfile(object):
+  """Times the checks for --profile.
+
+  While it is installed, the checks that ProcessFileData, ProcessLine,
+  CheckStyle and CheckLanguage call, that is the public functions of this
+  module taking the filename first, are replaced by wrappers recording their
+  calls, time and the errors reported while they ran.  Nothing is wrapped
+  without --profile, so that the checks cost nothing more then.
+  """
+
+  # The functions whose checks are timed.
+  _CALLERS = ('ProcessFileData', 'ProcessLine', 'CheckStyle', 'CheckLanguage')
+
+  # How many of the slowest files are written in the table.
+  _SLOWEST_FILES = 10
+
+  def __init__(self, output_format):
+    self.output_format = output_format
+    # [calls, seconds, errors] by check name.
+    self.checks = {}
+    # (filename, lines, seconds, errors) of each file.
+    self.files = []
+    self._originals = {}
+
+  def Install(self):
+    """Replaces the checks of the module by timing wrappers."""
+    module = globals()
+    for caller in self._CALLERS:
+      caller = self._originals.get(caller, module[caller])
+      for name in caller.__code__.co_names:
+        code = getattr(module.get(name), '__code__', None)
+        if (code and code.co_varnames[:1] == ('filename',) and
+            not name.startswith('_') and name not in self._originals):
+          self._originals[name] = module[name]
+          module[name] = self._Wrap(name, module[name])
+
+  def Uninstall(self):
+    """Puts the checks of the module back."""
+    globals().update(self._originals)
+    self._originals = {}
+
+  def _Wrap(self, name, check):
+    stats = self.checks.setdefault(name, [0, 0.0, 0])
+    def Profiled(*args, **kwargs):
+      errors = _cpplint_state.error_count
+      start = time.time()
+      try:
+        return check(*args, **kwargs)
+      finally:
+        stats[0] += 1
+        stats[1] += time.time() - start
+        stats[2] += _cpplint_state.error_count - errors
+    return Profiled
+
+  def AddFile(self, filename, num_lines, seconds, errors):
+    self.files.append((filename, num_lines, seconds, errors))
+
+  def Print(self, stream):
+    """Writes the checks by time and the slowest files to stream."""
+    checks = sorted([(name, stats) for name, stats in self.checks.items()
+                     if stats[0]], key=lambda item: -item[1][1])
+    files = sorted(self.files, key=lambda item: -item[2])
+    if self.output_format == 'json':
+      json.dump({'checks': [{'check': name, 'calls': calls,
+                             'seconds': seconds, 'errors': errors}
+                            for name, (calls, seconds, errors) in checks],
+                 'files': [{'file': filename, 'lines': num_lines,
+                            'seconds': seconds,
+                            'lines_per_second': _LinesPerSecond(num_lines,
+                                                                seconds),
+                            'errors': errors}
+                           for filename, num_lines, seconds, errors in files]},
+                stream, indent=2, sort_keys=True)
+      stream.write('\n')
+      return
+    stream.write('Time spent in each check, with the checks it calls:\n')
+    stream.write('%10s %10s %10s  %s\n' %
+                 ('calls', 'seconds', 'errors', 'check'))
+    for name, (calls, seconds, errors) in checks:
+      stream.write('%10d %10.4f %10d  %s\n' % (calls, seconds, errors, name))
+    stream.write('Slowest files:\n')
+    stream.write('%10s %10s %10s %10s  %s\n' %
+                 ('lines', 'seconds', 'lines/sec', 'errors', 'file'))
+    for filename, num_lines, seconds, errors in files[:self._SLOWEST_FILES]:
+      stream.write('%10d %10.4f %10d %10d  %s\n' %
+                   (num_lines, seconds, _LinesPerSecond(num_lines, seconds),
+                    errors, filename))
+
+
+def _LinesPerSecond(num_lines, seconds):
+  return int(num_lines / seconds) if seconds else 0
+
+
+def _SetCheckProfile(output_format):
+  """Starts --profile with the given output format, None to stop it."""
+  global _check_profile
+  if _check_profile:
+    _check_profile.Uninstall()
+  _check_profile = None
+  if output_format:
+    _check_profile = _CheckProfile(output_format)
+    _check_profile.Install()
+
+
+class _Trace(object):
+  """Records the spans of the work on each file for --trace.
+
+  The spans are written as complete events of the Chrome trace event format,
+  with their start and duration in microseconds since the trace started.
+  They are tagged with the file they were spent on and its size, and are put
+  on the timeline of the process that linted it.
+  """
+
+  def __init__(self):
+    self.start = time.time()
+    self.pid = os.getpid()
+    # The file being linted.
+    self.filename = None
+    self.events = []
+
+  def StartFile(self, filename):
+    self.filename = filename
+
+  def AddSpan(self, name, start, end, args):
+    """Records a span of the current file from start to end, in seconds."""
+    args = dict(args, worker=self.pid)
+    if self.filename is not None:
+      args.update(file=self.filename, bytes=_cpplint_state.file_bytes)
+    self.events.append({'name': name, 'cat': 'cpplint', 'ph': 'X',
+                        'ts': int((start - self.start) * 1e6),
+                        'dur': int((end - start) * 1e6),
+                        'pid': self.pid, 'tid': self.pid, 'args': args})
+
+  def Write(self, stream):
+    metadata = {'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                'tid': self.pid, 'args': {'name': 'cpplint %d' % self.pid}}
+    json.dump({'traceEvents': [metadata] + self.events,
+               'displayTimeUnit': 'ms'}, stream)
+    stream.write('\n')
+
+
+class _TraceSpan(object):
+  """Records the time spent in a with statement as a span of --trace.
+
+  Without --trace, it does nothing.
+
+  Args:
+    name: The name of the span.
+    args: Additional tags of the span.
+  """
+
+  def __init__(self, name, **args):
+    self.name = name
+    self.args = args
+    self.start = None
+
+  def __enter__(self):
+    if _trace:
+      self.start = time.time()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if _trace and self.start is not None:
+      _trace.AddSpan(self.name, self.start, time.time(), self.args)
+
+
+def _SetTrace(enabled):
+  """Starts recording a new --trace, or stops it."""
+  global _trace
+  _trace = _Trace() if enabled else None
+
+
+class _RunMetrics(object):
+  """Counts the work of the run for --metrics-file.
+
+  The metrics are written in the Prometheus text format, which the textfile
+  collector of the node exporter reads, so that the cost of linting can be
+  tracked across runs without any server.
+  """
+
+  # The upper bounds of the buckets of the histogram of the seconds spent
+  # linting each file.
+  _LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                      10, 30)
+
+  def __init__(self):
+    self.start = time.time()
+    self.start_cpu = sum(os.times()[:2])
+    self.files = 0
+    self.bytes = 0
+    self.lines = 0
+    # Files by bucket of _LATENCY_BUCKETS, then beyond the last one.
+    self.latency_counts = [0] * (len(self._LATENCY_BUCKETS) + 1)
+    self.latency_sum = 0.0
+
+  def AddFile(self, num_lines, num_bytes, seconds):
+    self.files += 1
+    self.bytes += num_bytes
+    self.lines += num_lines
+    self.latency_counts[bisect.bisect_left(self._LATENCY_BUCKETS,
+                                           seconds)] += 1
+    self.latency_sum += seconds
+
+  def Write(self, stream):
+    """Writes the metrics of the run so far to stream."""
+    def Metric(name, metric_type, description, samples):
+      stream.write('# HELP %s %s\n# TYPE %s %s\n' %
+                   (name, description, name, metric_type))
+      for labels, value in samples:
+        stream.write('%s%s %s\n' % (name, labels, value))
+
+    Metric('cpplint_files_linted_total', 'counter', 'Files linted.',
+           [('', self.files)])
+    Metric('cpplint_bytes_processed_total', 'counter',
+           'Bytes of the files linted.', [('', self.bytes)])
+    Metric('cpplint_lines_processed_total', 'counter',
+           'Lines of the files linted.', [('', self.lines)])
+    Metric('cpplint_wall_seconds_total', 'counter',
+           'Seconds elapsed while linting.',
+           [('', '%.6f' % (time.time() - self.start))])
+    Metric('cpplint_cpu_seconds_total', 'counter',
+           'User and system CPU seconds spent while linting.',
+           [('', '%.6f' % (sum(os.times()[:2]) - self.start_cpu))])
+
+    stream.write('# HELP cpplint_file_seconds Seconds spent linting each '
+                 'file.\n# TYPE cpplint_file_seconds histogram\n')
+    files = 0
+    for bound, count in zip(self._LATENCY_BUCKETS + ('+Inf',),
+                            self.latency_counts):
+      files += count
+      stream.write('cpplint_file_seconds_bucket{le="%s"} %d\n' %
+                   (bound, files))
+    stream.write('cpplint_file_seconds_sum %.6f\n' % self.latency_sum)
+    stream.write('cpplint_file_seconds_count %d\n' % files)
+
+    Metric('cpplint_regex_cache_misses_total', 'counter',
+           'Regular expressions compiled for the cache.',
+           [('', _regexp_cache_misses)])
+    Metric('cpplint_regex_cache_evictions_total', 'counter',
+           'Regular expressions dropped from the cache.',
+           [('', _regexp_cache_evictions)])
+    if _regex_stats is not None:
+      # Lookups are only counted with --regex-stats, which times them all.
+      calls = sum(stats[0] for stats in _regex_stats.values())
+      Metric('cpplint_regex_cache_hits_total', 'counter',
+             'Regular expressions found in the cache.',
+             [('', calls - _regexp_cache_misses)])
+
+    Metric('cpplint_errors_total', 'counter', 'Errors found, by category.',
+           [('{category="%s"}' % category, count) for category, count in
+            sorted(_cpplint_state.errors_by_full_category.items())])
+
+
+def _SetRunMetrics(enabled):
+  """Starts counting new --metrics-file metrics, or stops it."""
+  global _run_metrics
+  _run_metrics = _RunMetrics() if enabled else None
+
+
 def ProcessFile(filename, vlevel, extra_check_functions=[]):
   """Does google-lint on a single file.
 
@@ -6175,33 +8085,10 @@ def ProcessFile(filename, vlevel, extra_check_functions=[]):
     _RestoreFilters()
     return
 
-  lf_lines = []
-  crlf_lines = []
+  if _trace:
+    _trace.StartFile(filename)
   try:
-    # Support the UNIX convention of using "-" for stdin.  Note that
-    # we are not opening the file with universal newline support
-    # (which codecs doesn't support anyway), so the resulting lines do
-    # contain trailing '\r' characters if we are reading a file that
-    # has CRLF endings.
-    # If after the split a trailing '\r' is present, it is removed
-    # below.
-    if filename == '-':
-      lines = codecs.StreamReaderWriter(sys.stdin,
-                                        codecs.getreader('utf8'),
-                                        codecs.getwriter('utf8'),
-                                        'replace').read().split('\n')
-    else:
-      lines = codecs.open(filename, 'r', 'utf8', 'replace').read().split('\n')
-
-    # Remove trailing '\r'.
-    # The -1 accounts for the extra trailing blank line we get from split()
-    for linenum in range(len(lines) - 1):
-      if lines[linenum].endswith('\r'):
-        lines[linenum] = lines[linenum].rstrip('\r')
-        crlf_lines.append(linenum + 1)
-      else:
-        lf_lines.append(linenum + 1)
-
+    (lines, crlf_lines) = ReadFileLines(filename)
   except IOError:
     sys.stderr.write(
         "Skipping input '%s': Can't open for reading\n" % filename)
@@ -6217,26 +8104,38 @@ def ProcessFile(filename, vlevel, extra_check_functions=[]):
     sys.stderr.write('Ignoring %s; not a valid file name '
                      '(%s)\n' % (filename, ', '.join(_valid_extensions)))
   else:
-    ProcessFileData(filename, file_extension, lines, Error,
-                    extra_check_functions)
-
-    # If end-of-line sequences are a mix of LF and CR-LF, issue
-    # warnings on the lines with CR.
-    #
-    # Don't issue any warnings if all lines are uniformly LF or CR-LF,
-    # since critique can handle these just fine, and the style guide
-    # doesn't dictate a particular end of line sequence.
-    #
-    # We can't depend on os.linesep to determine what the desired
-    # end-of-line sequence should be, since that will return the
-    # server-side end-of-line sequence.
-    if lf_lines and crlf_lines:
-      # Warn on every line with CR.  An alternative approach might be to
-      # check whether the file is mostly CRLF or just LF, and warn on the
-      # minority, we bias toward LF here since most tools prefer LF.
-      for linenum in crlf_lines:
-        Error(filename, linenum, 'whitespace/newline', 1,
-              'Unexpected \\r (^M) found; better to use only \\n')
+    _cpplint_state.reporter.BeginFile(filename)
+    _cpplint_state.ResetFileErrorCaps()
+    start = time.time()
+    errors = _cpplint_state.error_count
+    try:
+      with _TraceSpan('lint'):
+        ProcessFileData(filename, file_extension, lines, Error,
+                        extra_check_functions)
+
+        # If end-of-line sequences are a mix of LF and CR-LF, warn on every
+        # line with CR.  An alternative approach might be to check whether
+        # the file is mostly CRLF or just LF, and warn on the minority, we
+        # bias toward LF here since most tools prefer LF.
+        for linenum in crlf_lines:
+          Error(filename, linenum, 'whitespace/newline', 1,
+                'Unexpected \\r (^M) found; better to use only \\n')
+    except _SkipRemainingChecks:
+      # All enabled categories reached their
+      # --max-errors-per-category-per-file limit, or an error in a
+      # --fail-fast category was found.
+      pass
+    seconds = time.time() - start
+    # The lines end with an empty one when the file ends with a newline.
+    num_lines = len(lines) - (lines[-1:] == [''])
+    if _check_profile:
+      _check_profile.AddFile(filename, num_lines, seconds,
+                             _cpplint_state.error_count - errors)
+    if _run_metrics:
+      _run_metrics.AddFile(num_lines, _cpplint_state.file_bytes, seconds)
+    with _TraceSpan('output'):
+      _cpplint_state.ReportFileErrorCapSummary(filename)
+      _cpplint_state.reporter.EndFile(filename)
   if vlevel > 0:
     sys.stderr.write('Done processing %s\n' % filename)
   _RestoreFilters()
@@ -6276,9 +8175,26 @@ def ParseArguments(args):
   Returns:
     The list of filenames to lint.
   """
+  # getopt has no optional option values, so give a bare --fail-fast the
+  # empty category list that matches every category.
+  args = ['--fail-fast=' if arg == '--fail-fast' else arg for arg in args]
+  args = ['--profile=text' if arg == '--profile' else arg for arg in args]
   try:
     (opts, filenames) = getopt.getopt(args, '', ['help', 'output=', 'verbose=',
                                                  'counting=',
+                                                 'count-only',
+                                                 'output-file=',
+                                                 ('max-errors-per-category-'
+                                                  'per-file='),
+                                                 'max-errors=',
+                                                 'fail-fast=',
+                                                 'file-time-budget=',
+                                                 'regex-timeout=',
+                                                 'regex-stats=',
+                                                 'profile=',
+                                                 'trace=',
+                                                 'metrics-file=',
+                                                 'long-line-threshold=',
                                                  'filter=',
                                                  'root=',
                                                  'linelength=',
@@ -6290,14 +8206,24 @@ def ParseArguments(args):
   output_format = _OutputFormat()
   filters = ''
   counting_style = ''
+  count_only = False
+  max_errors_per_category = 0
+  max_errors = 0
+  fail_fast = None
+  file_time_budget = 0
+  trace_file = None
+  metrics_file = None
 
   for (opt, val) in opts:
     if opt == '--help':
       PrintUsage(None)
     elif opt == '--output':
-      if val not in ('emacs', 'vs7', 'eclipse'):
-        PrintUsage('The only allowed output formats are emacs, vs7 and eclipse.')
+      if val not in _REPORTERS:
+        PrintUsage('The only allowed output formats are emacs, vs7, eclipse, '
+                   'jsonl, sarif and junit.')
       output_format = val
+    elif opt == '--output-file':
+      _cpplint_state.output_file = val
     elif opt == '--verbose':
       verbosity = int(val)
     elif opt == '--filter':
@@ -6308,6 +8234,51 @@ def ParseArguments(args):
       if val not in ('total', 'toplevel', 'detailed'):
         PrintUsage('Valid counting options are total, toplevel, and detailed')
       counting_style = val
+    elif opt == '--count-only':
+      count_only = True
+    elif opt == '--max-errors-per-category-per-file':
+      try:
+        max_errors_per_category = int(val)
+      except ValueError:
+        PrintUsage('Error limits must be digits.')
+    elif opt == '--max-errors':
+      try:
+        max_errors = int(val)
+      except ValueError:
+        PrintUsage('Error limits must be digits.')
+    elif opt == '--fail-fast':
+      if val.strip() and not val.replace(',', '').strip():
+        PrintUsage('--fail-fast takes a list of category prefixes.')
+      fail_fast = val
+    elif opt == '--file-time-budget':
+      try:
+        file_time_budget = float(val)
+      except ValueError:
+        PrintUsage('File time budget must be a number of seconds.')
+    elif opt == '--regex-timeout':
+      if not hasattr(signal, 'setitimer'):
+        PrintUsage('--regex-timeout is not supported on this platform.')
+      try:
+        _SetRegexTimeout(float(val))
+      except ValueError:
+        PrintUsage('Regex timeout must be a number of seconds.')
+    elif opt == '--regex-stats':
+      try:
+        _SetRegexStats(int(val))
+      except ValueError:
+        PrintUsage('Regex stats must be a number of patterns.')
+    elif opt == '--profile':
+      if val not in ('text', 'json'):
+        PrintUsage('The only allowed profile formats are text and json.')
+      _SetCheckProfile(val)
+    elif opt == '--trace':
+      if not val:
+        PrintUsage('--trace needs the name of the file to write.')
+      trace_file = val
+    elif opt == '--metrics-file':
+      if not val:
+        PrintUsage('--metrics-file needs the name of the file to write.')
+      metrics_file = val
     elif opt == '--root':
       global _root
       _root = val
@@ -6317,6 +8288,12 @@ def ParseArguments(args):
           _line_length = int(val)
       except ValueError:
           PrintUsage('Line length must be digits.')
+    elif opt == '--long-line-threshold':
+      global _long_line_threshold
+      try:
+        _long_line_threshold = int(val)
+      except ValueError:
+        PrintUsage('Long line threshold must be digits.')
     elif opt == '--extensions':
       global _valid_extensions
       try:
@@ -6331,6 +8308,14 @@ def ParseArguments(args):
   _SetVerboseLevel(verbosity)
   _SetFilters(filters)
   _SetCountingStyle(counting_style)
+  _cpplint_state.SetCountOnly(count_only)
+  _cpplint_state.SetErrorCaps(max_errors_per_category, max_errors)
+  _cpplint_state.SetFailFast(fail_fast)
+  _cpplint_state.SetFileTimeBudget(file_time_budget)
+  _cpplint_state.trace_file = trace_file
+  _SetTrace(trace_file)
+  _cpplint_state.metrics_file = metrics_file
+  _SetRunMetrics(metrics_file)
 
   return filenames
 
@@ -6344,9 +8329,59 @@ def main():
     sys.stderr = codecs.StreamReader(sys.stderr,
                                      'replace')
     _cpplint_state.ResetErrorCounts()
-    for filename in filenames:
-      ProcessFile(filename, _cpplint_state.verbose_level)
+    output_stream = None
+    if _cpplint_state.output_file:
+      try:
+        output_stream = codecs.open(_cpplint_state.output_file, 'w', 'utf8')
+      except IOError:
+        PrintUsage('Cannot open output file %s.' % _cpplint_state.output_file)
+    elif _REPORTERS[_cpplint_state.output_format] is not _TextReporter:
+      output_stream = sys.stdout
+    trace_stream = None
+    if _cpplint_state.trace_file:
+      try:
+        trace_stream = open(_cpplint_state.trace_file, 'w')
+      except IOError:
+        PrintUsage('Cannot open trace file %s.' % _cpplint_state.trace_file)
+    metrics_stream = None
+    if _cpplint_state.metrics_file:
+      # The metrics are moved in place once complete, so that the textfile
+      # collector never reads them half written.
+      try:
+        metrics_stream = open(_cpplint_state.metrics_file + '.tmp', 'w')
+      except IOError:
+        PrintUsage('Cannot open metrics file %s.' %
+                   _cpplint_state.metrics_file)
+    reporter = _REPORTERS[_cpplint_state.output_format](output_stream)
+    _cpplint_state.SetReporter(reporter)
+    try:
+      reporter.BeginRun()
+      for index, filename in enumerate(filenames):
+        ProcessFile(filename, _cpplint_state.verbose_level)
+        if _cpplint_state.failed_fast:
+          sys.stderr.write('Stopped by --fail-fast in %s, %d files were not '
+                           'linted\n' % (filename, len(filenames) - index - 1))
+          break
+      if _trace:
+        _trace.StartFile(None)
+      with _TraceSpan('output'):
+        _cpplint_state.ReportErrorCapSummary()
+        reporter.EndRun()
+    finally:
+      if _cpplint_state.output_file:
+        output_stream.close()
+    if trace_stream:
+      _trace.Write(trace_stream)
+      trace_stream.close()
+    if metrics_stream:
+      _run_metrics.Write(metrics_stream)
+      metrics_stream.close()
+      getattr(os, 'replace', os.rename)(metrics_stream.name,
+                                         _cpplint_state.metrics_file)
     _cpplint_state.PrintErrorCounts()
+    _PrintRegexStats()
+    if _check_profile:
+      _check_profile.Print(sys.stderr)
   finally:
     sys.stderr = backup_err
 
@@ -34,6 +34,7 @@
 # TODO(unknown): Add a good test that tests UpdateIncludeState.
 
 import codecs
+import json
 import os
 import random
 import re
@@ -41,6 +42,7 @@ import sys
 import unittest
 import tempfile
 import shutil
+import xml.dom.minidom
 
 import cpplint
 
@@ -73,6 +75,8 @@ class ErrorCollector(object):
   # These are a global list, covering all categories seen ever.
   _ERROR_CATEGORIES = cpplint._ERROR_CATEGORIES
   _SEEN_ERROR_CATEGORIES = {}
+  # Messages are passed unformatted, with their arguments.
+  message_args = True
 
   def __init__(self, assert_fn):
     """assert_fn: a function to call when we notice a problem."""
@@ -81,7 +85,8 @@ class ErrorCollector(object):
     cpplint.ResetNolintSuppressions()
 
   def __call__(self, unused_filename, linenum,
-               category, confidence, message):
+               category, confidence, message, *args):
+    message = cpplint.FormatErrorMessage(message, args)
     self._assert_fn(category in self._ERROR_CATEGORIES,
                     'Message "%s" has category "%s",'
                     ' which is not in _ERROR_CATEGORIES' % (message, category))
@@ -271,6 +276,38 @@ class CpplintTestBase(unittest.TestCase):
             'should be deleted.  [whitespace/blank_line] [3]'))
 
 
+class ProcessFileTestBase(unittest.TestCase):
+  """Lints files written to a temporary directory, capturing the output."""
+
+  def setUp(self):
+    self.temp_directory = tempfile.mkdtemp()
+    self.old_stderr = sys.stderr
+    self.old_reporter = cpplint._cpplint_state.reporter
+    self.stream = ReportersTest.Stream()
+    sys.stderr = self.stream
+    cpplint._cpplint_state.SetReporter(cpplint._TextReporter(self.stream))
+    cpplint._cpplint_state.ResetErrorCounts()
+
+  def tearDown(self):
+    sys.stderr = self.old_stderr
+    cpplint._cpplint_state.SetReporter(self.old_reporter)
+    cpplint._cpplint_state.ResetErrorCounts()
+    shutil.rmtree(self.temp_directory)
+
+  def Lint(self, name, lines):
+    """Writes lines to the file name and lints it, returning its path."""
+    path = os.path.join(self.temp_directory, name)
+    with open(path, 'w') as source:
+      source.write('\n'.join(lines) + '\n')
+    cpplint.ProcessFile(path, cpplint._cpplint_state.verbose_level)
+    return path
+
+  def Written(self, text):
+    """Returns the lines written to stderr or the reporter containing text."""
+    return [line for line in self.stream.getvalue().splitlines(True)
+            if text in line]
+
+
 class CpplintTest(CpplintTestBase):
 
   def GetNamespaceResults(self, lines):
@@ -330,6 +367,18 @@ class CpplintTest(CpplintTestBase):
     self.assertEquals(0, cpplint.GetLineWidth(''))
     self.assertEquals(10, cpplint.GetLineWidth('x' * 10))
     self.assertEquals(16, cpplint.GetLineWidth(u('\u90fd|\u9053|\u5e9c|\u770c|\u652f\u5e81')))
+    # Combining characters take no column.
+    self.assertEquals(3, cpplint.GetLineWidth(u('e\u0301te')))
+    self.assertEquals(3, cpplint._line_width_cache[u('e\u0301te')])
+    self.assertEquals(3, cpplint.GetLineWidth(u('e\u0301te')))
+
+  def testIsAscii(self):
+    self.assertTrue(cpplint.IsAscii(''))
+    self.assertTrue(cpplint.IsAscii('int a;\t// comment'))
+    self.assertFalse(cpplint.IsAscii(u('// \u00e9t\u00e9')))
+    self.assertTrue(cpplint.CleansedLines(['int a;', '']).is_ascii)
+    self.assertFalse(
+        cpplint.CleansedLines(['int a;', u('// \u00e9t\u00e9')]).is_ascii)
 
   def testGetTextInside(self):
     self.assertEquals('', cpplint._GetTextInside('fun()', r'fun\('))
@@ -477,6 +526,67 @@ class CpplintTest(CpplintTestBase):
                              ''],
                             error_collector)
     self.assertEquals('', error_collector.Results())
+    # NOLINTBEGIN/NOLINTEND silence warnings for a whole region
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.ProcessFileData('test.cc', 'cc',
+                            ['// Copyright 2014 Your Company.',
+                             '// NOLINTBEGIN(runtime/int)',
+                             'long a = 65;',
+                             'long b = (int64) 65;',
+                             '// NOLINTEND(runtime/int)',
+                             'long c = 65;',
+                             ''],
+                            error_collector)
+    self.assertEquals(
+        ['Using C-style cast.  Use static_cast<int64>(...) instead'
+         '  [readability/casting] [4]',
+         'Use int16/int64/etc, rather than the C type long'
+         '  [runtime/int] [4]'],
+        error_collector.Results())
+    # Unbalanced regions are reported, and an unclosed one has no effect.
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.ProcessFileData('test.cc', 'cc',
+                            ['// Copyright 2014 Your Company.',
+                             '// NOLINTEND',
+                             '// NOLINTBEGIN',
+                             'long a = 65;',
+                             ''],
+                            error_collector)
+    self.assertEquals(
+        ['NOLINTEND without a matching NOLINTBEGIN  [readability/nolint] [5]',
+         'NOLINTBEGIN without a matching NOLINTEND  [readability/nolint] [5]',
+         'Use int16/int64/etc, rather than the C type long'
+         '  [runtime/int] [4]'],
+        error_collector.Results())
+    # Errors in NOLINT comments are reported in line order.
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.ProcessFileData('test.cc', 'cc',
+                            ['// Copyright 2014 Your Company.',
+                             'long a = 65;',
+                             'int b = 65;  // NOLINT(foo)',
+                             '// NOLINTBEGIN',
+                             ''],
+                            error_collector)
+    self.assertEquals(
+        ['Use int16/int64/etc, rather than the C type long'
+         '  [runtime/int] [4]',
+         'Unknown NOLINT error category: foo  [readability/nolint] [5]',
+         'NOLINTBEGIN without a matching NOLINTEND  [readability/nolint] [5]'],
+        error_collector.Results())
+
+  def testErrorSuppressionRanges(self):
+    suppressions = cpplint._ErrorSuppressions()
+    self.assertFalse(suppressions.IsSuppressed('runtime/int', 1))
+    suppressions.AddRange('runtime/int', 10, 20)
+    suppressions.AddRange('runtime/int', 30, 40)
+    suppressions.AddRange('runtime/int', 18, 25)
+    suppressions.AddLine(None, 50)
+    for linenum in (10, 20, 25, 30, 40, 50):
+      self.assertTrue(suppressions.IsSuppressed('runtime/int', linenum))
+    for linenum in (9, 26, 29, 41):
+      self.assertFalse(suppressions.IsSuppressed('runtime/int', linenum))
+    self.assertFalse(suppressions.IsSuppressed('runtime/casting', 15))
+    self.assertTrue(suppressions.IsSuppressed('runtime/casting', 50))
 
   # Test Variable Declarations.
   def testVariableDeclarations(self):
@@ -1604,6 +1714,17 @@ class CpplintTest(CpplintTestBase):
                   'instead of strtok(...)'
                   ' for improved thread safety.'
                   '  [runtime/threadsafe_fn] [2]')
+    # A call in the arguments of another is reported too, in table order.
+    self.TestLint('var = ctime(asctime(tm)) + rand()',
+                  ['Consider using asctime_r(...) instead of asctime(...)'
+                   ' for improved thread safety.'
+                   '  [runtime/threadsafe_fn] [2]',
+                   'Consider using ctime_r(...) instead of ctime(...)'
+                   ' for improved thread safety.'
+                   '  [runtime/threadsafe_fn] [2]',
+                   'Consider using rand_r(...) instead of rand(...)'
+                   ' for improved thread safety.'
+                   '  [runtime/threadsafe_fn] [2]'])
 
   def testVlogMisuse(self):
     self.TestLint('VLOG(1)', '')
@@ -2284,6 +2405,184 @@ class CpplintTest(CpplintTestBase):
         error_collector.Results())
     self.assertEquals('', error_collector.Results())
 
+  def testFileTimeBudget(self):
+    lines = ['// Copyright 2014 Your Company.',
+             'void f(int& a) {',
+             '  if (a) {',
+             '  };',
+             '}',
+             '\tint c;',
+             '']
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.ProcessFileData('foo.cc', 'cc', lines, error_collector)
+    self.assertEquals(1, error_collector.Results().count(
+        'Is this a non-const reference? If so, make const or use a pointer: '
+        'int& a  [runtime/references] [2]'))
+    self.assertEquals(1, error_collector.Results().count(
+        'You don\'t need a ; after a }  [readability/braces] [4]'))
+
+    old_budget = cpplint._cpplint_state.file_time_budget
+    old_reporter = cpplint._cpplint_state.reporter
+    stream = ReportersTest.Stream()
+    try:
+      # Any file exceeds a budget this small before its first line.
+      cpplint._cpplint_state.SetFileTimeBudget(1e-9)
+      cpplint._cpplint_state.SetReporter(cpplint._Reporter(stream))
+      error_collector = ErrorCollector(self.assert_)
+      cpplint.ProcessFileData('foo.cc', 'cc', lines, error_collector)
+      cpplint._cpplint_state.reporter.EndFile('foo.cc')
+    finally:
+      cpplint._cpplint_state.SetFileTimeBudget(old_budget)
+      cpplint._cpplint_state.SetReporter(old_reporter)
+    # The budget is reported in a note, not as an error.
+    self.assertEquals('Tab found; better to use spaces  [whitespace/tab] [1]',
+                      error_collector.Results())
+    self.assertEquals(
+        'foo.cc: exceeded its time budget of 1e-09 seconds at line 0, '
+        'skipped CheckBraces, CheckTrailingSemicolon, CheckEmptyBlockBody, '
+        'CheckRValueReference, CheckCheck, CheckForNonConstReference, '
+        'CheckDefaultLambdaCaptures, CheckRedundantVirtual on the remaining '
+        'lines  [lint/budget_exceeded]\n',
+        stream.getvalue())
+
+  def testRegexTimeout(self):
+    if not hasattr(cpplint.signal, 'setitimer'):
+      return
+    # Without its "// FOO_H_" comment, the #endif makes the header guard check
+    # look for // comments with a pattern that backtracks exponentially on an
+    # unterminated character literal.
+    cppvar = cpplint.GetHeaderGuardCPPVariable('foo.h')
+    lines = ['/* Copyright 2014 Your Company. */',
+             '#ifndef ' + cppvar,
+             '#define ' + cppvar,
+             "char c = '%s  // x" % ('.' * 40),
+             '#endif',
+             '']
+    error_collector = ErrorCollector(self.assert_)
+    try:
+      cpplint._SetRegexTimeout(0.05)
+      cpplint.ProcessFileData('foo.h', 'h', lines, error_collector)
+    finally:
+      cpplint._SetRegexTimeout(0)
+    self.assertEquals(
+        ['Regular expression %r took longer than 0.05 seconds, skipped the '
+         'remaining checks of this line  [lint/regex_timeout] [1]' %
+         r'^(?:(?:\'(?:\.|[^\'])*\')|(?:"(?:\.|[^"])*")|[^\'"])*//'],
+        error_collector.ResultList())
+
+  def testRegexStats(self):
+    old_stderr = sys.stderr
+    try:
+      sys.stderr = ReportersTest.Stream()
+      cpplint._SetRegexStats(1)
+      cpplint.Search(r'a+', 'baa')
+      cpplint.Search(r'a+', 'bbb')
+      cpplint.Match(r'a+', 'aaa')
+      self.assertEquals('x', cpplint.ReplaceAll(r'b+', 'x', 'bb'))
+      self.assertEquals('a', cpplint.ReplaceAll(r'b+', 'x', 'a'))
+      self.assertEquals(3, len(cpplint.FindAll(r'c', 'ccc')))
+      stats = cpplint._regex_stats
+      self.assertEquals([3, 2], stats['a+'][:2])
+      self.assertEquals([2, 1], stats['b+'][:2])
+      self.assertEquals([1, 1], stats['c'][:2])
+      stats['a+'][2] = 2.0
+      cpplint._PrintRegexStats()
+      lines = sys.stderr.getvalue().splitlines()
+      self.assertEquals(
+          ['Regular expressions taking the most time, 1 of 3:',
+           '     calls    matches    seconds  pattern',
+           '         3          2     2.0000  a+'],
+          lines[:3])
+      self.assertEquals(
+          'Regular expression cache: %d hits, %d misses, 0 evictions' %
+          (6 - cpplint._regexp_cache_misses, cpplint._regexp_cache_misses),
+          lines[3][:lines[3].index(' evictions') + len(' evictions')])
+    finally:
+      sys.stderr = old_stderr
+      cpplint._SetRegexStats(0)
+    self.assertEquals(None, cpplint._regex_stats)
+
+  def testRegexpCache(self):
+    old_generation = cpplint._REGEXP_CACHE_GENERATION
+    old_caches = (cpplint._regexp_compile_cache,
+                  cpplint._regexp_previous_cache)
+    try:
+      cpplint._REGEXP_CACHE_GENERATION = 2
+      cpplint._regexp_compile_cache = {}
+      cpplint._regexp_previous_cache = {}
+      cpplint._SetRegexStats(0)
+      for pattern in ('a', 'b', 'c', 'a', 'd'):
+        cpplint.Search(pattern, 'abc')
+      # 'a' was used again after 'b', so it outlives it.
+      self.assertEquals(set(['d']), set(cpplint._regexp_compile_cache))
+      self.assertEquals(set(['a', 'c']), set(cpplint._regexp_previous_cache))
+      self.assertEquals(4, cpplint._regexp_cache_misses)
+      self.assertEquals(1, cpplint._regexp_cache_evictions)
+    finally:
+      cpplint._REGEXP_CACHE_GENERATION = old_generation
+      (cpplint._regexp_compile_cache,
+       cpplint._regexp_previous_cache) = old_caches
+
+  def testLongLineThreshold(self):
+    table = 'long table[] = {%s};' % ', '.join(['"a" /* x */'] * 30)
+    lines = ['// Copyright 2014 Your Company.',
+             'namespace {',
+             table + '\t',
+             '}  // namespace',
+             '']
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.ProcessFileData('foo.cc', 'cc', lines, error_collector)
+    self.assertEquals(1, error_collector.Results().count(
+        'Use int16/int64/etc, rather than the C type long'
+        '  [runtime/int] [4]'))
+
+    old_threshold = cpplint._long_line_threshold
+    try:
+      cpplint._long_line_threshold = 200
+      error_collector = ErrorCollector(self.assert_)
+      cpplint.ProcessFileData('foo.cc', 'cc', lines, error_collector)
+    finally:
+      cpplint._long_line_threshold = old_threshold
+    self.assertEquals(
+        ['Tab found; better to use spaces  [whitespace/tab] [1]',
+         'Line ends in whitespace.  Consider deleting these extra spaces.'
+         '  [whitespace/end_of_line] [4]',
+         'Lines should very rarely be longer than 100 characters'
+         '  [whitespace/line_length] [4]'],
+        error_collector.ResultList())
+
+    # The braces of a long line still count for the lines around it.
+    lines = ['// Copyright 2014 Your Company.',
+             'class Foo {',
+             ' public:',
+             '  void f() {',
+             '    static const int kTable[] = {%s,' %
+             ', '.join(['"}"'] * 50),
+             '    };',
+             '  }',
+             '};',
+             '']
+    try:
+      cpplint._long_line_threshold = 200
+      error_collector = ErrorCollector(self.assert_)
+      cpplint.ProcessFileData('foo.cc', 'cc', lines, error_collector)
+    finally:
+      cpplint._long_line_threshold = old_threshold
+    self.assertEquals(
+        'Lines should very rarely be longer than 100 characters'
+        '  [whitespace/line_length] [4]',
+        error_collector.Results())
+
+  def testStructuralCharacters(self):
+    self.assertEquals(
+        '={,,,};',
+        cpplint.StructuralCharacters(
+            'int k[] = {"}", \'{\', 1\'000, 0xf\'f};  // }'))
+    self.assertEquals('(', cpplint.StructuralCharacters('f("{ unterminated'))
+    self.assertEquals(';', cpplint.StructuralCharacters('a /* { */; /* {'))
+    self.assertEquals('#  define',
+                      cpplint.StructuralCharacters('#  define X { a; }'))
+
   def testBraceAtBeginOfLine(self):
     self.TestLint('{',
                   '{ should almost always be at the end of the previous line'
@@ -3844,6 +4143,12 @@ class CpplintTest(CpplintTestBase):
       self.assertEquals('vs7', cpplint._cpplint_state.output_format)
       self.assertRaises(SystemExit,
                         cpplint.ParseArguments, ['--output=blah', 'foo.cc'])
+      self.assertEquals(['foo.h'],
+                        cpplint.ParseArguments(['--output=sarif',
+                                                '--output-file=lint.sarif',
+                                                'foo.h']))
+      self.assertEquals('sarif', cpplint._cpplint_state.output_format)
+      self.assertEquals('lint.sarif', cpplint._cpplint_state.output_file)
 
       filt = '-,+whitespace,-whitespace/indent'
       self.assertEquals(['foo.h'],
@@ -3861,15 +4166,158 @@ class CpplintTest(CpplintTestBase):
       self.assertEqual(['foo.h'],
                        cpplint.ParseArguments(['--extensions=hpp,cpp,cpp', 'foo.h']))
       self.assertEqual(set(['hpp', 'cpp']), cpplint._valid_extensions)
+
+      self.assertFalse(cpplint._cpplint_state.count_only)
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--count-only', 'foo.h']))
+      self.assertTrue(cpplint._cpplint_state.count_only)
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(
+                           ['--max-errors-per-category-per-file=3',
+                            '--max-errors=100', 'foo.h']))
+      self.assertEqual(3, cpplint._cpplint_state.max_errors_per_category)
+      self.assertEqual(100, cpplint._cpplint_state.max_errors)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--max-errors=many', 'foo.h'])
+
+      self.assertEqual(None, cpplint._cpplint_state.fail_fast)
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--fail-fast', 'foo.h']))
+      self.assertEqual([''], cpplint._cpplint_state.fail_fast)
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(
+                           ['--fail-fast=build,runtime/int', 'foo.h']))
+      self.assertEqual(['build', 'runtime/int'],
+                       cpplint._cpplint_state.fail_fast)
+      # Empty items do not match every category.
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--fail-fast=build, ,', 'foo.h']))
+      self.assertEqual(['build'], cpplint._cpplint_state.fail_fast)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--fail-fast=,', 'foo.h'])
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--file-time-budget=2.5',
+                                               'foo.h']))
+      self.assertEqual(2.5, cpplint._cpplint_state.file_time_budget)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--file-time-budget=long', 'foo.h'])
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--regex-timeout=soon', 'foo.h'])
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--regex-stats=5', 'foo.h']))
+      self.assertEqual({}, cpplint._regex_stats)
+      self.assertEqual(5, cpplint._regex_stats_top)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--regex-stats=all', 'foo.h'])
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--profile', 'foo.h']))
+      self.assertEqual('text', cpplint._check_profile.output_format)
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--profile=json', 'foo.h']))
+      self.assertEqual('json', cpplint._check_profile.output_format)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--profile=xml', 'foo.h'])
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--trace=trace.json', 'foo.h']))
+      self.assertEqual('trace.json', cpplint._cpplint_state.trace_file)
+      self.assertEqual([], cpplint._trace.events)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--trace=', 'foo.h'])
+
+      self.assertEqual(['foo.h'],
+                       cpplint.ParseArguments(['--metrics-file=lint.prom',
+                                               'foo.h']))
+      self.assertEqual('lint.prom', cpplint._cpplint_state.metrics_file)
+      self.assertEqual(0, cpplint._run_metrics.files)
+      self.assertRaises(SystemExit, cpplint.ParseArguments,
+                        ['--metrics-file=', 'foo.h'])
     finally:
       cpplint._USAGE = old_usage
       cpplint._ERROR_CATEGORIES = old_error_categories
       cpplint._cpplint_state.output_format = old_output_format
       cpplint._cpplint_state.verbose_level = old_verbose_level
       cpplint._cpplint_state.filters = old_filters
+      cpplint._cpplint_state.count_only = False
+      cpplint._cpplint_state.output_file = None
+      cpplint._cpplint_state.SetErrorCaps(0, 0)
+      cpplint._cpplint_state.SetFailFast(None)
+      cpplint._cpplint_state.SetFileTimeBudget(0)
+      cpplint._SetRegexStats(0)
+      cpplint._SetCheckProfile(None)
+      cpplint._cpplint_state.trace_file = None
+      cpplint._SetTrace(False)
+      cpplint._cpplint_state.metrics_file = None
+      cpplint._SetRunMetrics(False)
       cpplint._line_length = old_line_length
       cpplint._valid_extensions = old_valid_extensions
 
+  def testErrorMessageFormatting(self):
+    class Stderr(object):
+      def __init__(self):
+        self.written = []
+      def write(self, s):
+        self.written.append(s)
+
+    def ExplodingMessage():
+      raise AssertionError('message built for a filtered error')
+
+    old_stderr = sys.stderr
+    old_filters = cpplint._cpplint_state.filters
+    old_count_only = cpplint._cpplint_state.count_only
+    old_error_count = cpplint._cpplint_state.error_count
+    try:
+      sys.stderr = Stderr()
+      cpplint.ResetNolintSuppressions()
+      cpplint._cpplint_state.SetFilters('-runtime')
+      cpplint.Error('foo.cc', 3, 'runtime/int', 4, ExplodingMessage)
+      cpplint.Error('foo.cc', 3, 'whitespace/tab', 4, 'Found %d %s', 2, 'tabs')
+      cpplint.Error('foo.cc', 4, 'whitespace/tab', 4, lambda: 'Found a tab')
+      self.assertEquals(['foo.cc:3:  Found 2 tabs  [whitespace/tab] [4]\n',
+                         'foo.cc:4:  Found a tab  [whitespace/tab] [4]\n'],
+                        sys.stderr.written)
+
+      sys.stderr = Stderr()
+      cpplint._cpplint_state.ResetErrorCounts()
+      cpplint._cpplint_state.SetCountOnly(True)
+      cpplint.Error('foo.cc', 3, 'whitespace/tab', 4, ExplodingMessage)
+      self.assertEquals([], sys.stderr.written)
+      self.assertEquals(1, cpplint._cpplint_state.error_count)
+    finally:
+      sys.stderr = old_stderr
+      cpplint._cpplint_state.filters = old_filters
+      cpplint._cpplint_state.count_only = old_count_only
+      cpplint._cpplint_state.error_count = old_error_count
+
+  def testFiveArgumentErrorCallable(self):
+    messages = []
+
+    def ReportError(unused_filename, linenum, unused_category,
+                    unused_confidence, message):
+      messages.append((linenum, message))
+
+    cpplint.ProcessFileData('foo.cc', 'cc',
+                            ['// Copyright 2014 Your Company.',
+                             '#include <string>',
+                             '#include <string>',
+                             'int a;  // NOLINT(foo/bar)',
+                             'class Foo {',
+                             ' public:',
+                             '  DISALLOW_COPY_AND_ASSIGN(Bar);',
+                             '};',
+                             ''],
+                            ReportError)
+    self.assertEquals(
+        [(3, '"string" already included at foo.cc:2'),
+         (4, 'Unknown NOLINT error category: foo/bar'),
+         (7, 'DISALLOW_COPY_AND_ASSIGN must be in the private: section')],
+        [(linenum, message) for linenum, message in messages
+         if linenum in (3, 4, 7)])
+
   def testLineLength(self):
     old_line_length = cpplint._line_length
     try:
@@ -3905,6 +4353,26 @@ class CpplintTest(CpplintTestBase):
     finally:
       cpplint._cpplint_state.filters = old_filters
 
+  def testFilterDecisionsFollowFilterChanges(self):
+    old_filters = cpplint._cpplint_state.filters
+    try:
+      cpplint._cpplint_state.SetFilters('-whitespace,+whitespace/tab')
+      self.assertTrue(cpplint._cpplint_state.IsFiltered('whitespace/indent'))
+      self.assertFalse(cpplint._cpplint_state.IsFiltered('whitespace/tab'))
+      self.assertFalse(cpplint._cpplint_state.IsFiltered('runtime/int'))
+      cpplint._cpplint_state.BackupFilters()
+      cpplint._AddFilters('+whitespace/indent,-runtime')
+      self.assertFalse(cpplint._cpplint_state.IsFiltered('whitespace/indent'))
+      self.assertTrue(cpplint._cpplint_state.IsFiltered('runtime/int'))
+      cpplint._cpplint_state.RestoreFilters()
+      self.assertTrue(cpplint._cpplint_state.IsFiltered('whitespace/indent'))
+      self.assertFalse(cpplint._cpplint_state.IsFiltered('runtime/int'))
+      cpplint._cpplint_state.filters = ['-runtime']
+      self.assertFalse(cpplint._cpplint_state.IsFiltered('whitespace/indent'))
+      self.assertTrue(cpplint._cpplint_state.IsFiltered('runtime/int'))
+    finally:
+      cpplint._cpplint_state.filters = old_filters
+
   def testDefaultFilter(self):
     default_filters = cpplint._DEFAULT_FILTERS
     old_filters = cpplint._cpplint_state.filters
@@ -4544,6 +5012,140 @@ class CleansedLinesTest(unittest.TestCase):
     self.assertEquals([], clean_lines.raw_lines)
     self.assertEquals(0, clean_lines.NumLines())
 
+  def testNextStatementBoundary(self):
+    clean_lines = cpplint.CleansedLines(['void f(int a,',
+                                         '       int b)',
+                                         '{',
+                                         '  g();  // {',
+                                         '}',
+                                         'int x'])
+    self.assertEquals((3, 2), clean_lines.NextStatementBoundary(0))
+    self.assertEquals((3, 2), clean_lines.NextStatementBoundary(2))
+    self.assertEquals((3, 6), clean_lines.NextStatementBoundary(3))
+    self.assertEquals((4, 6), clean_lines.NextStatementBoundary(4))
+    self.assertEquals((6, 6), clean_lines.NextStatementBoundary(5))
+
+  def testNonBlankLines(self):
+    clean_lines = cpplint.CleansedLines(['',
+                                         'int a;',
+                                         '  ',
+                                         '// comment only',
+                                         'int b;',
+                                         ''])
+    self.assertEquals(('', -1), cpplint.GetPreviousNonBlankLine(clean_lines, 1))
+    self.assertEquals(('int a;', 1),
+                      cpplint.GetPreviousNonBlankLine(clean_lines, 4))
+    self.assertEquals(('int b;', 4),
+                      cpplint.GetPreviousNonBlankLine(clean_lines, 5))
+    self.assertEquals(1, clean_lines.NextNonBlank(0))
+    self.assertEquals(4, clean_lines.NextNonBlank(1))
+    self.assertEquals(-1, clean_lines.NextNonBlank(4))
+
+  def testFileFacts(self):
+    lines = ['// marker', '/* Copyright 2014',
+             '   Your Company. */',
+             '#ifndef FOO_H_', '  #define  FOO_H_ 1', 'int a;  // \0',
+             u('/* \ufffd'), u('\ufffd */'), u('char c = "\ufffd\0";'),
+             '#endif  // FOO_H_', '#endif', 'int b;', '// marker']
+    facts = cpplint._FileFacts(lines)
+    self.assertTrue(facts.has_copyright)
+    cpplint.RemoveMultiLineComments('foo.h', lines, lambda *args: None)
+    facts.Scan(cpplint.CleansedLines(lines))
+    self.assertTrue(facts.has_copyright)
+    self.assertFalse(facts.header_guard_nolint)
+    self.assertEquals(('FOO_H_', 3, 'FOO_H_'),
+                      (facts.ifndef, facts.ifndef_linenum, facts.define))
+    self.assertEquals(('#endif', 10), (facts.endif, facts.endif_linenum))
+    # Bad characters in comments spanning lines are not reported.
+    self.assertEquals(set([8]), facts.utf8_lines)
+    self.assertEquals(set([5, 8]), facts.nul_lines)
+    self.assertTrue(facts.HasLineComments())
+    self.assertTrue(facts.missing_final_newline)
+
+  def testFileChecksWithoutFacts(self):
+    # The file-level checks gather the facts they need when given none.
+    lines = ['// marker', '#ifndef BAR_H_', '#define BAR_H_',
+             u('int a;  // \ufffd'), '#endif', '// marker']
+    error_collector = ErrorCollector(self.assert_)
+    cpplint.CheckForCopyright('foo.h', lines, error_collector)
+    cpplint.CheckForHeaderGuard('foo.h', cpplint.CleansedLines(lines),
+                                error_collector)
+    cpplint.CheckForBadCharacters('foo.h', lines, error_collector)
+    cpplint.CheckForNewlineAtEOF('foo.h', lines, error_collector)
+    self.assertEquals(
+        ['legal/copyright', 'build/header_guard', 'build/header_guard',
+         'readability/utf8', 'whitespace/ending_newline'],
+        [error.rsplit('[', 2)[1].rstrip('] ')
+         for error in error_collector.ResultList()])
+
+  def testWhitespaceCandidates(self):
+    lines = ['', ' ', '\t', 'a\tb\t', 'a ', 'a\x0b', ' a', '  a', '   a',
+             '    a', ' \ta', '   \t', 'x' * 80, 'x' * 81, 'x' * 79 + ' ']
+    clean_lines = cpplint.CleansedLines(lines)
+    (tabs, trailing, odd_indent, long_lines) = (
+        clean_lines.WhitespaceCandidates())
+    expected_odd_indent = set()
+    for linenum, line in enumerate(lines):
+      initial_spaces = len(line) - len(line.lstrip(' '))
+      if initial_spaces == 1 or initial_spaces == 3:
+        expected_odd_indent.add(linenum)
+    self.assertEquals(set(i for i, line in enumerate(lines) if '\t' in line),
+                      tabs)
+    self.assertEquals(set(i for i, line in enumerate(lines)
+                          if line and line[-1].isspace()),
+                      trailing)
+    self.assertEquals(expected_odd_indent, odd_indent)
+    self.assertEquals(set([13]), long_lines)
+    # Wide characters count twice, so any line over half the limit may be
+    # too wide.
+    clean_lines = cpplint.CleansedLines(['x' * 40, 'x' * 41, u('\u00e9')])
+    self.assertEquals(set([1]), clean_lines.WhitespaceCandidates()[3])
+
+  def testElidedCharacters(self):
+    clean_lines = cpplint.CleansedLines(['a = b;  // c', 'f("x,y")', ''])
+    self.assertEquals(frozenset('a =b;'), clean_lines.ElidedCharacters(0))
+    self.assertEquals(frozenset('f(")'), clean_lines.ElidedCharacters(1))
+    self.assertEquals(frozenset(), clean_lines.ElidedCharacters(2))
+    self.assertEquals(frozenset('a =b;'), clean_lines.ElidedCharacters(0))
+
+  def testBlockEnd(self):
+    clean_lines = cpplint.CleansedLines(['class A {',
+                                         '  class B { int x; };',
+                                         '  void f() {',
+                                         '  }',
+                                         '};',
+                                         'class C {'])
+    self.assertEquals(4, clean_lines.BlockEnd(0))
+    self.assertEquals(1, clean_lines.BlockEnd(1))
+    self.assertEquals(3, clean_lines.BlockEnd(2))
+    self.assertEquals(0, clean_lines.BlockEnd(3))
+    self.assertEquals(0, clean_lines.BlockEnd(5))
+
+  def testDisallowMacros(self):
+    clean_lines = cpplint.CleansedLines(
+        ['DISALLOW_COPY_AND_ASSIGN(A);',
+         'DISALLOW_COPY_AND_ASSIGN(B);',
+         '// DISALLOW_COPY_AND_ASSIGN(A);',
+         'DISALLOW_IMPLICIT_CONSTRUCTORS(A); DISALLOW_COPY_AND_ASSIGN(A);'])
+    self.assertEquals([(0, 'DISALLOW_COPY_AND_ASSIGN'),
+                       (3, 'DISALLOW_IMPLICIT_CONSTRUCTORS')],
+                      clean_lines.DisallowMacros('A'))
+    self.assertEquals([(1, 'DISALLOW_COPY_AND_ASSIGN')],
+                      clean_lines.DisallowMacros('B'))
+    self.assertEquals([], clean_lines.DisallowMacros('C'))
+
+  def testInitializerListBefore(self):
+    clean_lines = cpplint.CleansedLines(['', '',
+                                         'Foo::Foo(int x)',
+                                         '    : a_(x),',
+                                         '      b_(&x),',
+                                         '      c_(1) {',
+                                         '}',
+                                         'int y;'])
+    self.assertEquals([False, False, False, False, True, True, False, False],
+                      [clean_lines.InitializerListBefore(i)
+                       for i in range(8)])
+
   def testCollapseStrings(self):
     collapse = cpplint.CleansedLines._CollapseStrings
     self.assertEquals('""', collapse('""'))             # ""     (empty)
@@ -4586,6 +5188,375 @@ class CleansedLinesTest(unittest.TestCase):
                       collapse('\'"\' "foo"'))
 
 
+class ReportersTest(unittest.TestCase):
+
+  class Stream(object):
+    def __init__(self):
+      self.written = []
+
+    def write(self, text):
+      self.written.append(text)
+
+    def getvalue(self):
+      return ''.join(self.written)
+
+  def Report(self, reporter_class):
+    stream = self.Stream()
+    reporter = reporter_class(stream)
+    reporter.BeginRun()
+    reporter.BeginFile('foo.cc')
+    reporter.ReportError('foo.cc', 0, 'legal/copyright', 5, 'No <copyright>')
+    reporter.ReportError('foo.cc', 3, 'whitespace/tab', 1, 'Tab found')
+    # Nothing is written before the file is done.
+    written = stream.getvalue()
+    reporter.EndFile('foo.cc')
+    reporter.BeginFile('bar.cc')
+    reporter.EndFile('bar.cc')
+    reporter.EndRun()
+    return written, stream.getvalue()
+
+  def testJsonLines(self):
+    written, output = self.Report(cpplint._JsonLinesReporter)
+    self.assertEquals('', written)
+    errors = [json.loads(line) for line in output.splitlines()]
+    self.assertEquals(2, len(errors))
+    self.assertEquals({'file': 'foo.cc', 'line': 3,
+                       'category': 'whitespace/tab', 'confidence': 1,
+                       'message': 'Tab found'}, errors[1])
+
+  def testSarif(self):
+    written, output = self.Report(cpplint._SarifReporter)
+    self.assertFalse('Tab found' in written)
+    run = json.loads(output)['runs'][0]
+    self.assertEquals('cpplint', run['tool']['driver']['name'])
+    results = run['results']
+    self.assertEquals(['legal/copyright', 'whitespace/tab'],
+                      [result['ruleId'] for result in results])
+    location = results[1]['locations'][0]['physicalLocation']
+    self.assertEquals('foo.cc', location['artifactLocation']['uri'])
+    self.assertEquals(3, location['region']['startLine'])
+    self.assertFalse('region' in results[0]['locations'][0]['physicalLocation'])
+
+    stream = self.Stream()
+    reporter = cpplint._SarifReporter(stream)
+    reporter.BeginRun()
+    reporter.EndRun()
+    self.assertEquals([], json.loads(stream.getvalue())['runs'][0]['results'])
+
+  def testBatchedText(self):
+    written, output = self.Report(cpplint._Reporter)
+    self.assertEquals('', written)
+    self.assertEquals('foo.cc:0:  No <copyright>  [legal/copyright] [5]\n'
+                      'foo.cc:3:  Tab found  [whitespace/tab] [1]\n', output)
+
+  def Notes(self, reporter_class):
+    stream = self.Stream()
+    reporter = reporter_class(stream)
+    reporter.BeginRun()
+    reporter.BeginFile('foo.cc')
+    reporter.ReportError('foo.cc', 3, 'whitespace/tab', 1, 'Tab found')
+    reporter.ReportNote('foo.cc', 'Tabs were dropped')
+    reporter.EndFile('foo.cc')
+    reporter.ReportNote(None, 'Errors were dropped')
+    reporter.EndRun()
+    return stream.getvalue()
+
+  def testNotes(self):
+    self.assertEquals('foo.cc:3:  Tab found  [whitespace/tab] [1]\n'
+                      'foo.cc: Tabs were dropped\n'
+                      'Errors were dropped\n',
+                      self.Notes(cpplint._TextReporter))
+    self.assertEquals(
+        [{'file': 'foo.cc', 'line': 3, 'category': 'whitespace/tab',
+          'confidence': 1, 'message': 'Tab found'},
+         {'file': 'foo.cc', 'note': 'Tabs were dropped'},
+         {'note': 'Errors were dropped'}],
+        [json.loads(line)
+         for line in self.Notes(cpplint._JsonLinesReporter).splitlines()])
+
+    run = json.loads(self.Notes(cpplint._SarifReporter))['runs'][0]
+    self.assertEquals(1, len(run['results']))
+    notifications = run['invocations'][0]['toolExecutionNotifications']
+    self.assertEquals(['Tabs were dropped', 'Errors were dropped'],
+                      [note['message']['text'] for note in notifications])
+    self.assertEquals(
+        'foo.cc',
+        notifications[0]['locations'][0]['physicalLocation'][
+            'artifactLocation']['uri'])
+
+    suite = xml.dom.minidom.parseString(
+        self.Notes(cpplint._JUnitReporter)).documentElement
+    self.assertEquals(
+        ['foo.cc: Tabs were dropped\n', 'Errors were dropped\n'],
+        [node.firstChild.data
+         for node in suite.getElementsByTagName('system-err')])
+
+  def testJUnit(self):
+    written, output = self.Report(cpplint._JUnitReporter)
+    self.assertFalse('Tab found' in written)
+    suite = xml.dom.minidom.parseString(output).documentElement
+    self.assertEquals('testsuite', suite.tagName)
+    cases = suite.getElementsByTagName('testcase')
+    self.assertEquals(['foo.cc', 'bar.cc'],
+                      [case.getAttribute('name') for case in cases])
+    failures = cases[0].getElementsByTagName('failure')
+    self.assertEquals('2 errors', failures[0].getAttribute('message'))
+    self.assertTrue('No <copyright>' in failures[0].firstChild.data)
+    self.assertEquals([], cases[1].getElementsByTagName('failure'))
+
+  def testTextReporterFollowsOutputFormat(self):
+    old_output_format = cpplint._cpplint_state.output_format
+    try:
+      stream = self.Stream()
+      reporter = cpplint._TextReporter(stream)
+      cpplint._SetOutputFormat('vs7')
+      reporter.ReportError('foo.cc', 3, 'whitespace/tab', 1, 'Tab found')
+      cpplint._SetOutputFormat('emacs')
+      reporter.ReportError('foo.cc', 3, 'whitespace/tab', 1, 'Tab found')
+      self.assertEquals(
+          ['foo.cc(3): warning: Tab found  [whitespace/tab] [1]\n',
+           'foo.cc:3:  Tab found  [whitespace/tab] [1]\n'],
+          stream.written)
+    finally:
+      cpplint._cpplint_state.output_format = old_output_format
+
+
+class ErrorCapsTest(ProcessFileTestBase):
+
+  def setUp(self):
+    ProcessFileTestBase.setUp(self)
+    self.old_state = (cpplint._cpplint_state.filters,
+                      cpplint._cpplint_state.max_errors_per_category,
+                      cpplint._cpplint_state.max_errors,
+                      cpplint._cpplint_state.fail_fast)
+
+  def tearDown(self):
+    (cpplint._cpplint_state.filters,
+     cpplint._cpplint_state.max_errors_per_category,
+     cpplint._cpplint_state.max_errors,
+     cpplint._cpplint_state.fail_fast) = self.old_state
+    ProcessFileTestBase.tearDown(self)
+
+  def testMaxErrorsPerCategoryPerFile(self):
+    cpplint._cpplint_state.SetErrorCaps(2, 0)
+    path = self.Lint('foo.cc', ['// Copyright 2014 Your Company.'] +
+                     ['int a;  \t// trailing  ' for _ in range(4)])
+    self.assertEquals(2, len(self.Written('Tab found')))
+    self.assertEquals(2, len(self.Written('Line ends in whitespace')))
+    self.assertEquals(
+        ['%s: 2 more errors of category whitespace/tab were dropped '
+         '(limit is 2 per category per file)\n' % path],
+        self.Written('category whitespace/tab were dropped'))
+    # The limit applies to each file separately.
+    self.Lint('bar.cc', ['// Copyright 2014 Your Company.', 'int a;\t'])
+    self.assertEquals(3, len(self.Written('Tab found')))
+
+  def testChecksAreSkippedOnceAllCategoriesAreCapped(self):
+    cpplint._cpplint_state.filters = ['-', '+whitespace/tab']
+    cpplint._cpplint_state.SetErrorCaps(1, 0)
+    path = self.Lint('foo.cc', ['\tint a;' for _ in range(10)])
+    self.assertEquals(1, len(self.Written('Tab found')))
+    # Linting stops at the first dropped error.
+    self.assertEquals(2, cpplint._cpplint_state.error_count)
+    self.assertEquals(
+        ['%s: 1 more errors of category whitespace/tab were dropped '
+         '(limit is 1 per category per file)\n' % path],
+        self.Written('were dropped'))
+    self.assertEquals(
+        ['%s: remaining checks were skipped, every category reached its '
+         'limit\n' % path],
+        self.Written('were skipped'))
+
+  def testMaxErrors(self):
+    cpplint._cpplint_state.filters = ['-', '+whitespace/tab']
+    cpplint._cpplint_state.SetErrorCaps(0, 3)
+    self.Lint('foo.cc', ['\tint a;', '\tint b;'])
+    self.Lint('bar.cc', ['\tint a;', '\tint b;'])
+    self.Lint('baz.cc', ['\tint a;', '\tint b;'])
+    self.assertEquals(3, len(self.Written('Tab found')))
+    # The remaining files are still linted, and their errors counted.
+    self.assertEquals(3, cpplint._cpplint_state.errors_dropped)
+    self.assertEquals(6, cpplint._cpplint_state.error_count)
+    cpplint._cpplint_state.ReportErrorCapSummary()
+    cpplint._cpplint_state.reporter.EndRun()
+    self.assertEquals(['3 more errors were dropped (limit is 3 errors)\n'],
+                      self.Written('more errors were dropped'))
+
+  def testFailFast(self):
+    cpplint._cpplint_state.SetFailFast('runtime/int,whitespace/tab')
+    self.Lint('foo.cc', ['// Copyright 2014 Your Company.',
+                         'int a;  ', 'long b;', '\tint c;'])
+    # Errors in other categories do not stop linting.
+    self.assertEquals(1, len(self.Written('Line ends in whitespace')))
+    self.assertEquals(1, len(self.Written('Use int16/int64/etc')))
+    self.assertEquals([], self.Written('Tab found'))
+    self.assertTrue(cpplint._cpplint_state.failed_fast)
+
+    # Only the errors reported at the current verbosity stop linting.
+    cpplint._cpplint_state.ResetErrorCounts()
+    cpplint._cpplint_state.SetFailFast('')
+    old_verbose_level = cpplint._cpplint_state.verbose_level
+    try:
+      cpplint._cpplint_state.verbose_level = 2
+      self.Lint('bar.cc', ['// Copyright 2014 Your Company.',
+                           '\tint a;', 'long b;', 'int c;  '])
+    finally:
+      cpplint._cpplint_state.verbose_level = old_verbose_level
+    self.assertEquals([], self.Written('Tab found'))
+    self.assertEquals(2, len(self.Written('Use int16/int64/etc')))
+    self.assertEquals(1, len(self.Written('Line ends in whitespace')))
+    self.assertTrue(cpplint._cpplint_state.failed_fast)
+
+
+class CheckProfileTest(ProcessFileTestBase):
+
+  def tearDown(self):
+    cpplint._SetCheckProfile(None)
+    ProcessFileTestBase.tearDown(self)
+
+  def testProfile(self):
+    check_style = cpplint.CheckStyle
+    cpplint._SetCheckProfile('json')
+    self.assertNotEqual(check_style, cpplint.CheckStyle)
+    path = self.Lint('foo.cc', ['// Copyright 2014 Your Company.',
+                                'int a;  ', 'int b;'])
+    profile = cpplint._check_profile
+    # The marker lines at both ends of the file are processed too.
+    self.assertEquals(6, profile.checks['ProcessLine'][0])
+    self.assertEquals(6, profile.checks['CheckSpacing'][0])
+    self.assertEquals(1, profile.checks['CheckStyle'][2])
+    self.assertEquals(1, profile.checks['ProcessLine'][2])
+    self.assertEquals(0, profile.checks['CheckLanguage'][2])
+    self.assertEquals(1, profile.checks['CheckForCopyright'][0])
+
+    stream = ReportersTest.Stream()
+    profile.Print(stream)
+    printed = json.loads(stream.getvalue())
+    self.assertEquals('ProcessLine', printed['checks'][0]['check'])
+    self.assertEquals([(path, 3, 1)],
+                      [(item['file'], item['lines'], item['errors'])
+                       for item in printed['files']])
+
+    profile.output_format = 'text'
+    stream = ReportersTest.Stream()
+    profile.Print(stream)
+    lines = stream.getvalue().splitlines()
+    self.assertEquals('Time spent in each check, with the checks it calls:',
+                      lines[0])
+    self.assertEquals(['ProcessLine', '6', '1'],
+                      [lines[2].split()[i] for i in (3, 0, 2)])
+    self.assertEquals(path, lines[-1].split()[-1])
+
+    cpplint._SetCheckProfile(None)
+    self.assertEqual(check_style, cpplint.CheckStyle)
+    self.assertEqual(None, cpplint._check_profile)
+
+
+class TraceTest(ProcessFileTestBase):
+
+  def tearDown(self):
+    cpplint._SetTrace(False)
+    ProcessFileTestBase.tearDown(self)
+
+  def testTrace(self):
+    cpplint._SetTrace(True)
+    self.Lint('foo.h', ['// Copyright 2014 Your Company.',
+                        '#ifndef FOO_H_', '#define FOO_H_',
+                        '#include <string>', '#endif  // FOO_H_'])
+    path = self.Lint('foo.cc', ['// Copyright 2014 Your Company.',
+                                '#include "foo.h"', 'int a;'])
+    events = cpplint._trace.events
+    spans = [event['name'] for event in events
+             if event['args']['file'] == path]
+    self.assertEquals(['read', 'decode', 'CleansedLines', 'lines',
+                       'read header', 'CheckForIncludeWhatYouUse', 'lint',
+                       'output'], spans)
+    for event in events:
+      self.assertEquals('X', event['ph'])
+      self.assertEquals(os.getpid(), event['args']['worker'])
+      self.assertTrue(event['ts'] >= 0 and event['dur'] >= 0)
+    self.assertEquals([os.path.getsize(path)],
+                      list(set(event['args']['bytes'] for event in events
+                               if event['args']['file'] == path)))
+    header = [event['args']['header'] for event in events
+              if event['name'] == 'read header']
+    self.assertEquals([os.path.join(self.temp_directory, 'foo.h')], header)
+
+    stream = ReportersTest.Stream()
+    cpplint._trace.Write(stream)
+    written = json.loads(stream.getvalue())
+    self.assertEquals('process_name', written['traceEvents'][0]['name'])
+    self.assertEquals(events, written['traceEvents'][1:])
+
+  def testNoTrace(self):
+    self.Lint('foo.cc', ['// Copyright 2014 Your Company.', 'int a;'])
+    self.assertEquals(None, cpplint._trace)
+
+
+class RunMetricsTest(ProcessFileTestBase):
+
+  def tearDown(self):
+    cpplint._SetRunMetrics(False)
+    ProcessFileTestBase.tearDown(self)
+
+  def testRunMetrics(self):
+    cpplint._SetRunMetrics(True)
+    first = self.Lint('foo.cc', ['// Copyright 2014 Your Company.',
+                                 'int a;  ', 'int b; '])
+    second = self.Lint('bar.cc', ['int c;'])
+    metrics = cpplint._run_metrics
+    self.assertEquals(2, metrics.files)
+    self.assertEquals(4, metrics.lines)
+    self.assertEquals(os.path.getsize(first) + os.path.getsize(second),
+                      metrics.bytes)
+
+    stream = ReportersTest.Stream()
+    metrics.Write(stream)
+    samples = dict(line.rsplit(' ', 1)
+                   for line in stream.getvalue().splitlines()
+                   if not line.startswith('#'))
+    self.assertEquals('2', samples['cpplint_files_linted_total'])
+    self.assertEquals('4', samples['cpplint_lines_processed_total'])
+    self.assertEquals('2', samples['cpplint_file_seconds_count'])
+    self.assertEquals('2', samples['cpplint_file_seconds_bucket{le="+Inf"}'])
+    self.assertTrue(float(samples['cpplint_cpu_seconds_total']) >= 0)
+    # The errors are counted by category without --counting.
+    self.assertEquals(
+        '2', samples['cpplint_errors_total{category="whitespace/end_of_line"}'])
+    self.assertEquals(
+        '1', samples['cpplint_errors_total{category="legal/copyright"}'])
+    self.assertEquals({}, cpplint._cpplint_state.errors_by_category)
+    self.assertTrue('cpplint_regex_cache_hits_total' not in samples)
+
+
+class ReadFileLinesTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_directory)
+
+  def Read(self, data):
+    path = os.path.join(self.temp_directory, 'foo.cc')
+    with open(path, 'wb') as source:
+      source.write(data)
+    return cpplint.ReadFileLines(path)
+
+  def testLineEndings(self):
+    self.assertEquals((['a', 'b', ''], []), self.Read(b'a\nb\n'))
+    self.assertEquals((['a', 'b', ''], []), self.Read(b'a\r\nb\r\n'))
+    self.assertEquals((['a', 'b\r'], []), self.Read(b'a\r\nb\r'))
+    self.assertEquals((['a', 'b', 'c', 'd'], [1, 3]),
+                      self.Read(b'a\r\nb\nc\r\r\nd'))
+    self.assertEquals(([''], []), self.Read(b''))
+
+  def testDecoding(self):
+    self.assertEquals(([u('\u00e9t\u00e9'), ''], []),
+                      self.Read(b'\xc3\xa9t\xc3\xa9\n'))
+    self.assertEquals(([u('a\ufffdb'), ''], []), self.Read(b'a\xffb\n'))
+
+
 class OrderOfIncludesTest(CpplintTestBase):
 
   def setUp(self):